@@ -0,0 +1,135 @@
+"""
+On-disk cache of processed surfaces for HaHa Hausservice Haubentaucher Tetris
+
+Decoding the piece PNGs, splitting and rotating the tiles and scaling the logo
+take most of the startup time. The results are stored as raw RGBA pixels next
+to a small JSON index, keyed by a hash of the source files and the processing
+parameters. A cache hit memory-maps the pixel file and wraps each surface
+around it with pygame.image.frombuffer, so nothing is decoded. Changing a
+source file changes the hash and the stale entry is replaced on the next save.
+
+pygame is imported on first use so importing this module stays cheap.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+
+# Default cache directory, relative to the game directory like the assets
+CACHE_DIR = '.cache'
+
+# Bump when the processing of cached assets changes
+CACHE_VERSION = 1
+
+
+def source_hash(paths, *params):
+    """
+    Hash source files and processing parameters into a cache key.
+    
+    Args:
+        paths: Source files whose content goes into the key
+        params: Any repr()-able parameters that affect the processed result
+    
+    Returns:
+        A short hex digest
+    """
+    digest = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    for path in paths:
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+        digest.update(b'\0')
+    digest.update(repr(params).encode())
+    return digest.hexdigest()[:16]
+
+
+def _cache_paths(cache_dir, name, digest):
+    base = os.path.join(cache_dir, f"{name}-{digest}")
+    return base + '.rgba', base + '.json'
+
+
+def save_surfaces(cache_dir, name, digest, surfaces, meta=None):
+    """
+    Store surfaces as raw RGBA pixels under a cache key.
+    
+    Other entries with the same name (from older source files) are removed.
+    
+    Args:
+        cache_dir: Cache directory (created if needed)
+        name: Entry name, e.g. 'sprites' or 'logo'
+        digest: Cache key from source_hash
+        surfaces: Dictionary of string key -> Surface
+        meta: Optional JSON-serializable data stored with the surfaces
+    
+    Returns:
+        True if the entry was written
+    """
+    import pygame
+    
+    pixels_path, index_path = _cache_paths(cache_dir, name, digest)
+    index = {'surfaces': {}, 'meta': meta or {}}
+    offset = 0
+    
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to temporary files first so a crash never leaves a torn entry
+        with open(pixels_path + '.tmp', 'wb') as pixels:
+            for key, surface in surfaces.items():
+                data = pygame.image.tobytes(surface, 'RGBA')
+                pixels.write(data)
+                index['surfaces'][key] = [offset, surface.get_width(), surface.get_height()]
+                offset += len(data)
+        with open(index_path + '.tmp', 'w') as index_file:
+            json.dump(index, index_file)
+        os.replace(pixels_path + '.tmp', pixels_path)
+        os.replace(index_path + '.tmp', index_path)
+        
+        current = {os.path.basename(pixels_path), os.path.basename(index_path)}
+        for filename in os.listdir(cache_dir):
+            if filename.startswith(name + '-') and filename not in current:
+                os.remove(os.path.join(cache_dir, filename))
+    except OSError as e:
+        print(f"Could not write {name} cache: {e}")
+        return False
+    return True
+
+
+def load_surfaces(cache_dir, name, digest):
+    """
+    Load surfaces stored by save_surfaces without copying their pixels.
+    
+    The surfaces share the memory-mapped cache file, which stays mapped for as
+    long as any of them is alive.
+    
+    Args:
+        cache_dir: Cache directory
+        name: Entry name
+        digest: Cache key from source_hash
+    
+    Returns:
+        (surfaces, meta) tuple, or None if there is no valid entry
+    """
+    import pygame
+    
+    pixels_path, index_path = _cache_paths(cache_dir, name, digest)
+    try:
+        with open(index_path) as index_file:
+            index = json.load(index_file)
+        with open(pixels_path, 'rb') as pixels:
+            buffer = mmap.mmap(pixels.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    
+    # An index that parses but does not describe this file is a miss too
+    view = memoryview(buffer)
+    surfaces = {}
+    try:
+        for key, (offset, width, height) in index['surfaces'].items():
+            end = offset + width * height * 4
+            if min(offset, width, height) < 0 or end > len(view):
+                return None
+            surfaces[key] = pygame.image.frombuffer(view[offset:end], (width, height), 'RGBA')
+        meta = index['meta']
+    except (AttributeError, KeyError, TypeError, ValueError, pygame.error):
+        return None
+    return surfaces, meta
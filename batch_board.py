@@ -0,0 +1,205 @@
+"""
+Vectorized batch boards for HaHa Hausservice Haubentaucher Tetris
+
+Stores K boards in a single (K, GRID_HEIGHT, GRID_WIDTH) uint8 array and
+applies the game rules to all of them at once. The rules mirror
+check_collision, lock_piece, check_lines and clear_lines in game_logic.
+
+Requires numpy (optional dependency: pip install numpy).
+"""
+
+import numpy as np
+
+import game_logic
+from game_logic import GRID_WIDTH, GRID_HEIGHT, BitboardGrid
+
+# Maximum level, matching clear_lines
+MAX_LEVEL = 15
+
+
+def piece_offsets(pieces):
+    """
+    Convert pieces or rotation states to an offsets array.
+    
+    Args:
+        pieces: A Piece, a RotationState, or a sequence of them (one per board)
+    
+    Returns:
+        int array of shape (4, 2) for a single piece or (K, 4, 2) for a sequence
+    """
+    if hasattr(pieces, 'offsets'):
+        return np.array(pieces.offsets, dtype=np.intp)
+    if hasattr(pieces, 'state'):
+        return np.array(pieces.state.offsets, dtype=np.intp)
+    return np.array([piece_offsets(piece) for piece in pieces], dtype=np.intp)
+
+
+class BatchBoard:
+    """
+    K game boards evaluated together with NumPy.
+    
+    cells[k, y, x] is non-zero when cell (x, y) of board k is occupied.
+    score, level, lines_cleared and fall_speed hold the per-board game state
+    updated by clear_lines, following the same rules as the scalar version.
+    """
+    
+    def __init__(self, count, width=GRID_WIDTH, height=GRID_HEIGHT):
+        """
+        Create K empty boards.
+        
+        Args:
+            count: Number of boards (K)
+            width: Number of columns
+            height: Number of rows
+        """
+        self.cells = np.zeros((count, height, width), dtype=np.uint8)
+        self.score = np.zeros(count, dtype=np.int64)
+        self.level = np.ones(count, dtype=np.int64)
+        self.lines_cleared = np.zeros(count, dtype=np.int64)
+        self.fall_speed = np.full(count, game_logic.INITIAL_FALL_SPEED, dtype=np.float64)
+    
+    @classmethod
+    def from_grids(cls, grids):
+        """Create a batch from list-of-lists or BitboardGrid grids (cells become 0/1)"""
+        grids = list(grids)
+        first = grids[0]
+        board = cls(len(grids), len(first[0]), len(first))
+        for k, grid in enumerate(grids):
+            rows = grid.cells if isinstance(grid, BitboardGrid) else grid
+            board.cells[k] = [[cell != 0 for cell in row] for row in rows]
+        return board
+    
+    def __len__(self):
+        return self.cells.shape[0]
+    
+    @property
+    def width(self):
+        return self.cells.shape[2]
+    
+    @property
+    def height(self):
+        return self.cells.shape[1]
+    
+    def to_grid(self, k):
+        """Return board k as a list-of-lists grid of 0/1 cells"""
+        return self.cells[k].tolist()
+    
+    def _block_positions(self, offsets, xs, ys):
+        """Absolute block positions, each of shape (K, blocks)"""
+        offsets = np.asarray(offsets)
+        if offsets.ndim == 2:
+            offsets = offsets[np.newaxis]
+        bx = np.asarray(xs)[:, np.newaxis] + offsets[..., 0]
+        by = np.asarray(ys)[:, np.newaxis] + offsets[..., 1]
+        return bx, by
+    
+    def collides(self, offsets, xs, ys):
+        """
+        Vectorized check_collision.
+        
+        Args:
+            offsets: Piece offsets from piece_offsets, shared (4, 2) or per board (K, 4, 2)
+            xs: Piece x position per board, shape (K,)
+            ys: Piece y position per board, shape (K,)
+        
+        Returns:
+            bool array of shape (K,), True where the piece collides
+        """
+        bx, by = self._block_positions(offsets, xs, ys)
+        
+        # Check boundaries
+        out_of_bounds = (bx < 0) | (bx >= self.width) | (by >= self.height)
+        
+        # Check collision with locked cells (only for blocks within the grid)
+        inside = ~out_of_bounds & (by >= 0)
+        boards = np.broadcast_to(np.arange(len(self))[:, np.newaxis], bx.shape)
+        occupied = np.zeros(bx.shape, dtype=bool)
+        occupied[inside] = self.cells[boards[inside], by[inside], bx[inside]] != 0
+        
+        return (out_of_bounds | occupied).any(axis=1)
+    
+    def drop(self, offsets, xs, ys):
+        """
+        Landing y per board for a piece hard dropped from (xs, ys).
+        
+        Returns:
+            int array of shape (K,) with the lowest non-colliding y
+        """
+        ys = np.array(ys, dtype=np.intp)
+        falling = ~self.collides(offsets, xs, ys + 1)
+        while falling.any():
+            ys += falling
+            falling &= ~self.collides(offsets, xs, ys + 1)
+        return ys
+    
+    def lock(self, offsets, xs, ys, value=1, active=None):
+        """
+        Vectorized lock_piece: mark the piece cells as occupied.
+        
+        Args:
+            offsets: Piece offsets, shared (4, 2) or per board (K, 4, 2)
+            xs: Piece x position per board
+            ys: Piece y position per board
+            value: Non-zero cell value to store
+            active: Optional bool mask of boards to lock on (default: all)
+        """
+        bx, by = self._block_positions(offsets, xs, ys)
+        # Only lock blocks that are visible
+        visible = by >= 0
+        if active is not None:
+            visible &= np.asarray(active)[:, np.newaxis]
+        boards = np.broadcast_to(np.arange(len(self))[:, np.newaxis], bx.shape)
+        self.cells[boards[visible], by[visible], bx[visible]] = value
+    
+    def full_rows(self):
+        """Vectorized check_lines: bool array (K, height), True for completed rows"""
+        return (self.cells != 0).all(axis=2)
+    
+    def check_lines(self, k):
+        """Completed row indices of board k, same result as check_lines"""
+        return np.flatnonzero(self.full_rows()[k]).tolist()
+    
+    def clear_lines(self):
+        """
+        Vectorized clear_lines on every board.
+        
+        Compacts the remaining rows to the bottom, inserts empty rows at the
+        top and updates score, level, lines_cleared and fall_speed.
+        
+        Returns:
+            int array of shape (K,) with the number of lines cleared per board
+        """
+        full = self.full_rows()
+        num_lines = full.sum(axis=1)
+        changed = num_lines > 0
+        if not changed.any():
+            return num_lines
+        
+        # A stable sort on the "kept" flag moves the full rows to the top while
+        # keeping the order of the remaining rows, then the full rows are emptied
+        cells = self.cells[changed]
+        order = np.argsort(~full[changed], axis=1, kind='stable')
+        cells = np.take_along_axis(cells, order[:, :, np.newaxis], axis=1)
+        cells[np.arange(self.height) < num_lines[changed][:, np.newaxis]] = 0
+        self.cells[changed] = cells
+        
+        self._update_score(num_lines)
+        return num_lines
+    
+    def _update_score(self, num_lines):
+        """Apply the clear_lines scoring and level rules for the cleared line counts"""
+        # Score per number of lines (4 or more lines score as a Tetris)
+        line_scores = np.array([
+            0, game_logic.SCORE_SINGLE, game_logic.SCORE_DOUBLE,
+            game_logic.SCORE_TRIPLE, game_logic.SCORE_TETRIS
+        ], dtype=np.int64)
+        self.lines_cleared += num_lines
+        self.score += line_scores[np.minimum(num_lines, 4)] * self.level
+        
+        # Level up every 10 lines
+        new_level = self.lines_cleared // 10 + 1
+        level_up = (num_lines > 0) & (new_level > self.level) & (new_level <= MAX_LEVEL)
+        self.level[level_up] = new_level[level_up]
+        self.fall_speed[level_up] = game_logic.INITIAL_FALL_SPEED * (
+            game_logic.SPEED_MULTIPLIER ** (self.level[level_up] - 1)
+        )
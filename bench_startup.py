@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for HaHa Hausservice Haubentaucher Tetris
+
+Measures what a fresh interpreter spends on importing the game modules and
+loading the sprites. Every run happens in its own subprocess so no module is
+already imported, which is what each simulation worker or a cold kiosk boot
+pays.
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --runs 50 --case simulate --case pygame
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Benchmark cases: name -> statement timed inside a fresh interpreter
+CASES = {
+    'game_logic': 'import game_logic',
+    'simulate': 'import simulate',
+    'sprite_manager': 'import sprite_manager',
+    'pygame': 'import pygame',
+    'load_sprites': 'import sprite_manager; sprite_manager.sprite_manager.load_sprites(cache_dir=None)',
+    'load_sprites_cached': 'import sprite_manager; sprite_manager.sprite_manager.load_sprites()',
+}
+
+# Times the statement and prints the seconds as the last line of output
+TIMER = "import time; started = time.perf_counter(); {statement}; print(time.perf_counter() - started)"
+
+
+def measure(statement, runs=10):
+    """
+    Time a statement in fresh interpreters.
+    
+    Args:
+        statement: Python code to time
+        runs: Number of subprocesses to run
+    
+    Returns:
+        List of durations in seconds, one per run
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', TIMER.format(statement=statement)],
+            cwd=directory, env=env, capture_output=True, text=True, check=True
+        )
+        times.append(float(result.stdout.split()[-1]))
+    return times
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Measure import and sprite loading time in fresh interpreters")
+    parser.add_argument('-r', '--runs', type=int, default=10, help="subprocesses per case (default: 10)")
+    parser.add_argument('--case', dest='cases', action='append', choices=list(CASES),
+                        help="case to run (repeatable, default: all)")
+    args = parser.parse_args(argv)
+    
+    print(f"{'case':<22}{'median ms':>12}{'min ms':>12}")
+    for name in args.cases or CASES:
+        times = measure(CASES[name], args.runs)
+        print(f"{name:<22}{statistics.median(times) * 1000:>12.2f}{min(times) * 1000:>12.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
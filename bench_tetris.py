@@ -0,0 +1,211 @@
+"""
+Benchmark suite for HaHa Hausservice Haubentaucher Tetris
+
+Times the game logic hot paths, whole headless games, sprite loading and the
+renderer with pytest-benchmark (pip install pytest-benchmark). The file is not
+collected by a plain pytest run, call it explicitly:
+
+    pytest bench_tetris.py
+
+Compare against the stored baseline, failing on a median slowdown over 25%:
+
+    pytest bench_tetris.py --benchmark-storage=file://benchmarks \\
+        --benchmark-compare=0001 --benchmark-compare-fail=median:25%
+
+Record a new baseline (e.g. on the kiosk hardware) with:
+
+    pytest bench_tetris.py --benchmark-storage=file://benchmarks --benchmark-save=baseline
+
+All inputs are seeded, so every run measures the same work.
+"""
+
+import os
+import random
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# Render offscreen with the SDL dummy video driver
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+import simulate
+from renderer import Renderer, WIDTH, HEIGHT
+from sprite_manager import SpriteManager
+from game_logic import (
+    Piece, SHAPES, GRID_WIDTH, GRID_HEIGHT, ACTIONS, GameSession, BitboardGrid,
+    check_collision, check_lines, clear_lines, drop_distance, lock_piece, new_game_state
+)
+from test_tetris import random_grid
+
+# Grid backends: list of lists (GUI default before bitboards) and BitboardGrid
+BACKENDS = {
+    'list': lambda grid: grid,
+    'bitboard': BitboardGrid.from_list,
+}
+
+
+def make_grid(backend, seed=1, full_rows=()):
+    """A seeded half-filled grid with the given full rows"""
+    return BACKENDS[backend](random_grid(random.Random(seed), full_rows=full_rows))
+
+
+@pytest.fixture(scope='module')
+def display():
+    """Initialize the dummy display that surface conversion and ptext need"""
+    pygame.display.init()
+    pygame.font.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((WIDTH, HEIGHT))
+    yield
+    pygame.display.quit()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_check_collision(benchmark, backend):
+    """Collision checks of every shape at every column just above the stack"""
+    grid = make_grid(backend)
+    pieces = []
+    for shape_type in SHAPES:
+        for x in range(-1, GRID_WIDTH):
+            piece = Piece(shape_type)
+            piece.x = x
+            piece.y = GRID_HEIGHT // 2 - 2
+            pieces.append(piece)
+    
+    def run():
+        for piece in pieces:
+            check_collision(piece, grid, 0, 1)
+    
+    benchmark(run)
+
+
+def test_piece_rotate(benchmark):
+    """A full turn of every shape"""
+    pieces = [Piece(shape_type) for shape_type in SHAPES]
+    
+    def run():
+        for piece in pieces:
+            for _ in range(4):
+                piece.rotate()
+    
+    benchmark(run)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_check_lines(benchmark, backend):
+    """Scanning a half-filled grid with two full rows"""
+    grid = make_grid(backend, full_rows=(GRID_HEIGHT - 1, GRID_HEIGHT - 3))
+    assert benchmark(check_lines, grid) == [GRID_HEIGHT - 3, GRID_HEIGHT - 1]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('lines', [1, 2, 3, 4])
+def test_clear_lines(benchmark, backend, lines):
+    """Clearing 1-4 full rows, each round on a fresh grid"""
+    full_rows = tuple(range(GRID_HEIGHT - lines, GRID_HEIGHT))
+    
+    def setup():
+        grid = make_grid(backend, full_rows=full_rows)
+        return (check_lines(grid), grid, new_game_state()), {}
+    
+    benchmark.pedantic(clear_lines, setup=setup, rounds=2000)
+
+
+def test_session_construction(benchmark):
+    """Starting a new seeded game (every game, restart and replay does this)"""
+    seeds = iter(range(10 ** 6))
+    benchmark(lambda: GameSession(seed=next(seeds)))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_lock_and_clear(benchmark, backend):
+    """Landing, locking and clearing an I piece that completes the bottom row"""
+    def setup():
+        # A seeded stack with an empty 4-wide well on the right
+        grid = random_grid(random.Random(1))
+        for y, row in enumerate(grid):
+            row[GRID_WIDTH - 4:] = [0] * 4
+            if y == GRID_HEIGHT - 1:
+                row[:GRID_WIDTH - 4] = ['T'] * (GRID_WIDTH - 4)
+        piece = Piece('I')
+        piece.x = GRID_WIDTH - 4
+        return (piece, BACKENDS[backend](grid)), {}
+    
+    def run(piece, grid):
+        piece.y += drop_distance(piece, grid)
+        lock_piece(piece, grid)
+        clear_lines(check_lines(grid), grid, new_game_state())
+    
+    benchmark.pedantic(run, setup=setup, rounds=2000)
+
+
+@pytest.mark.parametrize('policy', ['drop', 'greedy'])
+def test_headless_games(benchmark, policy):
+    """Whole seeded headless games, reported as games per second"""
+    seeds = iter(range(10 ** 6))
+    policy_function = simulate.load_policy(policy)
+    
+    def run():
+        return simulate.play_game(next(seeds), policy_function, max_pieces=200)
+    
+    benchmark.pedantic(run, rounds=20)
+    # No stats with --benchmark-disable, the games then only run once
+    if benchmark.stats:
+        benchmark.extra_info['games_per_second'] = 1 / benchmark.stats.stats.mean
+
+
+def test_load_sprites(benchmark):
+    """Decoding, splitting and packing the sprites without the asset cache"""
+    benchmark.pedantic(lambda: SpriteManager(autoload=False).load_sprites(cache_dir=None), rounds=20)
+
+
+def test_load_sprites_cached(benchmark, tmp_path):
+    """Loading the sprites from a warm asset cache"""
+    cache_dir = str(tmp_path)
+    SpriteManager(autoload=False).load_sprites(cache_dir=cache_dir)
+    benchmark.pedantic(lambda: SpriteManager(autoload=False).load_sprites(cache_dir=cache_dir), rounds=50)
+
+
+@pytest.fixture(scope='module')
+def sprites(display):
+    """Sprites converted to the display format, as the game uses them"""
+    sprite_manager = SpriteManager(autoload=False)
+    sprite_manager.load_sprites(cache_dir=None)
+    sprite_manager.convert_sprites()
+    return sprite_manager
+
+
+def test_draw_full(benchmark, sprites):
+    """Redrawing the whole screen (first frame, game over, resize)"""
+    session = GameSession(seed=5, sprite_manager=sprites)
+    for i in range(30):
+        session.step(ACTIONS[i % len(ACTIONS)])
+    renderer = Renderer(sprites)
+    # Drawing to another surface than last time always repaints everything,
+    # alternating two keeps the composed background cached like in the game
+    surfaces = [pygame.display.get_surface(), pygame.display.get_surface().copy()]
+    
+    def run():
+        surfaces.reverse()
+        renderer.draw(surfaces[0], session.grid, session.game_state)
+    
+    benchmark(run)
+
+
+def test_draw_incremental(benchmark, sprites):
+    """Drawing played frames, repainting only what changed"""
+    session = GameSession(seed=5, sprite_manager=sprites)
+    renderer = Renderer(sprites)
+    surface = pygame.display.get_surface()
+    renderer.draw(surface, session.grid, session.game_state)
+    rng = random.Random(5)
+    
+    def setup():
+        if session.game_over:
+            session.reset()
+        session.step(rng.choice(ACTIONS))
+        session.tick(1 / 60)
+        return (surface, session.grid, session.game_state), {}
+    
+    benchmark.pedantic(renderer.draw, setup=setup, rounds=2000)
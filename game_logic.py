@@ -4,6 +4,8 @@ Contains all game mechanics without display dependencies
 """
 
 import random
+from array import array
+from collections import deque, namedtuple
 from sprite_manager import Block
 
 # Grid configuration
@@ -21,6 +23,9 @@ SHAPES = {
     'Z': [(0, 0), (1, 0), (1, 1), (2, 1)]   # Toilet
 }
 
+# Shape types in a fixed order, piece generators produce indices into it
+SHAPE_TYPES = tuple(SHAPES)
+
 # Colors for each piece type
 PIECE_COLORS = {
     'I': (0, 255, 255),    # Cyan
@@ -36,6 +41,12 @@ PIECE_COLORS = {
 INITIAL_FALL_SPEED = 0.5  # Initial seconds between automatic falls
 SPEED_MULTIPLIER = 0.9  # Speed multiplier per level (10% faster)
 
+# Fixed simulation step. 1/64 s is exact in binary floating point, so whole
+# steps add up without rounding drift (a 0.5 s fall interval is exactly 32 steps)
+TICK_RATE = 64
+TICK_TIME = 1 / TICK_RATE
+MAX_CATCH_UP_TICKS = 16  # Steps run per tick() at most, older backlog is dropped (0.25 s)
+
 # Scoring constants
 SCORE_SINGLE = 100
 SCORE_DOUBLE = 300
@@ -44,6 +55,103 @@ SCORE_TETRIS = 800
 SCORE_SOFT_DROP = 1
 SCORE_HARD_DROP = 2
 
+# Offsets tried in order when a rotation collides (simplified wall kicks)
+WALL_KICK_OFFSETS = [(-1, 0), (1, 0), (-2, 0), (2, 0), (0, -1)]
+
+# Actions accepted by GameSession.step
+ACTION_LEFT = 'left'
+ACTION_RIGHT = 'right'
+ACTION_ROTATE = 'rotate'
+ACTION_SOFT_DROP = 'soft_drop'
+ACTION_HARD_DROP = 'hard_drop'
+ACTIONS = (ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_SOFT_DROP, ACTION_HARD_DROP)
+
+# Piece generator strategies
+GENERATOR_UNIFORM = 'uniform'  # Every piece independently random
+GENERATOR_BAG = 'bag'  # 7-bag: each run of 7 pieces contains every shape once
+GENERATOR_HISTORY = 'history'  # Reroll shapes seen in the last few pieces
+
+
+# Precomputed rotation state of a shape
+# offsets: (dx, dy) block offsets, in the same block order as SHAPES
+# width, height: bounding box size in blocks
+# bottom: lowest dy occupied in each column of the bounding box
+# row_masks: per-row bitmask with bit dx set for each block in that row
+RotationState = namedtuple('RotationState', ['offsets', 'width', 'height', 'bottom', 'row_masks'])
+
+
+def _rotate_offsets(offsets):
+    """
+    Rotate block offsets 90 degrees clockwise and normalize them to the top-left.
+    
+    (x, y) -> (y, -x), then shift so the minimum x and y are 0.
+    Block order is preserved so sprite information stays attached.
+    """
+    rotated = [(dy, -dx) for dx, dy in offsets]
+    min_x = min(dx for dx, dy in rotated)
+    min_y = min(dy for dx, dy in rotated)
+    return tuple((dx - min_x, dy - min_y) for dx, dy in rotated)
+
+
+def _make_rotation_state(offsets):
+    """Build the RotationState tables for a normalized list of offsets"""
+    width = max(dx for dx, dy in offsets) + 1
+    height = max(dy for dx, dy in offsets) + 1
+    bottom = [-1] * width
+    row_masks = [0] * height
+    for dx, dy in offsets:
+        bottom[dx] = max(bottom[dx], dy)
+        row_masks[dy] |= 1 << dx
+    return RotationState(tuple(offsets), width, height, tuple(bottom), tuple(row_masks))
+
+
+def _build_rotations(shape_type):
+    """Compute every rotation state of a shape (the O-piece has only one)"""
+    offsets = tuple(SHAPES[shape_type])
+    # Don't rotate O-piece (it's a square)
+    count = 1 if shape_type == 'O' else 4
+    states = []
+    for _ in range(count):
+        states.append(_make_rotation_state(offsets))
+        offsets = _rotate_offsets(offsets)
+    return tuple(states)
+
+
+# All rotation states of every shape, computed once at import time
+ROTATIONS = {shape_type: _build_rotations(shape_type) for shape_type in SHAPES}
+
+
+# Block pairs of sprite-less pieces, shared by every Piece of a shape
+_SHARED_PIECE_BLOCKS = {}
+
+
+def _piece_blocks(shape_type, sprite_manager=None):
+    """
+    Pair every rotation state's offsets with the blocks of that rotation.
+    
+    Blocks are shared flyweights, one per entry in SHAPES and rotation.
+    
+    Returns:
+        Tuple per rotation state of ((dx, dy), Block) pairs
+    """
+    if not sprite_manager and shape_type in _SHARED_PIECE_BLOCKS:
+        return _SHARED_PIECE_BLOCKS[shape_type]
+    
+    states = ROTATIONS[shape_type]
+    blocks_by_rotation = []
+    for rotation, state in enumerate(states):
+        degrees = rotation * 90
+        if sprite_manager:
+            blocks = [sprite_manager.create_block(shape_type, dx, dy, degrees) for dx, dy in SHAPES[shape_type]]
+        else:
+            blocks = [Block.get(shape_type, dx, dy, degrees) for dx, dy in SHAPES[shape_type]]
+        blocks_by_rotation.append(tuple(zip(state.offsets, blocks)))
+    
+    blocks_by_rotation = tuple(blocks_by_rotation)
+    if not sprite_manager:
+        _SHARED_PIECE_BLOCKS[shape_type] = blocks_by_rotation
+    return blocks_by_rotation
+
 
 class Piece:
     """Represents a Tetris piece (tetromino) with sprite-aware blocks"""
@@ -63,26 +171,43 @@ class Piece:
         self.x = GRID_WIDTH // 2 - 2
         self.y = 0
         
-        # Create blocks with sprite information
-        # blocks is a list of ((dx, dy), Block) tuples
-        # where (dx, dy) is a tuple for the position relative to piece origin
-        # and Block contains the sprite information
-        self.blocks = []
-        for dx, dy in SHAPES[shape_type]:
-            if sprite_manager:
-                block = sprite_manager.create_block(shape_type, dx, dy)
-            else:
-                block = Block(shape_type, dx, dy, None)
-            self.blocks.append(((dx, dy), block))
+        # Pair the offsets of every rotation state with the shared blocks for
+        # that rotation once, so rotating only swaps the rotation index. The
+        # Block carries the sprite information and its rotation in degrees
+        self.states = ROTATIONS[shape_type]
+        self._blocks_by_rotation = _piece_blocks(shape_type, sprite_manager)
+        self._rotation = 0
+        self.state = self.states[0]
+    
+    @property
+    def rotation(self):
+        """Index of the current rotation state in ROTATIONS[shape_type]"""
+        return self._rotation
+    
+    @rotation.setter
+    def rotation(self, rotation):
+        rotation %= len(self.states)
+        self._rotation = rotation
+        self.state = self.states[rotation]
+    
+    @property
+    def blocks(self):
+        """
+        The blocks of the current rotation state.
+        
+        A tuple of ((dx, dy), Block) pairs where (dx, dy) is the position
+        relative to the piece origin and Block contains the sprite information.
+        """
+        return self._blocks_by_rotation[self._rotation]
     
     @property
     def shape(self):
         """Get the shape coordinates (for backward compatibility)"""
-        return [pos for pos, block in self.blocks]
+        return list(self.state.offsets)
     
     def get_blocks(self):
         """Get the absolute positions of all blocks in this piece"""
-        return [(self.x + dx, self.y + dy) for (dx, dy), block in self.blocks]
+        return [(self.x + dx, self.y + dy) for dx, dy in self.state.offsets]
     
     def get_block_at_position(self, dx, dy):
         """Get the Block object at a specific relative position"""
@@ -100,64 +225,392 @@ class Piece:
         """
         Rotate the piece 90 degrees clockwise.
         Blocks maintain their sprite information and rotate their sprites.
+        The O-piece has a single rotation state and doesn't rotate.
         """
-        # Don't rotate O-piece (it's a square)
-        if self.shape_type == 'O':
-            return
+        self.rotation = self._rotation + 1
+
+
+class BitboardGrid:
+    """
+    Optional bitboard backend for the game grid.
+    
+    Every row is stored as one integer where bit x is set when cell (x, y) is
+    occupied, so a full-row check is a single compare and collision is an AND
+    against the piece row masks. The Block objects live in a parallel side
+    table (cells), which keeps grid[y][x] working for the renderer exactly
+    like the list-of-lists grid.
+    
+    The grid also keeps incremental counters so nothing has to rescan the
+    board after a lock:
+    - heights[x]: column height (GRID_HEIGHT minus the row of the top block, 0 if empty)
+    - full_rows: set of completed row indices
+    The number of filled cells per row (row_counts) is read from the masks.
+    
+    Cells must be changed through lock_piece, clear_lines, set_cell or whole
+    row assignment (grid[y] = row) so the masks and counters stay in sync.
+    
+    The large gains are in finding full rows and column heights. A single
+    collision check is dominated by the Python call, so it is only about 1.4x
+    faster than on a list grid (an AND of one integer for the whole board was
+    not faster), and clear_lines costs about the same on both backends.
+    """
+    
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT):
+        """
+        Create an empty grid.
+        
+        Args:
+            width: Number of columns
+            height: Number of rows
+        """
+        self.width = width
+        self.height = height
+        self.full_mask = (1 << width) - 1
+        self.rows = [0] * height
+        self.cells = [[0] * width for _ in range(height)]
+        self.heights = [0] * width
+        self.full_rows = set()
+    
+    @classmethod
+    def from_list(cls, grid):
+        """Create a bitboard grid from a list-of-lists grid"""
+        bitboard = cls(len(grid[0]), len(grid))
+        for y, row in enumerate(grid):
+            row = list(row)
+            bitboard.cells[y] = row
+            bitboard.rows[y] = bitboard._row_mask(row)
+        bitboard._recount()
+        return bitboard
+    
+    def to_list(self):
+        """Return a list-of-lists copy of the grid cells"""
+        return [list(row) for row in self.cells]
+    
+    def set_cell(self, x, y, value):
+        """Set a single cell, keeping the row mask and counters in sync"""
+        self.cells[y][x] = value
+        bit = 1 << x
+        occupied = self.rows[y] & bit
+        if value != 0 and not occupied:
+            self.rows[y] |= bit
+            if self.rows[y] == self.full_mask:
+                self.full_rows.add(y)
+            if self.heights[x] < self.height - y:
+                self.heights[x] = self.height - y
+        elif value == 0 and occupied:
+            self.rows[y] &= ~bit
+            self.full_rows.discard(y)
+            if self.heights[x] == self.height - y:
+                self.heights[x] = self._column_height(x)
+    
+    def clear_rows(self, lines_to_clear):
+        """
+        Remove rows and add empty rows at the top, updating the counters.
+        
+        Args:
+            lines_to_clear: Row indices sorted in descending order
+        """
+        height = self.height
+        count = len(lines_to_clear)
         
-        # Rotate each block position around the origin
-        # (x, y) -> (y, -x) for 90-degree clockwise rotation
-        rotated_blocks = []
-        for (dx, dy), block in self.blocks:
-            new_dx = dy
-            new_dy = -dx
-            # Rotate the block's sprite as well
-            block.rotate_clockwise()
-            rotated_blocks.append(((new_dx, new_dy), block))
+        # Remove lines from bottom to top, each replaced by an empty row at
+        # the top, which moves the rows above (the next lines) down by one
+        cells = self.cells
+        rows = self.rows
+        width = self.width
+        for shift, y in enumerate(lines_to_clear):
+            del cells[y + shift]
+            del rows[y + shift]
+            cells.insert(0, [0] * width)
+            rows.insert(0, 0)
         
-        # Normalize to keep top-left aligned
-        min_x = min(dx for (dx, dy), block in rotated_blocks)
-        min_y = min(dy for (dx, dy), block in rotated_blocks)
+        # Every column top moves down by the number of cleared rows below it:
+        # all of them for tops above the topmost cleared row (the common
+        # case), otherwise looked up in below. Columns whose top block was
+        # cleared get their new top from one scan afterwards.
+        heights = self.heights
+        taller = height - lines_to_clear[-1]
+        below = None
+        rescan = 0
+        for x, column_height in enumerate(heights):
+            if column_height > taller:
+                heights[x] = column_height - count
+            elif column_height:
+                top = height - column_height
+                if top in lines_to_clear:
+                    rescan |= 1 << x
+                else:
+                    if below is None:
+                        below = self._cleared_below(lines_to_clear)
+                    heights[x] = column_height - below[top]
+        if rescan:
+            # They still hold their old heights, so no new top lies above this row
+            self._rescan_heights(rescan, height - max(heights))
         
-        self.blocks = [
-            ((dx - min_x, dy - min_y), block) 
-            for (dx, dy), block in rotated_blocks
-        ]
+        # Full rows that were not cleared move down with the rest
+        full_rows = self.full_rows
+        full_rows.difference_update(lines_to_clear)
+        if full_rows:
+            below = below or self._cleared_below(lines_to_clear)
+            self.full_rows = {y + below[y] for y in full_rows}
+    
+    def _cleared_below(self, lines_to_clear):
+        """
+        Count the cleared rows below every row, one slice per cleared row.
+        
+        Returns:
+            List where a kept row y moves down to y + below[y]
+        """
+        below = [0] * self.height
+        for cleared_below, y in enumerate(lines_to_clear, 1):
+            below[:y] = [cleared_below] * y
+        return below
+    
+    def _rescan_heights(self, columns, start=0):
+        """
+        Find the top block of several columns in one scan down the rows.
+        
+        Args:
+            columns: Bit mask of the columns
+            start: First row that can hold one of their top blocks
+        """
+        height = self.height
+        heights = self.heights
+        rows = self.rows
+        for y in range(start, height):
+            hit = rows[y] & columns
+            if hit:
+                columns &= ~hit
+                while hit:
+                    bit = hit & -hit
+                    heights[bit.bit_length() - 1] = height - y
+                    hit ^= bit
+                if not columns:
+                    return
+        while columns:
+            bit = columns & -columns
+            heights[bit.bit_length() - 1] = 0
+            columns ^= bit
+    
+    @property
+    def row_counts(self):
+        """Number of filled cells in each row"""
+        return [row.bit_count() for row in self.rows]
+    
+    def _column_height(self, x):
+        """Scan column x from the top for its height"""
+        bit = 1 << x
+        for y, row in enumerate(self.rows):
+            if row & bit:
+                return self.height - y
+        return 0
+    
+    def _recount(self):
+        """Rebuild all counters from the row masks"""
+        full_mask = self.full_mask
+        self.full_rows = {y for y, row in enumerate(self.rows) if row == full_mask}
+        self.heights = [self._column_height(x) for x in range(self.width)]
+    
+    def _row_mask(self, row):
+        mask = 0
+        for x, cell in enumerate(row):
+            if cell != 0:
+                mask |= 1 << x
+        return mask
+    
+    def __getitem__(self, y):
+        return self.cells[y]
+    
+    def __setitem__(self, y, row):
+        row = list(row)
+        self.cells[y] = row
+        self.rows[y] = self._row_mask(row)
+        self._recount()
+    
+    def __delitem__(self, y):
+        del self.cells[y]
+        del self.rows[y]
+        self._recount()
+    
+    def insert(self, y, row):
+        """Insert a row of cells before index y (list compatible)"""
+        row = list(row)
+        self.cells.insert(y, row)
+        self.rows.insert(y, self._row_mask(row))
+        self._recount()
+    
+    def __len__(self):
+        return len(self.cells)
+    
+    def __iter__(self):
+        return iter(self.cells)
+    
+    def __eq__(self, other):
+        if isinstance(other, BitboardGrid):
+            return self.cells == other.cells
+        return self.cells == other
 
 
 def check_collision(piece, grid, dx=0, dy=0):
     """Check if the piece would collide with the grid or boundaries at the new position"""
-    for bx, by in piece.get_blocks():
-        new_x = bx + dx
-        new_y = by + dy
+    return state_collides(piece.state, grid, piece.x + dx, piece.y + dy)
+
+
+def state_collides(state, grid, new_x, new_y):
+    """
+    Check if a rotation state placed at (new_x, new_y) collides with the grid or boundaries.
+    
+    Args:
+        state: A RotationState from ROTATIONS
+        grid: The game grid (list of lists or BitboardGrid)
+        new_x: Column of the piece origin
+        new_y: Row of the piece origin
+    """
+    if isinstance(grid, BitboardGrid):
+        # Check boundaries against the bounding box
+        if new_x < 0 or new_x + state.width > grid.width:
+            return True
+        if new_y + state.height > grid.height:
+            return True
+        
+        # AND the shifted piece rows against the locked rows (only within grid)
+        rows = grid.rows
+        y = new_y
+        for mask in state.row_masks:
+            if y >= 0 and rows[y] & (mask << new_x):
+                return True
+            y += 1
+        return False
+    
+    for bx, by in state.offsets:
+        bx += new_x
+        by += new_y
         
         # Check boundaries
-        if new_x < 0 or new_x >= GRID_WIDTH:
+        if bx < 0 or bx >= GRID_WIDTH:
             return True
-        if new_y >= GRID_HEIGHT:
+        if by >= GRID_HEIGHT:
             return True
         
         # Check collision with locked pieces (only if within grid)
-        if new_y >= 0 and grid[new_y][new_x] != 0:
+        if by >= 0 and grid[by][bx] != 0:
             return True
     
     return False
 
 
+def landing_row(state, grid, x, y):
+    """
+    Row where a rotation state at (x, y) comes to rest when dropped straight down.
+    
+    Uses the per-column bottom offsets of the state and the column heights of
+    the grid. When the piece is below the top of one of its columns (tucked
+    under an overhang) the heights don't apply, so it falls back to stepping
+    down with collision checks, which keeps the result exact.
+    """
+    if isinstance(grid, BitboardGrid):
+        heights = grid.heights
+        rows_count = grid.height
+        in_bounds = 0 <= x and x + state.width <= grid.width
+    else:
+        heights = None
+        rows_count = GRID_HEIGHT
+        in_bounds = 0 <= x and x + state.width <= GRID_WIDTH
+    
+    landing = rows_count
+    if in_bounds:
+        for column, bottom in enumerate(state.bottom):
+            if heights is not None:
+                top = rows_count - heights[x + column]
+            else:
+                top = _column_top(grid, x + column)
+            if y + bottom >= top:
+                # Piece is under an overhang in this column
+                landing = None
+                break
+            # Lowest origin row where this column's bottom block rests on the top
+            if top - 1 - bottom < landing:
+                landing = top - 1 - bottom
+        if landing is not None:
+            return landing
+    
+    # Exact fallback: move down until the next row collides
+    while not state_collides(state, grid, x, y + 1):
+        y += 1
+    return y
+
+
+def _column_top(grid, x):
+    """Row of the top block in column x of a list grid (GRID_HEIGHT if empty)"""
+    for y in range(GRID_HEIGHT):
+        if grid[y][x] != 0:
+            return y
+    return GRID_HEIGHT
+
+
+def drop_distance(piece, grid):
+    """
+    Number of rows the piece can fall before it lands.
+    
+    Used by hard drop and ghost-piece rendering. See landing_row.
+    """
+    return landing_row(piece.state, grid, piece.x, piece.y) - piece.y
+
+
 def lock_piece(piece, grid):
     """
     Lock the current piece into the grid.
     Stores Block objects to preserve sprite information.
     """
+    bitboard = isinstance(grid, BitboardGrid)
     for (dx, dy), block in piece.blocks:
         bx = piece.x + dx
         by = piece.y + dy
         if by >= 0:  # Only lock blocks that are visible
-            grid[by][bx] = block
+            if bitboard:
+                # Updates the row counts, column heights and full rows for
+                # just the rows this piece touches
+                grid.set_cell(bx, by, block)
+            else:
+                grid[by][bx] = block
+
+
+def try_rotate(piece, grid):
+    """
+    Rotate the piece clockwise, trying wall kicks if the rotation collides.
+    
+    Args:
+        piece: The piece to rotate
+        grid: The game grid
+    
+    Returns:
+        True if the piece was rotated, False if it was left unchanged
+    """
+    # Save current state in case rotation fails
+    old_rotation = piece.rotation
+    piece.rotate()
+    
+    # Check if rotation is valid
+    if not check_collision(piece, grid, 0, 0):
+        return True
+    
+    # Try wall kicks
+    for dx, dy in WALL_KICK_OFFSETS:
+        if not check_collision(piece, grid, dx, dy):
+            piece.move(dx, dy)
+            return True
+    
+    # If no wall kick worked, revert rotation
+    piece.rotation = old_rotation
+    return False
 
 
 def check_lines(grid):
     """Check for completed lines and return a list of line indices to clear"""
+    if isinstance(grid, BitboardGrid):
+        # Full rows are tracked incrementally as cells are locked
+        return sorted(grid.full_rows)
+    
     lines_to_clear = []
     
     # Check each row from bottom to top
@@ -183,13 +636,16 @@ def clear_lines(lines_to_clear, grid, game_state):
     # This ensures we delete from bottom to top so indices don't shift
     lines_to_clear.sort(reverse=True)
     
-    # Remove completed lines from bottom to top
-    for y in lines_to_clear:
-        del grid[y]
-    
-    # Add empty lines at the top for each cleared line
-    for _ in range(len(lines_to_clear)):
-        grid.insert(0, [0 for _ in range(GRID_WIDTH)])
+    if isinstance(grid, BitboardGrid):
+        grid.clear_rows(lines_to_clear)
+    else:
+        # Remove completed lines from bottom to top
+        for y in lines_to_clear:
+            del grid[y]
+        
+        # Add empty lines at the top for each cleared line
+        for _ in range(len(lines_to_clear)):
+            grid.insert(0, [0 for _ in range(GRID_WIDTH)])
     
     # Update lines cleared count
     num_lines = len(lines_to_clear)
@@ -213,24 +669,183 @@ def clear_lines(lines_to_clear, grid, game_state):
         game_state['fall_speed'] = INITIAL_FALL_SPEED * (SPEED_MULTIPLIER ** (game_state['level'] - 1))
 
 
-def spawn_piece(game_state, grid, sprite_manager=None):
+class PieceGenerator:
+    """
+    Seedable stream of shape types.
+    
+    Shapes are generated in bulk into an array of indices into SHAPE_TYPES,
+    so next_shape() only advances a position in the pre-generated queue.
+    Subclasses implement _generate(count).
+    
+    The first refill is small, so a new generator (one per game) is cheap,
+    and every refill doubles up to MAX_CHUNK_SIZE for long streams. How the
+    stream is chunked does not change the pieces.
+    """
+    
+    # Pieces generated by the first and the largest refill of an empty queue
+    CHUNK_SIZE = 16
+    MAX_CHUNK_SIZE = 1024
+    
+    def __init__(self, seed=None, rng=None):
+        """
+        Create a generator.
+        
+        Args:
+            seed: Seed for a new random generator (None for a random seed)
+            rng: Existing random.Random instance to draw from instead
+        """
+        self.rng = rng if rng is not None else random.Random(seed)
+        self._queue = array('B')
+        self._position = 0
+        self._chunk_size = self.CHUNK_SIZE
+    
+    def _generate(self, count):
+        """Return an array('B') with the next count shape indices of the stream"""
+        raise NotImplementedError
+    
+    def next_shape(self):
+        """Get the next shape type"""
+        if self._position >= len(self._queue):
+            self._queue = self._generate(self._chunk_size)
+            self._position = 0
+            self._chunk_size = min(self._chunk_size * 2, self.MAX_CHUNK_SIZE)
+        index = self._queue[self._position]
+        self._position += 1
+        return SHAPE_TYPES[index]
+    
+    def generate(self, count):
+        """
+        Pre-generate and take the next count pieces of the stream.
+        
+        Returns:
+            array('B') of indices into SHAPE_TYPES, in spawn order
+        """
+        available = len(self._queue) - self._position
+        if available < count:
+            self._queue = self._queue[self._position:]
+            self._queue.extend(self._generate(count - available))
+            self._position = 0
+        pieces = self._queue[self._position:self._position + count]
+        self._position += count
+        return pieces
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        return self.next_shape()
+
+
+class UniformGenerator(PieceGenerator):
+    """Every shape is picked independently with equal probability"""
+    
+    def _generate(self, count):
+        randrange = self.rng.randrange
+        shapes = len(SHAPE_TYPES)
+        return array('B', [randrange(shapes) for _ in range(count)])
+
+
+class BagGenerator(PieceGenerator):
+    """7-bag randomizer: deals shuffled bags that contain every shape once"""
+    
+    def __init__(self, seed=None, rng=None):
+        super().__init__(seed, rng)
+        self._bag = array('B')
+    
+    def _generate(self, count):
+        pieces = self._bag
+        while len(pieces) < count:
+            bag = list(range(len(SHAPE_TYPES)))
+            self.rng.shuffle(bag)
+            pieces.extend(bag)
+        # Keep the rest of a started bag for the next call
+        self._bag = pieces[count:]
+        return pieces[:count]
+
+
+class HistoryGenerator(PieceGenerator):
+    """
+    History randomizer: rerolls shapes among the last few pieces.
+    
+    Each piece is drawn up to `rolls` times until it isn't one of the last
+    `history` pieces, which makes droughts and repeats rare but not impossible.
+    """
+    
+    def __init__(self, seed=None, rng=None, history=4, rolls=4):
+        super().__init__(seed, rng)
+        self.rolls = rolls
+        self._history = deque(maxlen=history)
+    
+    def _generate(self, count):
+        randrange = self.rng.randrange
+        shapes = len(SHAPE_TYPES)
+        history = self._history
+        pieces = array('B')
+        for _ in range(count):
+            for _ in range(self.rolls):
+                index = randrange(shapes)
+                if index not in history:
+                    break
+            history.append(index)
+            pieces.append(index)
+        return pieces
+
+
+# Piece generator strategies by name
+GENERATORS = {
+    GENERATOR_UNIFORM: UniformGenerator,
+    GENERATOR_BAG: BagGenerator,
+    GENERATOR_HISTORY: HistoryGenerator,
+}
+
+
+def create_generator(kind=GENERATOR_UNIFORM, seed=None, rng=None):
+    """
+    Create a piece generator.
+    
+    Args:
+        kind: A key of GENERATORS, or a PieceGenerator subclass
+        seed: Seed for a new random generator
+        rng: Existing random.Random instance to draw from instead
+    
+    Returns:
+        A PieceGenerator
+    """
+    if isinstance(kind, str):
+        if kind not in GENERATORS:
+            raise ValueError(f"Unknown piece generator {kind!r} (use one of {', '.join(GENERATORS)})")
+        kind = GENERATORS[kind]
+    return kind(seed=seed, rng=rng)
+
+
+def spawn_piece(game_state, grid, sprite_manager=None, rng=None):
     """Spawn a new piece
     
     Args:
         game_state: Dictionary containing current_piece, next_piece, game_over, fall_timer
         grid: The game grid
         sprite_manager: Optional sprite manager to create pieces with sprites
+        rng: Optional PieceGenerator or random.Random instance picking the
+            shapes uniformly (defaults to the global random module)
     """
+    if rng is None:
+        rng = random
+    if isinstance(rng, PieceGenerator):
+        next_shape = rng.next_shape
+    else:
+        def next_shape():
+            return rng.choice(SHAPE_TYPES)
+    
     if game_state['next_piece'] is None:
         # First piece - create both current and next
-        game_state['current_piece'] = Piece(random.choice(list(SHAPES.keys())), sprite_manager)
-        game_state['next_piece'] = Piece(random.choice(list(SHAPES.keys())), sprite_manager)
+        game_state['current_piece'] = Piece(next_shape(), sprite_manager)
+        game_state['next_piece'] = Piece(next_shape(), sprite_manager)
     else:
         # Use the next piece as current, generate new next
         game_state['current_piece'] = game_state['next_piece']
         game_state['current_piece'].x = GRID_WIDTH // 2 - 2
         game_state['current_piece'].y = 0
-        game_state['next_piece'] = Piece(random.choice(list(SHAPES.keys())), sprite_manager)
+        game_state['next_piece'] = Piece(next_shape(), sprite_manager)
         
         # Check for game over - if new piece collides immediately
         if check_collision(game_state['current_piece'], grid, 0, 0):
@@ -238,3 +853,226 @@ def spawn_piece(game_state, grid, sprite_manager=None):
     
     # Reset fall timer for consistent timing
     game_state['fall_timer'] = 0
+
+
+def column_heights(grid):
+    """
+    Get the height of every column (0 for an empty column).
+    
+    O(1) for a BitboardGrid, which keeps the heights up to date; list grids
+    are scanned.
+    """
+    if isinstance(grid, BitboardGrid):
+        return grid.heights
+    heights = []
+    for x in range(GRID_WIDTH):
+        height = 0
+        for y in range(GRID_HEIGHT):
+            if grid[y][x] != 0:
+                height = GRID_HEIGHT - y
+                break
+        heights.append(height)
+    return heights
+
+
+def create_grid(bitboard=False):
+    """
+    Create an empty game grid.
+    
+    Args:
+        bitboard: Use the BitboardGrid backend instead of a list of lists
+    """
+    if bitboard:
+        return BitboardGrid()
+    return [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+
+
+def new_game_state():
+    """Create the game state dictionary for a fresh game"""
+    return {
+        'current_piece': None,
+        'next_piece': None,
+        'fall_timer': 0,
+        'game_over': False,
+        'score': 0,
+        'level': 1,
+        'lines_cleared': 0,
+        'fall_speed': INITIAL_FALL_SPEED
+    }
+
+
+class GameSession:
+    """
+    A self-contained game: grid, pieces, score/level and random generator.
+    
+    Has no display dependency, so many sessions can run side by side in one
+    process for simulations and bots. The Pygame Zero frontend drives one
+    session through tick() and step().
+    
+    Time advances in fixed TICK_TIME steps: tick(dt) accumulates real time and
+    runs the whole steps it covers, so the fall rate does not depend on the
+    frame rate. advance() runs steps directly for headless runs.
+    """
+    
+    def __init__(self, seed=None, sprite_manager=None, bitboard=True, generator=GENERATOR_UNIFORM):
+        """
+        Initialize a session and spawn the first piece.
+        
+        Args:
+            seed: Seed for the session's random generator (None for a random seed)
+            sprite_manager: Optional sprite manager to create pieces with sprites
+            bitboard: Use the BitboardGrid backend (faster for headless runs)
+            generator: Piece generator strategy, see create_generator
+        """
+        self.sprite_manager = sprite_manager
+        self.bitboard = bitboard
+        self.generator_kind = generator
+        self.reset(seed)
+    
+    def reset(self, seed=None):
+        """
+        Start a new game.
+        
+        Args:
+            seed: New seed, or None to keep the generator running from its current state
+        """
+        if seed is not None or not hasattr(self, 'rng'):
+            self.seed = seed
+            self.rng = random.Random(seed)
+            self.generator = create_generator(self.generator_kind, rng=self.rng)
+        self.grid = create_grid(self.bitboard)
+        self.game_state = new_game_state()
+        self.pieces_placed = 0
+        self.ticks = 0
+        self.accumulator = 0.0
+        spawn_piece(self.game_state, self.grid, self.sprite_manager, self.generator)
+    
+    @property
+    def game_over(self):
+        """True once a new piece could not be spawned"""
+        return self.game_state['game_over']
+    
+    def step(self, action):
+        """
+        Apply a player action to the current piece.
+        
+        Args:
+            action: One of ACTIONS
+        
+        Returns:
+            True if the action changed the piece, False if it was blocked
+        """
+        game_state = self.game_state
+        current_piece = game_state['current_piece']
+        if current_piece is None or game_state['game_over']:
+            return False
+        grid = self.grid
+        
+        if action == ACTION_LEFT:
+            if not check_collision(current_piece, grid, -1, 0):
+                current_piece.move(-1, 0)
+                return True
+            return False
+        
+        if action == ACTION_RIGHT:
+            if not check_collision(current_piece, grid, 1, 0):
+                current_piece.move(1, 0)
+                return True
+            return False
+        
+        if action == ACTION_ROTATE:
+            return try_rotate(current_piece, grid)
+        
+        # Soft drop (move down faster)
+        if action == ACTION_SOFT_DROP:
+            if not check_collision(current_piece, grid, 0, 1):
+                current_piece.move(0, 1)
+                game_state['score'] += SCORE_SOFT_DROP  # 1 point per cell
+                return True
+            return False
+        
+        # Hard drop (instant placement)
+        if action == ACTION_HARD_DROP:
+            # Move piece straight to its landing row, counting cells for scoring
+            cells_dropped = drop_distance(current_piece, grid)
+            current_piece.move(0, cells_dropped)
+            
+            # Add hard drop score (2 points per cell)
+            game_state['score'] += cells_dropped * SCORE_HARD_DROP
+            self._lock_current_piece()
+            return True
+        
+        raise ValueError(f"Unknown action: {action!r}")
+    
+    def tick(self, dt):
+        """
+        Advance the game by dt seconds of real time.
+        
+        Time left over after the last whole step carries over to the next call.
+        After a stall longer than MAX_CATCH_UP_TICKS steps the rest of the
+        backlog is dropped, so the game pauses instead of jumping ahead.
+        
+        Args:
+            dt: Elapsed time in seconds
+        
+        Returns:
+            Number of fixed steps run
+        """
+        self.accumulator += dt
+        steps = 0
+        while self.accumulator >= TICK_TIME:
+            if steps == MAX_CATCH_UP_TICKS:
+                self.accumulator %= TICK_TIME
+                break
+            self.accumulator -= TICK_TIME
+            self.fixed_step()
+            steps += 1
+        return steps
+    
+    @property
+    def interpolation(self):
+        """Fraction of the next step already accumulated (0 to 1), for smooth rendering"""
+        return self.accumulator / TICK_TIME
+    
+    def advance(self, steps=1):
+        """Run fixed steps directly, independent of real time (headless runs)"""
+        for _ in range(steps):
+            self.fixed_step()
+    
+    def fixed_step(self):
+        """Advance the simulation by exactly one TICK_TIME step"""
+        game_state = self.game_state
+        # Don't update if game is over
+        if game_state['game_over']:
+            return
+        
+        # Initialize the first piece if needed
+        if game_state['current_piece'] is None:
+            spawn_piece(game_state, self.grid, self.sprite_manager, self.generator)
+            return
+        
+        self.ticks += 1
+        game_state['fall_timer'] += TICK_TIME
+        
+        # Automatic falling, several cells per step once falls are faster than steps
+        while game_state['fall_timer'] >= game_state['fall_speed']:
+            game_state['fall_timer'] -= game_state['fall_speed']
+            
+            # Try to move piece down
+            if not check_collision(game_state['current_piece'], self.grid, 0, 1):
+                game_state['current_piece'].move(0, 1)
+            else:
+                # Piece can't move down - lock it and spawn new piece (resets the fall timer)
+                self._lock_current_piece()
+                break
+    
+    def _lock_current_piece(self):
+        """Lock the current piece, clear completed lines and spawn the next piece"""
+        lock_piece(self.game_state['current_piece'], self.grid)
+        self.pieces_placed += 1
+        
+        # Check and clear any completed lines
+        completed_lines = check_lines(self.grid)
+        clear_lines(completed_lines, self.grid, self.game_state)
+        
+        spawn_piece(self.game_state, self.grid, self.sprite_manager, self.generator)
@@ -2,11 +2,39 @@
 """
 Generate placeholder sprite images for Tetris furniture pieces.
 Uses brand colors and creates recognizable furniture-themed sprites.
+
+Works as a small build pipeline: pieces are rendered in a process pool, one
+job per piece and block size. A manifest records a hash of each piece's
+drawing code, palette and size, so unchanged pieces are skipped on the next
+run.
+
+Sprites are drawn at the native BLOCK_SIZE into images/pieces. Other sizes
+are smooth-scaled from those files into images/pieces/<size>, together with a
+strip of the pre-split, pre-rotated tiles that SpriteManager.scaled_atlas()
+uses instead of scaling the 48 px tiles. Their manifest entries record the
+hash of the 48 px sprite they were scaled from, so strips left over from
+older drawings are not used. The game cuts 48 px tiles itself (faster than
+decoding a strip), so no strips are written at that size.
+
+Usage:
+    python generate_sprites.py
+    python generate_sprites.py --sizes 32 48 64 --jobs 4
+    python generate_sprites.py --force
 """
 
+import argparse
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import sys
+
 import pygame
 from pygame import Surface, draw, font
-import os
+
+import asset_cache
+from sprite_manager import SPRITE_FILES, TILE_MANIFEST, SpriteManager
 
 # Initialize pygame
 pygame.init()
@@ -240,30 +268,170 @@ def create_toilet_sprite():
     
     return sprite
 
-def main():
-    """Generate all sprite images"""
-    
-    sprites = {
-        'desk.png': create_desk_sprite(),
-        'printer.png': create_printer_sprite(),
-        'shower.png': create_shower_sprite(),
-        'chair.png': create_chair_sprite(),
-        'cabinet.png': create_cabinet_sprite(),
-        'sink.png': create_sink_sprite(),
-        'toilet.png': create_toilet_sprite()
-    }
-    
-    # Save all sprites
-    output_dir = 'images/pieces'
-    os.makedirs(output_dir, exist_ok=True)
-    
-    for filename, sprite in sprites.items():
-        filepath = os.path.join(output_dir, filename)
-        pygame.image.save(sprite, filepath)
-        print(f"Created: {filepath} ({sprite.get_width()}x{sprite.get_height()})")
+# Drawing function of each piece, the file names come from SPRITE_FILES
+SPRITE_CREATORS = {
+    'I': create_desk_sprite,
+    'O': create_printer_sprite,
+    'T': create_shower_sprite,
+    'L': create_chair_sprite,
+    'J': create_cabinet_sprite,
+    'S': create_sink_sprite,
+    'Z': create_toilet_sprite
+}
+
+# Bump when the output of the pipeline changes without the drawing code changing
+PIPELINE_VERSION = 2
+
+
+def output_paths(shape_type, block_size):
+    """Sprite and tile strip paths of a piece, relative to the pieces directory"""
+    filename = os.path.basename(SPRITE_FILES[shape_type])
+    directory = '' if block_size == BLOCK_SIZE else str(block_size)
+    return os.path.join(directory, filename), os.path.join(directory, 'tiles', filename)
+
+
+def piece_hash(shape_type, block_size):
+    """
+    Hash everything a piece's images depend on.
+    
+    Covers the piece's drawing function, the palette, the tile cutting code,
+    the block size and the pygame version (it renders the labels).
+    """
+    palette = sorted((name, value) for name, value in globals().items()
+                     if name.isupper() and isinstance(value, tuple))
+    digest = hashlib.sha256(f"v{PIPELINE_VERSION} {pygame.version.ver} {block_size}".encode())
+    digest.update(repr(palette).encode())
+    digest.update(inspect.getsource(SPRITE_CREATORS[shape_type]).encode())
+    digest.update(inspect.getsource(SpriteManager._cut_tiles).encode())
+    return digest.hexdigest()[:16]
+
+
+def render_piece(job):
+    """
+    Render one piece at one block size and write its sprite and tile strip.
+    
+    Runs in a worker process. Sizes other than BLOCK_SIZE are scaled from
+    the piece's native sprite file, which must be rendered first.
+    
+    Args:
+        job: (shape_type, block_size, pieces_dir) tuple
+    
+    Returns:
+        (manifest key, manifest entry) tuple
+    """
+    shape_type, block_size, pieces_dir = job
+    sprite_path, tiles_path = output_paths(shape_type, block_size)
+    entry = {'hash': piece_hash(shape_type, block_size), 'sprite': sprite_path}
+    if block_size == BLOCK_SIZE:
+        sprite = SPRITE_CREATORS[shape_type]()
+    else:
+        source_path = os.path.join(pieces_dir, output_paths(shape_type, BLOCK_SIZE)[0])
+        source = pygame.image.load(source_path)
+        size = (source.get_width() * block_size // BLOCK_SIZE, source.get_height() * block_size // BLOCK_SIZE)
+        sprite = pygame.transform.smoothscale(source, size)
+        entry['source_hash'] = asset_cache.source_hash([source_path])
+    
+    os.makedirs(os.path.join(pieces_dir, os.path.dirname(sprite_path)), exist_ok=True)
+    pygame.image.save(sprite, os.path.join(pieces_dir, sprite_path))
+    entry['sprite_hash'] = asset_cache.source_hash([os.path.join(pieces_dir, sprite_path)])
+    if block_size == BLOCK_SIZE:
+        return f'{shape_type}@{block_size}', entry
+    
+    # Pre-split and pre-rotated tiles, side by side in one strip
+    os.makedirs(os.path.join(pieces_dir, os.path.dirname(tiles_path)), exist_ok=True)
+    tiles = SpriteManager._cut_tiles(shape_type, sprite, block_size)
+    keys = sorted(tiles)
+    strip = Surface((len(keys) * block_size, block_size), pygame.SRCALPHA)
+    for index, key in enumerate(keys):
+        strip.blit(tiles[key], (index * block_size, 0))
+    pygame.image.save(strip, os.path.join(pieces_dir, tiles_path))
+    
+    entry['tiles'] = os.path.relpath(tiles_path, os.path.dirname(sprite_path))
+    entry['tile_keys'] = [','.join(str(part) for part in key) for key in keys]
+    return f'{shape_type}@{block_size}', entry
+
+
+def pending_jobs(manifest, sizes, pieces_dir, force=False):
+    """
+    Jobs for pieces whose manifest entry is missing, outdated or whose files are gone.
+    
+    Scaled pieces are also outdated when their native sprite changed since
+    they were scaled, so render the native size before checking the others.
+    """
+    jobs = []
+    for block_size in sizes:
+        for shape_type in SPRITE_CREATORS:
+            entry = manifest.get(f'{shape_type}@{block_size}')
+            sprite_path, tiles_path = output_paths(shape_type, block_size)
+            up_to_date = (
+                entry is not None
+                and entry['hash'] == piece_hash(shape_type, block_size)
+                and os.path.exists(os.path.join(pieces_dir, sprite_path))
+            )
+            if up_to_date and block_size != BLOCK_SIZE:
+                source_path = os.path.join(pieces_dir, output_paths(shape_type, BLOCK_SIZE)[0])
+                up_to_date = (
+                    os.path.exists(os.path.join(pieces_dir, tiles_path))
+                    and os.path.exists(source_path)
+                    and entry.get('source_hash') == asset_cache.source_hash([source_path])
+                )
+            if force or not up_to_date:
+                jobs.append((shape_type, block_size, pieces_dir))
+    return jobs
+
+
+def main(argv=None):
+    """Generate the sprite images and tiles that are out of date"""
+    parser = argparse.ArgumentParser(description="Render piece sprites and their pre-rotated tiles")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[BLOCK_SIZE],
+                        help=f"block sizes in pixels (default: {BLOCK_SIZE})")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="re-render pieces even if unchanged")
+    args = parser.parse_args(argv)
+    
+    pieces_dir = os.path.dirname(TILE_MANIFEST)
+    try:
+        with open(TILE_MANIFEST) as manifest_file:
+            manifest = json.load(manifest_file)['pieces']
+    except (OSError, ValueError, KeyError):
+        manifest = {}
+    
+    # Native sprites first, the other sizes are scaled from them
+    scaled_sizes = [size for size in args.sizes if size != BLOCK_SIZE]
+    total = (len(scaled_sizes) + 1) * len(SPRITE_CREATORS)
+    rendered = 0
+    for sizes in ([BLOCK_SIZE], scaled_sizes):
+        jobs = pending_jobs(manifest, sizes, pieces_dir, args.force)
+        if not jobs:
+            continue
+        if args.jobs > 1 and len(jobs) > 1:
+            # Close and join instead of leaving the pool with the with block:
+            # its terminate() sends SIGTERM, which the workers ignore because
+            # they inherit the handler pygame.init() installed
+            pool = multiprocessing.Pool(min(args.jobs, len(jobs)))
+            try:
+                results = pool.map(render_piece, jobs)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [render_piece(job) for job in jobs]
+        
+        for key, entry in results:
+            manifest[key] = entry
+            tiles = f" ({len(entry['tile_keys'])} tiles)" if 'tile_keys' in entry else ''
+            print(f"Created: {os.path.join(pieces_dir, entry['sprite'])}{tiles}")
+        rendered += len(jobs)
+        
+        with open(TILE_MANIFEST + '.tmp', 'w') as manifest_file:
+            json.dump({'version': PIPELINE_VERSION, 'pieces': dict(sorted(manifest.items()))},
+                      manifest_file, indent=1)
+        os.replace(TILE_MANIFEST + '.tmp', TILE_MANIFEST)
     
     pygame.quit()
-    print(f"\nSuccessfully generated {len(sprites)} sprite images!")
+    print(f"\nGenerated {rendered} of {total} piece images, {total - rendered} were up to date")
+    return 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
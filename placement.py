@@ -0,0 +1,141 @@
+"""
+Placement enumerator for HaHa Hausservice Haubentaucher Tetris bots
+
+Finds every final resting position a piece can reach from where it is, together
+with the shortest input sequence that gets it there. Movement follows the game
+rules exactly: left/right shifts, soft drops and clockwise rotation with the
+same wall kicks as try_rotate (WALL_KICK_OFFSETS).
+"""
+
+from collections import deque, namedtuple
+
+from game_logic import (
+    GRID_WIDTH, GRID_HEIGHT, WALL_KICK_OFFSETS, ACTION_LEFT, ACTION_RIGHT,
+    ACTION_ROTATE, ACTION_SOFT_DROP, ACTION_HARD_DROP, BitboardGrid, landing_row
+)
+
+# A reachable final resting position
+# rotation: rotation index into piece.states
+# x, y: piece origin where it locks
+# actions: inputs from the piece's current position, ending with a hard drop
+Placement = namedtuple('Placement', ['rotation', 'x', 'y', 'actions'])
+
+
+def find_placements(grid, piece, soft_drop=True):
+    """
+    Enumerate every legal final resting placement of a piece.
+    
+    Runs a breadth-first search over (x, y, rotation) states starting at the
+    piece's current position, so each placement comes with the shortest input
+    sequence that reaches it. Visited states and landing rows are memoized.
+    
+    Args:
+        grid: The game grid (list of lists or BitboardGrid)
+        piece: The piece to place (not modified)
+        soft_drop: Also explore soft drops, which finds tucks under overhangs
+            and spins. Without it only rotations and shifts at the current
+            height are tried before the hard drop, which is much faster.
+    
+    Returns:
+        List of Placement tuples, in BFS order (shortest input sequences first)
+    """
+    states = piece.states
+    rotation_count = len(states)
+    if isinstance(grid, BitboardGrid):
+        rows = grid.rows
+        width, height = grid.width, grid.height
+    else:
+        rows = [sum(1 << x for x, cell in enumerate(row) if cell != 0) for row in grid]
+        width, height = GRID_WIDTH, GRID_HEIGHT
+    
+    # Bitmask of the origin columns where each (rotation, y) fits, filled on
+    # demand. A block at offset (dx, dy) collides at origin x when grid row
+    # y + dy has bit x + dx set, so ORing the grid rows shifted right by dx
+    # gives every blocked origin of the row at once.
+    free_masks = {}
+    
+    def free_mask(rotation, y):
+        key = (rotation, y)
+        mask = free_masks.get(key)
+        if mask is None:
+            state = states[rotation]
+            if y + state.height > height:
+                mask = 0
+            else:
+                blocked = 0
+                for dx, dy in state.offsets:
+                    if y + dy >= 0:
+                        blocked |= rows[y + dy] >> dx
+                mask = ~blocked & ((1 << (width - state.width + 1)) - 1)
+            free_masks[key] = mask
+        return mask
+    
+    def fits(x, y, rotation):
+        return x >= 0 and free_mask(rotation, y) >> x & 1
+    
+    start = (piece.x, piece.y, piece.rotation)
+    if not fits(*start):
+        return []
+    
+    # Landing row of every (x, y, rotation) state seen so far
+    landing_rows = {}
+    
+    def landing_y(x, y, rotation):
+        """Row where a hard drop from (x, y) ends, memoized per state"""
+        key = (x, y, rotation)
+        landing = landing_rows.get(key)
+        if landing is None:
+            landing = landing_row(states[rotation], grid, x, y)
+            landing_rows[key] = landing
+        return landing
+    
+    def rotate(x, y, rotation):
+        """Apply a clockwise rotation with wall kicks, like try_rotate"""
+        new_rotation = (rotation + 1) % rotation_count
+        if fits(x, y, new_rotation):
+            return (x, y, new_rotation)
+        for dx, dy in WALL_KICK_OFFSETS:
+            if fits(x + dx, y + dy, new_rotation):
+                return (x + dx, y + dy, new_rotation)
+        return None
+    
+    # parents maps each visited state to (previous state, action)
+    parents = {start: None}
+    queue = deque([start])
+    placements = {}
+    
+    def visit(next_state, current, action):
+        if next_state not in parents:
+            parents[next_state] = (current, action)
+            queue.append(next_state)
+    
+    while queue:
+        current = queue.popleft()
+        x, y, rotation = current
+        
+        landing = landing_y(x, y, rotation)
+        final = (rotation, x, landing)
+        if final not in placements:
+            placements[final] = current
+        
+        here = free_mask(rotation, y)
+        if x > 0 and here >> (x - 1) & 1:
+            visit((x - 1, y, rotation), current, ACTION_LEFT)
+        if here >> (x + 1) & 1:
+            visit((x + 1, y, rotation), current, ACTION_RIGHT)
+        if rotation_count > 1:
+            rotated = rotate(x, y, rotation)
+            if rotated is not None:
+                visit(rotated, current, ACTION_ROTATE)
+        if soft_drop and landing != y:
+            visit((x, y + 1, rotation), current, ACTION_SOFT_DROP)
+    
+    result = []
+    for (rotation, x, y), reached in placements.items():
+        actions = [ACTION_HARD_DROP]
+        while parents[reached] is not None:
+            reached, action = parents[reached]
+            actions.append(action)
+        actions.reverse()
+        result.append(Placement(rotation, x, y, actions))
+    return result
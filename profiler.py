@@ -0,0 +1,210 @@
+"""
+Frame time and hot path profiler for HaHa Hausservice Haubentaucher Tetris
+
+Counts calls and perf_counter_ns time per section: update() and draw() are
+timed by the game loop, the game logic hot paths (check_collision,
+check_lines, clear_lines, spawn_piece) by wrapping the module functions with
+instrument(). Section times are inclusive, spawn_piece contains the
+check_collision call it makes.
+
+Nothing is wrapped until instrument() is called, and the game loop only checks
+whether a profiler exists, so the game runs at full speed with profiling off.
+
+The numbers can be shown as an on-screen overlay (FPS, p50/p99 frame time,
+blit count) and are periodically written to a file in the Prometheus text
+exposition format, e.g. for the node exporter's textfile collector.
+"""
+
+import functools
+import os
+import time
+from collections import deque
+
+from stats import percentile
+
+# Game logic functions timed by instrument(), all called through module globals
+HOT_PATHS = ('check_collision', 'check_lines', 'clear_lines', 'spawn_piece')
+
+# Frame times kept for FPS and percentiles (10 seconds at 60 FPS)
+FRAME_WINDOW = 600
+
+# Seconds between metric file exports and overlay text refreshes
+EXPORT_INTERVAL = 5.0
+OVERLAY_INTERVAL = 0.25
+
+# Prefix of every exported metric name
+METRIC_PREFIX = 'tetris'
+
+
+class Profiler:
+    """
+    Collects section timings, frame times and gauges.
+    
+    calls and total_ns map a section name to its call count and summed time in
+    nanoseconds; gauges holds the latest value of things like the blit count.
+    """
+    
+    def __init__(self, frame_window=FRAME_WINDOW):
+        """
+        Args:
+            frame_window: Number of recent frames used for FPS and percentiles
+        """
+        self.calls = {}
+        self.total_ns = {}
+        self.gauges = {}
+        self.frame_times = deque(maxlen=frame_window)
+        self.frame_count = 0
+        self.frame_total_ns = 0
+        self._last_frame = None
+        self._patched = []
+        self._next_export = 0.0
+        self._overlay = []
+        self._next_overlay = 0.0
+    
+    def record(self, name, elapsed_ns):
+        """Add one call of a section that took elapsed_ns nanoseconds"""
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.total_ns[name] = self.total_ns.get(name, 0) + elapsed_ns
+    
+    def timed(self, name, function):
+        """Wrap a function so every call is recorded under name"""
+        calls = self.calls
+        totals = self.total_ns
+        calls.setdefault(name, 0)
+        totals.setdefault(name, 0)
+        clock = time.perf_counter_ns
+        
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                calls[name] += 1
+                totals[name] += clock() - started
+        
+        return wrapper
+    
+    def instrument(self, module, names=HOT_PATHS):
+        """
+        Replace module functions with timed wrappers.
+        
+        Only callers that look the function up through the module's globals
+        are timed; names imported with "from module import" keep the original.
+        
+        Args:
+            module: Module whose functions to wrap (e.g. game_logic)
+            names: Function names to wrap
+        """
+        for name in names:
+            original = getattr(module, name)
+            self._patched.append((module, name, original))
+            setattr(module, name, self.timed(name, original))
+    
+    def uninstrument(self):
+        """Put back every function replaced by instrument()"""
+        for module, name, original in reversed(self._patched):
+            setattr(module, name, original)
+        self._patched = []
+    
+    def frame(self):
+        """Mark a displayed frame, the time since the previous mark is its frame time"""
+        now = time.perf_counter_ns()
+        if self._last_frame is not None:
+            elapsed = now - self._last_frame
+            self.frame_times.append(elapsed)
+            self.frame_count += 1
+            self.frame_total_ns += elapsed
+        self._last_frame = now
+    
+    def fps(self):
+        """Frames per second over the frame window"""
+        total = sum(self.frame_times)
+        return len(self.frame_times) * 1e9 / total if total else 0.0
+    
+    def frame_percentiles(self, *ps):
+        """Frame time percentiles over the frame window, in seconds"""
+        values = sorted(self.frame_times)
+        return [percentile(values, p) / 1e9 for p in ps]
+    
+    def overlay_lines(self):
+        """
+        Text lines for the on-screen overlay.
+        
+        Refreshed at most every OVERLAY_INTERVAL seconds so the overlay is
+        readable and not re-rendered every frame.
+        """
+        now = time.monotonic()
+        if now >= self._next_overlay:
+            self._next_overlay = now + OVERLAY_INTERVAL
+            p50, p99 = self.frame_percentiles(50, 99)
+            lines = [
+                f"FPS {self.fps():.0f}",
+                f"frame p50 {p50 * 1000:.1f} ms  p99 {p99 * 1000:.1f} ms",
+                f"blits {self.gauges.get('blits', 0)}",
+            ]
+            for name in sorted(self.total_ns):
+                calls = self.calls[name]
+                mean = self.total_ns[name] / calls / 1000 if calls else 0
+                lines.append(f"{name} {mean:.1f} us x{calls}")
+            self._overlay = lines
+        return self._overlay
+    
+    def to_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        prefix = METRIC_PREFIX
+        lines = [
+            f"# HELP {prefix}_section_seconds_total Time spent in profiled sections (inclusive).",
+            f"# TYPE {prefix}_section_seconds_total counter",
+        ]
+        for name in sorted(self.total_ns):
+            lines.append(f'{prefix}_section_seconds_total{{section="{name}"}} {self.total_ns[name] / 1e9:.9f}')
+        lines += [
+            f"# HELP {prefix}_section_calls_total Calls of profiled sections.",
+            f"# TYPE {prefix}_section_calls_total counter",
+        ]
+        for name in sorted(self.calls):
+            lines.append(f'{prefix}_section_calls_total{{section="{name}"}} {self.calls[name]}')
+        
+        p50, p90, p99 = self.frame_percentiles(50, 90, 99)
+        lines += [
+            f"# HELP {prefix}_frame_seconds Frame time, quantiles over the last {self.frame_times.maxlen} frames.",
+            f"# TYPE {prefix}_frame_seconds summary",
+            f'{prefix}_frame_seconds{{quantile="0.5"}} {p50:.9f}',
+            f'{prefix}_frame_seconds{{quantile="0.9"}} {p90:.9f}',
+            f'{prefix}_frame_seconds{{quantile="0.99"}} {p99:.9f}',
+            f"{prefix}_frame_seconds_sum {self.frame_total_ns / 1e9:.9f}",
+            f"{prefix}_frame_seconds_count {self.frame_count}",
+            f"# HELP {prefix}_fps Frames per second over the last {self.frame_times.maxlen} frames.",
+            f"# TYPE {prefix}_fps gauge",
+            f"{prefix}_fps {self.fps():.3f}",
+        ]
+        for name in sorted(self.gauges):
+            lines += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {self.gauges[name]}"]
+        return "\n".join(lines) + "\n"
+    
+    def export(self, path):
+        """
+        Write the metrics to a file.
+        
+        The file is replaced atomically so a scraper never reads half of it.
+        
+        Returns:
+            True if the file was written
+        """
+        try:
+            with open(path + '.tmp', 'w') as metrics_file:
+                metrics_file.write(self.to_prometheus())
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Could not write metrics: {e}")
+            return False
+        return True
+    
+    def maybe_export(self, path, interval=EXPORT_INTERVAL):
+        """Export to path if interval seconds passed since the last export"""
+        now = time.monotonic()
+        if now < self._next_export:
+            return False
+        self._next_export = now + interval
+        return self.export(path)
@@ -0,0 +1,602 @@
+"""
+Dirty-rectangle renderer for HaHa Hausservice Haubentaucher Tetris
+
+The previous frame stays on the display surface, so each draw only repaints
+what changed since the last one: grid cells whose content differs (the active
+piece's old and new cells, the ghost piece, rows shifted by a line clear), the
+next piece preview and score texts whose value changed. Pygame Zero still
+flips the whole display after draw(), so this saves drawing, not uploading.
+
+The parts of the screen that never change during a game (logo, grid
+background and lines, next piece box, labels and controls) are composed once
+into a background surface. Full redraws and erasing both blit from it.
+
+Texts are rasterized once per (string, fontsize, color) and kept in an LRU
+TextCache, so a score text is only rendered when its value changes and
+recurring strings (labels, the game over banner, small values) not at all.
+
+Positions and sizes come from a Layout computed for the display size. The
+screen is designed for WIDTH x HEIGHT with BLOCK_SIZE blocks; on other
+displays everything is scaled to whole-pixel blocks and centered, and block
+tiles come pre-scaled from the sprite manager, so frames are never scaled.
+"""
+
+from collections import OrderedDict
+
+import pygame
+from pygame import Rect
+from pgzero import ptext
+
+from game_logic import PIECE_COLORS, GRID_WIDTH, GRID_HEIGHT, drop_distance
+
+# Design window size, the default window; Layout scales the design to others
+WIDTH = 1280
+HEIGHT = 960
+
+# Colors (Brand colors from design document)
+BACKGROUND_COLOR = (245, 245, 245)  # #F5F5F5 Light gray
+UI_TEXT_COLOR = (44, 62, 80)  # #2C3E50 Dark navy/charcoal
+PRIMARY_ACCENT = (0, 102, 204)  # #0066CC Bright blue
+SECONDARY_ACCENT = (0, 153, 51)  # #009933 Green
+GRID_BORDER = (204, 204, 204)  # #CCCCCC Light gray
+GRID_BACKGROUND = (255, 255, 255)  # #FFFFFF White
+
+# Grid configuration for display (design coordinates, like everything below)
+BLOCK_SIZE = 48  # 48x48 pixels per block
+GRID_X = 400  # X position of game grid
+GRID_Y = 0  # Y position of game grid
+
+NEXT_PIECE_BOX = Rect(950, 120, 240, 240)
+
+# Left panel the logo is centered in
+LOGO_PANEL = Rect(0, 0, GRID_X, HEIGHT)
+
+# Score texts: game_state key -> (label, topleft)
+SCORE_TEXTS = {
+    'score': ("SCORE", (950, 400)),
+    'level': ("LEVEL", (950, 450)),
+    'lines_cleared': ("LINES", (950, 500)),
+}
+
+# Panel labels and the controls list below them
+NEXT_PIECE_LABEL = (950, 80)
+CONTROLS_LABEL = (950, 600)
+CONTROLS_TOP = 640
+CONTROLS_SPACING = 30
+
+# Smallest block size a layout scales down to
+MIN_BLOCK_SIZE = 8
+
+CONTROLS_TEXT = [
+    "LEFT/RIGHT Move",
+    "UP Rotate",
+    "DOWN Soft Drop",
+    "SPACE Hard Drop"
+]
+
+# Marker for ghost piece cells in the frame snapshot
+GHOST = 'ghost'
+
+# Rendered text surfaces kept by a TextCache
+TEXT_CACHE_SIZE = 128
+
+# Profiling overlay position, over the logo panel where nothing moves
+OVERLAY_TOPLEFT = (10, 10)
+
+
+def parse_resolution(text):
+    """
+    Parse a window size like "1920x1080".
+    
+    Returns:
+        (width, height) tuple
+    
+    Raises:
+        ValueError: If text is not two positive integers separated by an x
+    """
+    width, height = (int(part) for part in text.lower().split('x'))
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Invalid resolution: {text}")
+    return width, height
+
+
+def display_size():
+    """
+    Size of the (first) display the game runs on.
+    
+    Asks for the desktop size rather than pygame.display.Info(), which
+    reports the size of an open window, and Pygame Zero opens a small one
+    before it runs the game module.
+    
+    Returns:
+        (width, height) tuple, the design size WIDTH x HEIGHT if the display
+        does not report its size
+    """
+    pygame.display.init()
+    sizes = pygame.display.get_desktop_sizes()
+    if sizes and min(sizes[0]) > 0:
+        return tuple(sizes[0])
+    return WIDTH, HEIGHT
+
+
+class Layout:
+    """
+    Screen positions and sizes for one display size.
+    
+    The block size is the largest whole number of pixels at which the design
+    layout fits the display, and every design coordinate, length and font
+    size is scaled by the same factor. The scaled screen is centered, the
+    margins are filled with the background color.
+    """
+    
+    def __init__(self, width=WIDTH, height=HEIGHT):
+        """
+        Args:
+            width: Display width in pixels
+            height: Display height in pixels
+        """
+        self.size = (width, height)
+        self.block_size = max(MIN_BLOCK_SIZE, min(width * BLOCK_SIZE // WIDTH, height * BLOCK_SIZE // HEIGHT))
+        self.scale = self.block_size / BLOCK_SIZE
+        self.origin = ((width - self.length(WIDTH)) // 2, (height - self.length(HEIGHT)) // 2)
+        
+        self.grid_rect = Rect(self.point((GRID_X, GRID_Y)),
+                              (GRID_WIDTH * self.block_size, GRID_HEIGHT * self.block_size))
+        self.next_piece_box = self.rect(NEXT_PIECE_BOX)
+        self.logo_panel = self.rect(LOGO_PANEL)
+        self.score_texts = {key: (label, self.point(topleft)) for key, (label, topleft) in SCORE_TEXTS.items()}
+    
+    def length(self, value):
+        """Scale a design length to whole pixels"""
+        return round(value * self.scale)
+    
+    def fontsize(self, size):
+        """Scale a design font size"""
+        return max(1, self.length(size))
+    
+    def point(self, position):
+        """Map a design position to the display"""
+        return (self.origin[0] + self.length(position[0]), self.origin[1] + self.length(position[1]))
+    
+    def rect(self, rect):
+        """Map a design Rect to the display"""
+        return Rect(self.point(rect.topleft), (self.length(rect.width), self.length(rect.height)))
+    
+    def cell_rect(self, x, y):
+        """Display Rect of a grid cell"""
+        block_size = self.block_size
+        return Rect(self.grid_rect.x + x * block_size, self.grid_rect.y + y * block_size, block_size, block_size)
+
+
+class TextCache:
+    """
+    LRU cache of rendered text surfaces keyed by (text, fontsize, color, background).
+    
+    Blitting a cached surface skips Pygame Zero's text pipeline (font lookup,
+    layout, rasterizing) entirely. The least recently used surface is dropped
+    once maxsize texts are cached.
+    """
+    
+    def __init__(self, maxsize=TEXT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+    
+    def __len__(self):
+        return len(self._surfaces)
+    
+    def clear(self):
+        """Drop all cached surfaces (e.g. after the display format changed)"""
+        self._surfaces.clear()
+    
+    def get(self, text, fontsize, color, background=None):
+        """Return the rendered text, rasterizing it only on a cache miss"""
+        key = (text, fontsize, color, background)
+        surfaces = self._surfaces
+        text_surface = surfaces.get(key)
+        if text_surface is not None:
+            surfaces.move_to_end(key)
+            self.hits += 1
+            return text_surface
+        
+        self.misses += 1
+        text_surface = ptext.getsurf(text, fontsize=fontsize, color=color, background=background, cache=False)
+        surfaces[key] = text_surface
+        if len(surfaces) > self.maxsize:
+            surfaces.popitem(last=False)
+        return text_surface
+    
+    def draw(self, surface, text, fontsize, color, topleft=None, center=None, background=None):
+        """
+        Blit a text at topleft or centered on center, placed like ptext.draw.
+        
+        Returns:
+            The Rect the text was drawn to
+        """
+        text_surface = self.get(text, fontsize, color, background)
+        width, height = text_surface.get_size()
+        if center is not None:
+            topleft = (int(round(center[0] - 0.5 * width)), int(round(center[1] - 0.5 * height)))
+        surface.blit(text_surface, topleft)
+        return Rect(topleft, (width, height))
+
+
+class Renderer:
+    """
+    Draws the game screen, repainting only the regions that changed.
+    
+    draw() compares a snapshot of what every grid cell shows with the snapshot
+    of the previous frame and repaints the differing cells. The rectangles
+    touched by the last draw are kept in dirty_rects, the number of blits it
+    made in blit_count.
+    """
+    
+    def __init__(self, sprite_manager, logo=None, layout=None):
+        """
+        Create a renderer.
+        
+        Args:
+            sprite_manager: SpriteManager used to look up block sprites
+            logo: Optional surface drawn centered in the left panel
+            layout: Layout to draw with, replaced by one for the surface
+                size when drawing to a surface of another size
+        """
+        self.sprite_manager = sprite_manager
+        self.logo = logo
+        self.layout = layout or Layout()
+        self.dirty_rects = []
+        self.blit_count = 0
+        self.text_cache = TextCache()
+        self.invalidate()
+    
+    def set_logo(self, logo):
+        """Replace the left panel logo (recomposes the background)"""
+        self.logo = logo
+        self.invalidate()
+    
+    def set_layout(self, layout):
+        """Switch to another layout (redraws everything with tiles for its block size)"""
+        self.layout = layout
+        self.invalidate()
+    
+    def invalidate(self):
+        """Force a full redraw on the next frame (e.g. after the layout changed)"""
+        self._background = None
+        self._tiles = {}
+        self._surface = None
+        self._frame = None
+        self._next_piece = None
+        self._game_over = None
+        self._texts = {}
+        self._overlay = None
+    
+    def draw(self, surface, grid, game_state):
+        """
+        Bring the surface up to date with the game.
+        
+        Args:
+            surface: The display surface holding the previous frame
+            grid: The game grid (list of lists or BitboardGrid)
+            game_state: Dictionary containing game state
+        
+        Returns:
+            List of Rects that were repainted
+        """
+        if surface.get_size() != self.layout.size:
+            self.set_layout(Layout(*surface.get_size()))
+        
+        frame = self._snapshot(grid, game_state)
+        game_over = game_state['game_over']
+        
+        if self._background is None or self._background.get_size() != surface.get_size():
+            self._background = self._compose_background(surface)
+            self._surface = None
+        
+        if surface is not self._surface or game_over != self._game_over:
+            self.blit_count = self._draw_full(surface, grid, game_state, frame)
+            self._surface = surface
+            self._game_over = game_over
+            self.dirty_rects = [surface.get_rect()]
+            return self.dirty_rects
+        
+        dirty = []
+        blit_count = 0
+        layout = self.layout
+        if not game_over:
+            # Repaint grid cells whose content changed: erase each from the
+            # background, then draw its content, all in a single blits() call
+            blits = []
+            previous = self._frame
+            for i, key in enumerate(frame):
+                if key != previous[i]:
+                    rect = layout.cell_rect(i % GRID_WIDTH, i // GRID_WIDTH)
+                    blits.append((self._background, rect, rect))
+                    if key is not None:
+                        self._add_cell_blits(blits, rect.topleft, key)
+                    dirty.append(rect)
+            
+            if game_state['next_piece'] is not self._next_piece:
+                self._add_preview_blits(blits, game_state['next_piece'])
+                dirty.append(Rect(layout.next_piece_box))
+            
+            if blits:
+                surface.blits(blits, doreturn=False)
+            blit_count = len(blits)
+            
+            for key in SCORE_TEXTS:
+                rect = self._draw_score_text(surface, key, game_state[key])
+                if rect:
+                    dirty.append(rect)
+                    blit_count += 2
+        
+        self._frame = frame
+        self.dirty_rects = dirty
+        self.blit_count = blit_count
+        return dirty
+    
+    def draw_overlay(self, surface, lines):
+        """
+        Draw text lines (e.g. profiling numbers) in the top left corner.
+        
+        Call after draw(). The text is only re-rendered when it changed or the
+        last draw() repainted the whole screen; an empty list removes it.
+        
+        Returns:
+            The repainted Rect, or None if nothing changed
+        """
+        text = "\n".join(lines)
+        previous = self._overlay
+        if previous and previous[0] == text:
+            return None
+        
+        dirty = previous[1] if previous else None
+        if previous:
+            surface.blit(self._background, previous[1], previous[1])
+        self._overlay = None
+        if text:
+            layout = self.layout
+            rect = self.text_cache.draw(surface, text, layout.fontsize(18), UI_TEXT_COLOR,
+                                        topleft=layout.point(OVERLAY_TOPLEFT), background=BACKGROUND_COLOR)
+            self._overlay = (text, rect)
+            dirty = rect.union(dirty) if dirty else rect
+        if dirty:
+            self.dirty_rects.append(dirty)
+        return dirty
+    
+    def _snapshot(self, grid, game_state):
+        """
+        Describe what every grid cell shows, row by row.
+        
+        Returns:
+            List of GRID_WIDTH * GRID_HEIGHT hashable keys, None for empty cells
+        """
+        frame = [None] * (GRID_WIDTH * GRID_HEIGHT)
+        for y, row in enumerate(grid):
+            base = y * GRID_WIDTH
+            for x, cell in enumerate(row):
+                if cell != 0:
+                    frame[base + x] = self._block_key(cell)
+        
+        current_piece = game_state['current_piece']
+        if current_piece:
+            if not game_state['game_over']:
+                ghost_y = current_piece.y + drop_distance(current_piece, grid)
+                for dx, dy in current_piece.state.offsets:
+                    by = ghost_y + dy
+                    if by >= 0:
+                        frame[by * GRID_WIDTH + current_piece.x + dx] = GHOST
+            for (dx, dy), block in current_piece.blocks:
+                by = current_piece.y + dy
+                if by >= 0:
+                    i = by * GRID_WIDTH + current_piece.x + dx
+                    key = self._block_key(block)
+                    # The falling piece is drawn on top of its own ghost
+                    frame[i] = (GHOST, key) if frame[i] == GHOST else key
+        return frame
+    
+    @staticmethod
+    def _block_key(cell):
+        """Snapshot key of a grid cell: everything that affects how it looks"""
+        if hasattr(cell, 'rotation'):
+            return (cell.shape_type, cell.sprite_dx, cell.sprite_dy, cell.rotation)
+        return cell
+    
+    def _compose_background(self, surface):
+        """
+        Draw everything that stays the same during a game into a new surface.
+        
+        Args:
+            surface: The target surface (size and pixel format are copied)
+        
+        Returns:
+            The background Surface
+        """
+        background = pygame.Surface(surface.get_size(), 0, surface)
+        layout = self.layout
+        grid_rect = layout.grid_rect
+        block_size = layout.block_size
+        
+        # Clear screen with background color
+        background.fill(BACKGROUND_COLOR)
+        
+        # Draw logo in the left spacing area (rotated 90 degrees)
+        if self.logo:
+            # Position the logo centered in the left area
+            panel = layout.logo_panel
+            logo_x = panel.x + (panel.width - self.logo.get_width()) // 2
+            logo_y = panel.y + (panel.height - self.logo.get_height()) // 2
+            background.blit(self.logo, (logo_x, logo_y))
+        
+        # Draw game grid background and border
+        background.fill(GRID_BACKGROUND, grid_rect)
+        pygame.draw.rect(background, GRID_BORDER, grid_rect, 1)
+        
+        # Draw grid lines (vertical)
+        for x in range(1, GRID_WIDTH):
+            line_x = grid_rect.x + (x * block_size)
+            pygame.draw.line(background, GRID_BORDER, (line_x, grid_rect.y), (line_x, grid_rect.bottom))
+        
+        # Draw grid lines (horizontal)
+        for y in range(1, GRID_HEIGHT):
+            line_y = grid_rect.y + (y * block_size)
+            pygame.draw.line(background, GRID_BORDER, (grid_rect.x, line_y), (grid_rect.right, line_y))
+        
+        # Draw UI panel labels and the empty next piece box
+        label_size = layout.fontsize(24)
+        self.text_cache.draw(background, "NEXT PIECE:", label_size, UI_TEXT_COLOR, topleft=layout.point(NEXT_PIECE_LABEL))
+        background.fill(GRID_BACKGROUND, layout.next_piece_box)
+        pygame.draw.rect(background, GRID_BORDER, layout.next_piece_box, 1)
+        
+        # Draw controls
+        self.text_cache.draw(background, "CONTROLS:", label_size, UI_TEXT_COLOR, topleft=layout.point(CONTROLS_LABEL))
+        y_offset = CONTROLS_TOP
+        for control in CONTROLS_TEXT:
+            self.text_cache.draw(background, control, layout.fontsize(20), UI_TEXT_COLOR,
+                                 topleft=layout.point((CONTROLS_LABEL[0], y_offset)))
+            y_offset += CONTROLS_SPACING
+        
+        return background
+    
+    def _draw_full(self, surface, grid, game_state, frame):
+        """Redraw the whole screen on top of the background, returns the number of blits"""
+        blits = [(self._background, (0, 0))]
+        
+        # Draw locked pieces, ghost and current piece
+        cell_rect = self.layout.cell_rect
+        for i, key in enumerate(frame):
+            if key is not None:
+                self._add_cell_blits(blits, cell_rect(i % GRID_WIDTH, i // GRID_WIDTH).topleft, key)
+        self._frame = frame
+        
+        # Draw next piece preview
+        self._add_preview_blits(blits, game_state['next_piece'])
+        surface.blits(blits, doreturn=False)
+        
+        # Draw score display
+        self._texts = {}
+        for key in SCORE_TEXTS:
+            self._draw_score_text(surface, key, game_state[key])
+        self._overlay = None
+        
+        # Draw game over message if game is over
+        if game_state['game_over']:
+            self._draw_game_over(surface, game_state)
+        return len(blits) + len(SCORE_TEXTS)
+    
+    def _tile(self, key):
+        """
+        Blit source for a snapshot key, looked up once and then cached.
+        
+        Blocks come from the sprite atlas for the layout's block size, scaled
+        once by the sprite manager. Blocks without a sprite use a
+        pre-rendered tile in their piece color, and the ghost outline is a
+        transparent tile, so every cell is drawn by a plain blit.
+        
+        Returns:
+            A (surface, area) pair, area is None for whole-surface tiles
+        """
+        tile = self._tiles.get(key)
+        if tile is not None:
+            return tile
+        
+        block_size = self.layout.block_size
+        if key == GHOST:
+            surface = pygame.Surface((block_size, block_size), pygame.SRCALPHA)
+            pygame.draw.rect(surface, PRIMARY_ACCENT, surface.get_rect(), 1)
+            tile = (surface, None)
+        else:
+            region = None
+            if isinstance(key, tuple):
+                region = self.sprite_manager.get_block_region(*key, block_size=block_size)
+                shape_type = key[0]
+            else:
+                # Old system: cell is a shape_type string
+                shape_type = key
+            if region:
+                tile = region
+            else:
+                # Fallback to colored blocks, one shared tile per piece type
+                tile = self._tiles.get(shape_type)
+                if tile is None:
+                    surface = pygame.Surface((block_size, block_size))
+                    surface.fill(PIECE_COLORS[shape_type])
+                    pygame.draw.rect(surface, GRID_BORDER, surface.get_rect(), 1)
+                    tile = (surface, None)
+                    self._tiles[shape_type] = tile
+        
+        self._tiles[key] = tile
+        return tile
+    
+    def _add_cell_blits(self, blits, pos, key):
+        """Queue the blits drawing a snapshot key (block, ghost outline or both) at pos"""
+        if isinstance(key, tuple) and key[0] == GHOST:
+            surface, area = self._tile(GHOST)
+            blits.append((surface, pos, area))
+            key = key[1]
+        surface, area = self._tile(key)
+        blits.append((surface, pos, area))
+    
+    def _add_preview_blits(self, blits, next_piece):
+        """Queue the blits redrawing the next piece box and the piece centered in it"""
+        box = self.layout.next_piece_box
+        blits.append((self._background, box, box))
+        self._next_piece = next_piece
+        if not next_piece:
+            return
+        
+        # Calculate the bounds of the piece
+        shape = next_piece.shape
+        min_x = min(dx for dx, dy in shape)
+        max_x = max(dx for dx, dy in shape)
+        min_y = min(dy for dx, dy in shape)
+        max_y = max(dy for dx, dy in shape)
+        
+        # Calculate piece dimensions in pixels
+        block_size = self.layout.block_size
+        piece_width = (max_x - min_x + 1) * block_size
+        piece_height = (max_y - min_y + 1) * block_size
+        
+        # Center the piece in the preview box
+        preview_offset_x = box.x + (box.width - piece_width) // 2 - min_x * block_size
+        preview_offset_y = box.y + (box.height - piece_height) // 2 - min_y * block_size
+        
+        for (dx, dy), block in next_piece.blocks:
+            pos = (preview_offset_x + dx * block_size, preview_offset_y + dy * block_size)
+            self._add_cell_blits(blits, pos, self._block_key(block))
+    
+    def _draw_score_text(self, surface, key, value):
+        """
+        Draw a score text if its value changed since it was last drawn.
+        
+        Returns:
+            The repainted Rect (old and new text area), or None if unchanged
+        """
+        label, topleft = self.layout.score_texts[key]
+        text = f"{label}: {value}"
+        previous = self._texts.get(key)
+        if previous and previous[0] == text:
+            return None
+        
+        if previous:
+            surface.blit(self._background, previous[1], previous[1])
+        rect = self.text_cache.draw(surface, text, self.layout.fontsize(28), UI_TEXT_COLOR, topleft=topleft)
+        self._texts[key] = (text, rect)
+        return rect.union(previous[1]) if previous else rect
+    
+    def _draw_game_over(self, surface, game_state):
+        """Draw the game over banner across the middle of the grid"""
+        layout = self.layout
+        grid_rect = layout.grid_rect
+        center_x = grid_rect.centerx
+        center_y = grid_rect.y + grid_rect.height // 2
+        overlay_rect = Rect(grid_rect.x, center_y - layout.length(100), grid_rect.width, layout.length(200))
+        surface.fill((0, 0, 0), overlay_rect)
+        
+        text = self.text_cache
+        text.draw(surface, "GAME OVER", layout.fontsize(48), (255, 255, 255),
+                  center=(center_x, center_y - layout.length(50)))
+        text.draw(surface, f"Final Score: {game_state['score']}", layout.fontsize(28), (255, 255, 255),
+                  center=(center_x, center_y + layout.length(10)))
+        text.draw(surface, "Press R to Restart", layout.fontsize(24), (255, 255, 255),
+                  center=(center_x, center_y + layout.length(50)))
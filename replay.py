@@ -0,0 +1,318 @@
+"""
+Replay recording and playback for HaHa Hausservice Haubentaucher Tetris
+
+A replay is everything needed to re-simulate one game exactly: the seed and
+piece generator of the session, then per frame the player actions and the
+frame time that was passed to GameSession.tick(). It is stored as a compact
+binary stream:
+
+    header:  b'TTRP', version byte, varint seed, varint length + generator name
+    frames:  varint (zigzag(dt_us - previous dt_us) << 3 | action count)
+             followed by one byte per action (index into ACTIONS)
+
+Frame times are quantized to microseconds before the game uses them, so the
+live game and the playback see bit-identical floats. A frame at a steady frame
+rate without input takes a single byte.
+
+Playback runs headless at full CPU speed. ReplayPlayer keeps periodic session
+snapshots so seeking to any frame only re-simulates from the nearest one.
+"""
+
+import argparse
+import copy
+import sys
+import time
+
+from game_logic import ACTIONS, GENERATOR_UNIFORM, GENERATORS, GameSession
+
+MAGIC = b'TTRP'
+VERSION = 2  # 2: fixed-step GameSession.tick, version 1 replays play back differently
+
+# Action codes are indices into ACTIONS
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+# Actions in a frame record's low bits; 7 means a varint with the extra count follows
+_ACTION_BITS = 3
+_MANY_ACTIONS = (1 << _ACTION_BITS) - 1
+
+# Default number of frames between playback snapshots (10 seconds at 60 FPS)
+SNAPSHOT_INTERVAL = 600
+
+
+class ReplayError(ValueError):
+    """Raised for data that is not a valid replay"""
+
+
+def write_varint(buffer, value):
+    """Append a non-negative integer as a LEB128 varint to a bytearray"""
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data, position):
+    """
+    Read a LEB128 varint.
+    
+    Returns:
+        (value, position after the varint)
+    """
+    value = 0
+    shift = 0
+    while True:
+        if position >= len(data):
+            raise ReplayError("Truncated varint")
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def zigzag(value):
+    """Map signed to unsigned integers so small magnitudes stay small (0, -1, 1, -2 -> 0, 1, 2, 3)"""
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    """Inverse of zigzag"""
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+class ReplayRecorder:
+    """
+    Records a game as it is played.
+    
+    Call action() for every player action given to session.step(), and
+    frame(dt) once per update; use the dt it returns for session.tick().
+    """
+    
+    def __init__(self, seed, generator=GENERATOR_UNIFORM):
+        """
+        Start a recording.
+        
+        Args:
+            seed: The session seed (non-negative integer)
+            generator: The session's piece generator name
+        """
+        if not isinstance(seed, int) or seed < 0:
+            raise ReplayError(f"Replays need a non-negative integer seed, got {seed!r}")
+        self.seed = seed
+        self.generator = generator
+        self.frames = 0
+        self._buffer = bytearray(MAGIC)
+        self._buffer.append(VERSION)
+        write_varint(self._buffer, seed)
+        name = generator.encode()
+        write_varint(self._buffer, len(name))
+        self._buffer += name
+        self._actions = bytearray()
+        self._previous_dt = 0
+    
+    def action(self, action):
+        """Record a player action for the current frame"""
+        self._actions.append(ACTION_CODES[action])
+    
+    def frame(self, dt):
+        """
+        Record the end of a frame.
+        
+        Args:
+            dt: Elapsed time in seconds
+        
+        Returns:
+            dt quantized to whole microseconds, pass it to session.tick()
+        """
+        dt_us = max(0, round(dt * 1_000_000))
+        count = len(self._actions)
+        header = zigzag(dt_us - self._previous_dt) << _ACTION_BITS
+        write_varint(self._buffer, header | min(count, _MANY_ACTIONS))
+        if count >= _MANY_ACTIONS:
+            write_varint(self._buffer, count - _MANY_ACTIONS)
+        self._buffer += self._actions
+        self._actions.clear()
+        self._previous_dt = dt_us
+        self.frames += 1
+        return dt_us / 1_000_000
+    
+    def to_bytes(self):
+        """The replay recorded so far (pending actions of an unfinished frame are left out)"""
+        return bytes(self._buffer)
+    
+    def save(self, path):
+        """Write the replay to a file"""
+        with open(path, 'wb') as replay_file:
+            replay_file.write(self._buffer)
+
+
+class Replay:
+    """
+    A decoded replay.
+    
+    frames is a list of (dt, actions) tuples, dt in seconds exactly as the
+    recorded game passed it to tick() and actions a tuple of ACTIONS entries.
+    """
+    
+    def __init__(self, seed, generator, frames):
+        self.seed = seed
+        self.generator = generator
+        self.frames = frames
+    
+    def __len__(self):
+        return len(self.frames)
+    
+    @classmethod
+    def from_bytes(cls, data):
+        """Decode a replay stream, raises ReplayError for invalid data"""
+        if data[:len(MAGIC)] != MAGIC:
+            raise ReplayError("Not a replay (bad magic)")
+        if len(data) <= len(MAGIC) or data[len(MAGIC)] != VERSION:
+            raise ReplayError("Unsupported replay version")
+        position = len(MAGIC) + 1
+        seed, position = read_varint(data, position)
+        length, position = read_varint(data, position)
+        if position + length > len(data):
+            raise ReplayError("Truncated generator name")
+        try:
+            generator = bytes(data[position:position + length]).decode()
+        except UnicodeDecodeError:
+            raise ReplayError("Invalid generator name")
+        if generator not in GENERATORS:
+            raise ReplayError(f"Unknown piece generator {generator!r}")
+        position += length
+        
+        frames = []
+        dt_us = 0
+        end = len(data)
+        while position < end:
+            header, position = read_varint(data, position)
+            count = header & _MANY_ACTIONS
+            if count == _MANY_ACTIONS:
+                extra, position = read_varint(data, position)
+                count += extra
+            if position + count > end:
+                raise ReplayError("Truncated frame")
+            dt_us += unzigzag(header >> _ACTION_BITS)
+            try:
+                actions = tuple(ACTIONS[code] for code in data[position:position + count])
+            except IndexError:
+                raise ReplayError("Unknown action code")
+            position += count
+            frames.append((dt_us / 1_000_000, actions))
+        return cls(seed, generator, frames)
+    
+    @classmethod
+    def load(cls, path):
+        """Read and decode a replay file"""
+        with open(path, 'rb') as replay_file:
+            return cls.from_bytes(replay_file.read())
+
+
+class ReplayPlayer:
+    """
+    Re-simulates a replay headlessly.
+    
+    The session is available as player.session and reflects the game after
+    player.frame frames. Snapshots are taken every snapshot_interval frames
+    while playing, so seek() can jump back and forth quickly.
+    """
+    
+    def __init__(self, replay, snapshot_interval=SNAPSHOT_INTERVAL):
+        """
+        Args:
+            replay: A Replay, or the encoded bytes of one
+            snapshot_interval: Frames between snapshots (0 disables them)
+        """
+        if not isinstance(replay, Replay):
+            replay = Replay.from_bytes(replay)
+        self.replay = replay
+        self.snapshot_interval = snapshot_interval
+        self.session = GameSession(seed=replay.seed, generator=replay.generator)
+        self.frame = 0
+        self._snapshots = {0: copy.deepcopy(self.session)}
+    
+    def step(self):
+        """Play the next frame, returns False at the end of the replay"""
+        if self.frame >= len(self.replay.frames):
+            return False
+        dt, actions = self.replay.frames[self.frame]
+        session = self.session
+        for action in actions:
+            session.step(action)
+        session.tick(dt)
+        self.frame += 1
+        if self.snapshot_interval and self.frame % self.snapshot_interval == 0:
+            self._snapshots.setdefault(self.frame, copy.deepcopy(session))
+        return True
+    
+    def seek(self, frame):
+        """
+        Bring the session to the state after the given number of frames.
+        
+        Restores the closest snapshot at or before the frame when that is
+        closer than the current position, then plays forward.
+        """
+        frame = max(0, min(frame, len(self.replay.frames)))
+        start = max(index for index in self._snapshots if index <= frame)
+        if frame < self.frame or start > self.frame:
+            # Snapshots stay untouched, playback continues on a copy
+            self.session = copy.deepcopy(self._snapshots[start])
+            self.frame = start
+        while self.frame < frame:
+            self.step()
+        return self.session
+    
+    def run(self):
+        """Play to the end of the replay and return the final session"""
+        return self.seek(len(self.replay.frames))
+
+
+def verify(data, score):
+    """
+    Check a claimed score by re-simulating its replay.
+    
+    Args:
+        data: Encoded replay
+        score: Claimed final score
+    
+    Returns:
+        True if the replayed game ends with that score
+    """
+    try:
+        replay = Replay.from_bytes(data)
+    except ReplayError:
+        return False
+    session = ReplayPlayer(replay, snapshot_interval=0).run()
+    return session.game_state['score'] == score
+
+
+def main(argv=None):
+    """Command line entry point: fast-forward replay files and print the result"""
+    parser = argparse.ArgumentParser(description="Re-simulate recorded games headlessly")
+    parser.add_argument('replays', nargs='+', help="replay files to play")
+    parser.add_argument('--frame', type=int, default=None,
+                        help="stop after this many frames instead of playing to the end")
+    args = parser.parse_args(argv)
+    
+    for path in args.replays:
+        try:
+            replay = Replay.load(path)
+        except (OSError, ReplayError) as e:
+            print(f"{path}: {e}")
+            return 1
+        player = ReplayPlayer(replay)
+        started = time.perf_counter()
+        session = player.seek(len(replay) if args.frame is None else args.frame)
+        elapsed = time.perf_counter() - started
+        state = session.game_state
+        game_time = sum(dt for dt, _ in replay.frames[:player.frame])
+        print(f"{path}: frame {player.frame}/{len(replay)}, score {state['score']}, "
+              f"lines {state['lines_cleared']}, level {state['level']}, "
+              f"{game_time:.0f}s of play in {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Batch simulator for HaHa Hausservice Haubentaucher Tetris
+
+Runs many seeded headless games across a multiprocessing pool with a
+pluggable move policy and aggregates the per-game results into percentiles.
+Useful for tuning the scoring and level balance (SCORE_*, SPEED_MULTIPLIER)
+without playing the GUI by hand.
+
+Usage:
+    python simulate.py --games 1000 --policy greedy
+    python simulate.py --games 200 --set SCORE_TETRIS=1200 --output results.jsonl
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import game_logic
+from game_logic import (
+    GRID_WIDTH, ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_HARD_DROP, GENERATOR_UNIFORM, GENERATORS,
+    GameSession
+)
+from placement import find_placements
+from stats import percentile
+
+# Default simulated time per action, one frame at 60 FPS
+FRAME_TIME = 1 / 60
+
+# Game constants that can be overridden with --set NAME=VALUE
+TUNABLE_CONSTANTS = (
+    'SCORE_SINGLE', 'SCORE_DOUBLE', 'SCORE_TRIPLE', 'SCORE_TETRIS',
+    'SCORE_SOFT_DROP', 'SCORE_HARD_DROP', 'INITIAL_FALL_SPEED', 'SPEED_MULTIPLIER'
+)
+
+# Result fields aggregated into percentiles
+STAT_FIELDS = ('score', 'lines', 'level', 'pieces', 'duration')
+PERCENTILES = (0, 10, 50, 90, 99, 100)
+
+
+def moves_to(piece, rotation, x):
+    """
+    Build the action sequence that brings a spawned piece to a rotation and column.
+    
+    Args:
+        piece: The piece at its spawn position
+        rotation: Target rotation index
+        x: Target column of the piece origin
+    
+    Returns:
+        List of actions (without the final hard drop)
+    """
+    actions = [ACTION_ROTATE] * (rotation % len(piece.states))
+    shift = x - piece.x
+    if shift < 0:
+        actions.extend([ACTION_LEFT] * -shift)
+    else:
+        actions.extend([ACTION_RIGHT] * shift)
+    return actions
+
+
+def random_policy(session, rng):
+    """Rotate and shift the piece randomly, then drop it"""
+    piece = session.game_state['current_piece']
+    rotation = rng.randrange(len(piece.states))
+    x = rng.randrange(GRID_WIDTH - piece.states[rotation].width + 1)
+    return moves_to(piece, rotation, x)
+
+
+def drop_policy(session, rng):
+    """Drop every piece straight down where it spawns"""
+    return []
+
+
+def _evaluate_rows(rows, full_mask):
+    """
+    Score a bitboard after a placement (higher is better).
+    
+    Rewards cleared lines and penalizes stack height, holes and bumpiness.
+    """
+    remaining = [row for row in rows if row != full_mask]
+    cleared = len(rows) - len(remaining)
+    
+    heights = []
+    holes = 0
+    for x in range(GRID_WIDTH):
+        bit = 1 << x
+        height = 0
+        for y, row in enumerate(remaining):
+            if row & bit:
+                if not height:
+                    height = len(remaining) - y
+            elif height:
+                holes += 1
+        heights.append(height)
+    
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return cleared * 0.76 - sum(heights) * 0.51 - holes * 0.36 - bumpiness * 0.18
+
+
+def greedy_policy(session, rng):
+    """
+    Try every reachable placement and pick the one that leaves the best board.
+    
+    Uses a simple height/holes/bumpiness heuristic on the bitboard rows.
+    """
+    grid = session.grid
+    piece = session.game_state['current_piece']
+    best = None
+    best_score = None
+    
+    for placement in find_placements(grid, piece, soft_drop=False):
+        state = piece.states[placement.rotation]
+        rows = list(grid.rows)
+        for i, mask in enumerate(state.row_masks):
+            if placement.y + i >= 0:
+                rows[placement.y + i] |= mask << placement.x
+        score = _evaluate_rows(rows, grid.full_mask)
+        if best_score is None or score > best_score:
+            best_score = score
+            best = placement
+    
+    if best is None:
+        return []
+    return best.actions
+
+
+# Built-in policies selectable by name; anything else is imported as module:function
+POLICIES = {
+    'random': random_policy,
+    'drop': drop_policy,
+    'greedy': greedy_policy,
+}
+
+
+def load_policy(name):
+    """
+    Resolve a policy by name.
+    
+    Args:
+        name: A key of POLICIES or an importable 'module:function' path.
+            Policies are called as policy(session, rng) and return the list of
+            actions to apply to the current piece. The piece is hard dropped
+            afterwards unless the actions already locked it.
+    """
+    if name in POLICIES:
+        return POLICIES[name]
+    if ':' not in name:
+        raise ValueError(f"Unknown policy {name!r} (use one of {', '.join(POLICIES)} or module:function)")
+    module_name, function_name = name.split(':', 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def apply_overrides(overrides):
+    """Apply NAME=VALUE overrides to the tunable game_logic constants"""
+    for name, value in overrides.items():
+        if name not in TUNABLE_CONSTANTS:
+            raise ValueError(f"{name} is not tunable (choose from {', '.join(TUNABLE_CONSTANTS)})")
+        setattr(game_logic, name, value)
+
+
+def play_game(seed, policy, frame_time=FRAME_TIME, max_pieces=None, generator=GENERATOR_UNIFORM):
+    """
+    Play one headless game to the end.
+    
+    Args:
+        seed: Seed for the game's piece sequence (the policy gets its own generator)
+        policy: Policy callable, see load_policy
+        frame_time: Simulated seconds that pass per action (0 disables gravity)
+        max_pieces: Optional cap on placed pieces for policies that never lose
+        generator: Piece generator strategy (see game_logic.GENERATORS)
+    
+    Returns:
+        Dictionary with seed, score, lines, level, pieces, duration and game_time
+    """
+    started = time.perf_counter()
+    session = GameSession(seed=seed, generator=generator)
+    policy_rng = random.Random(f"policy-{seed}")
+    game_state = session.game_state
+    game_time = 0.0
+    
+    while not session.game_over:
+        if max_pieces is not None and session.pieces_placed >= max_pieces:
+            break
+        piece = game_state['current_piece']
+        for action in policy(session, policy_rng):
+            session.step(action)
+            if frame_time:
+                session.tick(frame_time)
+                game_time += frame_time
+            # Gravity may have locked the piece already
+            if game_state['current_piece'] is not piece:
+                break
+        else:
+            session.step(ACTION_HARD_DROP)
+    
+    return {
+        'seed': seed,
+        'score': game_state['score'],
+        'lines': game_state['lines_cleared'],
+        'level': game_state['level'],
+        'pieces': session.pieces_placed,
+        'duration': time.perf_counter() - started,
+        'game_time': game_time,
+    }
+
+
+def _init_worker(policy_name, frame_time, max_pieces, overrides, generator=GENERATOR_UNIFORM):
+    """Pool initializer: resolve the policy and apply overrides once per worker"""
+    global _worker_args
+    apply_overrides(overrides)
+    _worker_args = (load_policy(policy_name), frame_time, max_pieces, generator)
+
+
+def _run_worker_game(seed):
+    policy, frame_time, max_pieces, generator = _worker_args
+    return play_game(seed, policy, frame_time, max_pieces, generator)
+
+
+def run_games(seeds, policy_name='greedy', workers=None, frame_time=FRAME_TIME,
+              max_pieces=None, overrides=None, generator=GENERATOR_UNIFORM):
+    """
+    Run games for every seed and yield results as soon as each one finishes.
+    
+    Args:
+        seeds: Iterable of game seeds
+        policy_name: Policy name, see load_policy
+        workers: Number of worker processes (default: all cores, 1 runs in-process)
+        frame_time: Simulated seconds per action
+        max_pieces: Optional cap on placed pieces per game
+        overrides: Optional dictionary of game_logic constant overrides
+        generator: Piece generator strategy
+    
+    Yields:
+        Per-game result dictionaries in completion order
+    """
+    seeds = list(seeds)
+    init_args = (policy_name, frame_time, max_pieces, overrides or {}, generator)
+    workers = workers or os.cpu_count() or 1
+    
+    if workers == 1:
+        _init_worker(*init_args)
+        for seed in seeds:
+            yield _run_worker_game(seed)
+        return
+    
+    # Small chunks keep results streaming while amortizing IPC overhead
+    chunksize = max(1, len(seeds) // (workers * 8))
+    with multiprocessing.Pool(workers, _init_worker, init_args) as pool:
+        yield from pool.imap_unordered(_run_worker_game, seeds, chunksize)
+
+
+def aggregate(results):
+    """
+    Aggregate per-game results into summary statistics.
+    
+    Returns:
+        Dictionary of field -> {'mean': ..., 'p0': ..., 'p50': ..., ...}
+    """
+    summary = {}
+    for field in STAT_FIELDS:
+        values = sorted(result[field] for result in results)
+        stats = {'mean': sum(values) / len(values) if values else 0}
+        for p in PERCENTILES:
+            stats[f'p{p}'] = percentile(values, p)
+        summary[field] = stats
+    return summary
+
+
+def format_summary(summary, games, elapsed):
+    """Format the aggregated statistics as a text table"""
+    header = f"{'':>10}{'mean':>12}" + ''.join(f"{'p' + str(p):>12}" for p in PERCENTILES)
+    lines = [f"{games} games in {elapsed:.2f}s ({games / elapsed:.1f} games/s)", header]
+    for field, stats in summary.items():
+        row = f"{field:>10}{stats['mean']:>12.2f}"
+        row += ''.join(f"{stats[f'p{p}']:>12.2f}" for p in PERCENTILES)
+        lines.append(row)
+    return '\n'.join(lines)
+
+
+def parse_override(text):
+    """Parse a NAME=VALUE command line override"""
+    name, sep, value = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    try:
+        return name, int(value)
+    except ValueError:
+        try:
+            return name, float(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"{name} needs a number, got {value!r}")
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Run seeded headless Tetris games and report statistics")
+    parser.add_argument('-n', '--games', type=int, default=100, help="number of games (default: 100)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game, game i uses seed + i")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--policy', default='greedy',
+                        help=f"move policy: {', '.join(POLICIES)} or module:function (default: greedy)")
+    parser.add_argument('--frame-time', type=float, default=FRAME_TIME,
+                        help="simulated seconds per action, 0 disables gravity (default: 1/60)")
+    parser.add_argument('--generator', choices=list(GENERATORS), default=GENERATOR_UNIFORM,
+                        help="piece generator (default: uniform)")
+    parser.add_argument('--max-pieces', type=int, default=None, help="stop each game after this many pieces")
+    parser.add_argument('--set', dest='overrides', type=parse_override, action='append', default=[],
+                        metavar='NAME=VALUE', help="override a scoring/speed constant (repeatable)")
+    parser.add_argument('-o', '--output', help="write per-game results as JSON lines to this file")
+    args = parser.parse_args(argv)
+    
+    overrides = dict(args.overrides)
+    apply_overrides(overrides)  # Validate before starting the pool
+    load_policy(args.policy)
+    
+    seeds = range(args.seed, args.seed + args.games)
+    results = []
+    started = time.perf_counter()
+    output = open(args.output, 'w') if args.output else None
+    try:
+        for result in run_games(seeds, args.policy, args.workers, args.frame_time,
+                                args.max_pieces, overrides, args.generator):
+            results.append(result)
+            if output:
+                output.write(json.dumps(result) + '\n')
+    finally:
+        if output:
+            output.close()
+    elapsed = time.perf_counter() - started
+    
+    print(format_summary(aggregate(results), len(results), elapsed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,15 @@
 """
 Sprite manager for loading and managing furniture piece sprites
+
+pygame is only imported when sprites are actually loaded, so Block (and the
+game logic that uses it) can be imported by headless tools without paying
+for the pygame import.
 """
 
+import json
 import os
-import pygame
-from pygame import image, transform, Surface, SRCALPHA
+
+import asset_cache
 
 # Mapping of shape types to sprite filenames
 SPRITE_FILES = {
@@ -19,14 +24,48 @@ SPRITE_FILES = {
 
 BLOCK_SIZE = 48
 
+# Number of 48x48 tiles per row of the sprite atlas
+ATLAS_COLUMNS = 16
+
+# Written by generate_sprites.py: per piece and block size, the sprite's hash
+# and, for sizes other than 48 px, the hash of the 48 px sprite it was scaled
+# from and a strip of its pre-split, pre-rotated tiles
+TILE_MANIFEST = 'images/pieces/manifest.json'
+
+
+def read_tile_manifest(path=TILE_MANIFEST, block_size=BLOCK_SIZE):
+    """
+    Read the pre-built tile entries for one block size.
+    
+    Returns:
+        Dictionary of shape_type -> manifest entry, empty without a manifest
+    """
+    try:
+        with open(path) as manifest_file:
+            pieces = json.load(manifest_file)['pieces']
+    except (OSError, ValueError, KeyError):
+        return {}
+    suffix = f'@{block_size}'
+    return {key[:-len(suffix)]: entry for key, entry in pieces.items() if key.endswith(suffix)}
+
 
 class Block:
     """
     Represents a single block within a piece, with sprite information.
     Tracks the original sprite position and rotation so it can be rendered correctly
     even after rotation or locking.
+    
+    There are only a few distinct blocks (7 pieces x their cells x 4 rotations),
+    so pieces and the grid share interned instances from Block.get() and
+    SpriteManager.create_block(). Rotating a piece swaps references instead of
+    changing blocks, so shared blocks must be treated as immutable.
     """
     
+    __slots__ = ('shape_type', 'sprite_dx', 'sprite_dy', 'sprite', 'rotation')
+    
+    # Interned sprite-less blocks: (shape_type, sprite_dx, sprite_dy, rotation) -> Block
+    _interned = {}
+    
     def __init__(self, shape_type, sprite_dx, sprite_dy, sprite_surface=None, rotation=0):
         """
         Initialize a block.
@@ -44,12 +83,26 @@ class Block:
         self.sprite = sprite_surface
         self.rotation = rotation  # Current rotation: 0, 90, 180, or 270 degrees
     
+    @classmethod
+    def get(cls, shape_type, sprite_dx, sprite_dy, rotation=0):
+        """
+        Get the shared sprite-less block for a sprite position and rotation.
+        
+        Returns:
+            The same Block instance for equal arguments
+        """
+        key = (shape_type, sprite_dx, sprite_dy, rotation)
+        block = cls._interned.get(key)
+        if block is None:
+            block = cls._interned[key] = cls(shape_type, sprite_dx, sprite_dy, None, rotation)
+        return block
+    
     def copy(self):
         """Create a copy of this block"""
         return Block(self.shape_type, self.sprite_dx, self.sprite_dy, self.sprite, self.rotation)
     
     def rotate_clockwise(self):
-        """Rotate the block 90 degrees clockwise"""
+        """Rotate the block 90 degrees clockwise (only for unshared blocks)"""
         self.rotation = (self.rotation + 90) % 360
     
     def __repr__(self):
@@ -59,31 +112,257 @@ class Block:
 class SpriteManager:
     """Manages loading and accessing sprite images for pieces"""
     
-    def __init__(self):
-        """Initialize sprite manager"""
+    def __init__(self, autoload=True):
+        """
+        Initialize sprite manager.
+        
+        Args:
+            autoload: Load the sprites on the first sprite lookup if
+                load_sprites() has not been called yet
+        """
+        self.autoload = autoload
+        self.loaded = False
+        self._blocks = {}  # Interned blocks: (shape_type, dx, dy, rotation) -> Block
         self.sprites = {}  # Full sprites: shape_type -> Surface
         self.block_sprites = {}  # Pre-split blocks: (shape_type, dx, dy) -> Surface
         self.rotated_sprites = {}  # Rotated versions: (shape_type, dx, dy, rotation) -> Surface
+        self.atlas = None  # All rotated block sprites packed into one Surface
+        self.atlas_rects = {}  # (shape_type, dx, dy, rotation) -> Rect of the tile in the atlas
+        self.scaled_atlases = {}  # Other block sizes: block_size -> (atlas, atlas_rects)
         self.use_sprites = True
+    
+    def load_sprites(self, cache_dir=asset_cache.CACHE_DIR, executor=None):
+        """
+        Load all piece sprites from disk and pre-split them into blocks.
+        
+        The split and rotated tiles are cached in cache_dir, keyed by the
+        content of the sprite files, so later starts skip decoding and
+        rotating them.
         
-    def load_sprites(self):
-        """Load all piece sprites from disk and pre-split them into blocks"""
+        Args:
+            cache_dir: Asset cache directory, None disables the cache
+            executor: Optional concurrent.futures thread pool; each piece is
+                then decoded and split in its own task
+        """
+        self.loaded = True
+        self._blocks = {}
+        self.scaled_atlases = {}
+        digest = None
+        if cache_dir and all(os.path.exists(filepath) for filepath in SPRITE_FILES.values()):
+            digest = asset_cache.source_hash(SPRITE_FILES.values(), BLOCK_SIZE, ATLAS_COLUMNS)
+            if self._load_cached(cache_dir, digest):
+                return
+        
+        # Decode and split every piece (in parallel with an executor), then
+        # collect the results in SPRITE_FILES order. Cutting and rotating the
+        # 48 px tiles is faster than decoding a tile strip, so the sprite
+        # pipeline only builds strips for the other sizes (see scaled_atlas())
+        jobs = {}
         for shape_type, filepath in SPRITE_FILES.items():
             if os.path.exists(filepath):
-                try:
-                    sprite = image.load(filepath)
-                    self.sprites[shape_type] = sprite
-                    print(f"Loaded sprite for {shape_type}: {filepath} ({sprite.get_width()}x{sprite.get_height()})")
-                    
-                    # Pre-split this sprite into individual blocks
-                    self._split_sprite(shape_type, sprite)
-                    
-                except Exception as e:
-                    print(f"Error loading sprite {filepath}: {e}")
-                    self.use_sprites = False
+                args = (shape_type, filepath)
+                jobs[shape_type] = (filepath, executor.submit(self._load_piece, *args) if executor else args)
             else:
                 print(f"Sprite file not found: {filepath}")
                 self.use_sprites = False
+        
+        for shape_type, (filepath, job) in jobs.items():
+            try:
+                sprite, tiles = job.result() if executor else self._load_piece(*job)
+            except Exception as e:
+                print(f"Error loading sprite {filepath}: {e}")
+                self.use_sprites = False
+                continue
+            self.sprites[shape_type] = sprite
+            self._store_tiles(tiles)
+            print(f"Loaded sprite for {shape_type}: {filepath} ({sprite.get_width()}x{sprite.get_height()})")
+        
+        self._build_atlas()
+        if digest and self.use_sprites:
+            self._save_cached(cache_dir, digest)
+    
+    def _load_cached(self, cache_dir, digest):
+        """Load sprites and the atlas from the asset cache, returns True on a hit"""
+        import pygame
+        
+        cached = asset_cache.load_surfaces(cache_dir, 'sprites', digest)
+        if cached is None:
+            return False
+        
+        # An entry with the wrong structure is treated as a miss
+        surfaces, meta = cached
+        try:
+            atlas = surfaces['atlas']
+            atlas_rects = {}
+            for name, rect in meta['atlas_rects'].items():
+                shape_type, dx, dy, rotation = name.split(',')
+                atlas_rects[(shape_type, int(dx), int(dy), int(rotation))] = pygame.Rect(rect)
+            if not all(atlas.get_rect().contains(rect) for rect in atlas_rects.values()):
+                return False
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return False
+        
+        self.sprites = {key[len('sprite:'):]: surface for key, surface in surfaces.items() if key.startswith('sprite:')}
+        self.atlas = atlas
+        self.atlas_rects = atlas_rects
+        self._link_atlas_tiles()
+        print(f"Loaded {len(self.sprites)} sprites and {len(self.atlas_rects)} tiles from the asset cache")
+        return True
+    
+    def _save_cached(self, cache_dir, digest):
+        """Store the loaded sprites and the atlas in the asset cache"""
+        surfaces = {f'sprite:{shape_type}': sprite for shape_type, sprite in self.sprites.items()}
+        surfaces['atlas'] = self.atlas
+        meta = {
+            'atlas_rects': {
+                ','.join(str(part) for part in key): list(rect) for key, rect in self.atlas_rects.items()
+            }
+        }
+        asset_cache.save_surfaces(cache_dir, 'sprites', digest, surfaces, meta)
+    
+    def _build_atlas(self):
+        """
+        Pack every rotated block sprite into a single atlas surface.
+        
+        The per-block surfaces in block_sprites and rotated_sprites are
+        replaced by subsurfaces of the atlas, so they share its pixels and
+        blitting any block reads from the same surface.
+        """
+        if not self.rotated_sprites:
+            return
+        
+        self.atlas, self.atlas_rects = self._pack_atlas(self.rotated_sprites, BLOCK_SIZE)
+        self._link_atlas_tiles()
+    
+    @staticmethod
+    def _pack_atlas(tiles, block_size):
+        """
+        Pack square tiles into one surface, ATLAS_COLUMNS per row in key order.
+        
+        Returns:
+            (atlas, rects) with rects mapping each tile key to its Rect
+        """
+        import pygame
+        
+        keys = sorted(tiles)
+        rows = (len(keys) + ATLAS_COLUMNS - 1) // ATLAS_COLUMNS
+        atlas = pygame.Surface((ATLAS_COLUMNS * block_size, rows * block_size), pygame.SRCALPHA)
+        rects = {}
+        
+        for index, key in enumerate(keys):
+            row, column = divmod(index, ATLAS_COLUMNS)
+            rect = pygame.Rect(column * block_size, row * block_size, block_size, block_size)
+            atlas.blit(tiles[key], rect)
+            rects[key] = rect
+        return atlas, rects
+    
+    def scaled_atlas(self, block_size):
+        """
+        Get the sprite atlas for another block size, built on first use.
+        
+        Each tile is scaled once with smoothscale (or taken from a tile strip
+        generate_sprites.py built for that size) and packed into an atlas of
+        its own, so drawing at any scale is a plain blit.
+        
+        Args:
+            block_size: Edge length of a block on screen
+        
+        Returns:
+            (atlas, atlas_rects) pair, atlas is None without sprites
+        """
+        if block_size == BLOCK_SIZE:
+            return self.atlas, self.atlas_rects
+        scaled = self.scaled_atlases.get(block_size)
+        if scaled is not None:
+            return scaled
+        if not self.rotated_sprites:
+            return None, {}
+        
+        import pygame
+        
+        # Tiles drawn for this size by the sprite pipeline, scale the rest
+        tiles = {}
+        prebuilt = read_tile_manifest(block_size=block_size)
+        for shape_type, filepath in SPRITE_FILES.items():
+            entry = prebuilt.get(shape_type)
+            if entry:
+                tiles.update(self._load_prebuilt_tiles(filepath, entry) or {})
+        for key, tile in self.rotated_sprites.items():
+            if key not in tiles:
+                tiles[key] = pygame.transform.smoothscale(tile, (block_size, block_size))
+        
+        atlas, rects = self._pack_atlas(tiles, block_size)
+        if pygame.display.get_surface() is not None:
+            atlas = atlas.convert_alpha()
+        scaled = self.scaled_atlases[block_size] = (atlas, rects)
+        return scaled
+    
+    def _link_atlas_tiles(self):
+        """Point rotated_sprites and block_sprites at subsurfaces of the current atlas"""
+        for key, rect in self.atlas_rects.items():
+            tile = self.atlas.subsurface(rect)
+            self.rotated_sprites[key] = tile
+            if key[3] == 0:
+                self.block_sprites[key[:3]] = tile
+    
+    @classmethod
+    def _load_piece(cls, shape_type, filepath):
+        """
+        Decode a piece sprite and cut it into rotated tiles.
+        
+        Only creates new surfaces and touches no shared state, so pieces can
+        be loaded on several threads at once.
+        
+        Args:
+            shape_type: The piece type
+            filepath: Sprite file
+        
+        Returns:
+            (sprite, tiles) with tiles as returned by _cut_tiles
+        """
+        import pygame
+        
+        sprite = pygame.image.load(filepath)
+        return sprite, cls._cut_tiles(shape_type, sprite)
+    
+    @staticmethod
+    def _load_prebuilt_tiles(filepath, entry):
+        """
+        Load a piece's scaled tile strip, or None if it is missing or outdated.
+        
+        A strip is outdated when the 48 px sprite changed since it was scaled,
+        or when its own sprite file changed. Tiles are as tall as the strip,
+        so this works for every block size.
+        
+        Args:
+            filepath: The piece's 48 px sprite file
+            entry: The piece's manifest entry for the strip's block size
+        """
+        import pygame
+        
+        try:
+            sprite_path = os.path.join(os.path.dirname(filepath), entry['sprite'])
+            if (asset_cache.source_hash([filepath]) != entry['source_hash']
+                    or asset_cache.source_hash([sprite_path]) != entry['sprite_hash']):
+                return None
+            strip = pygame.image.load(os.path.join(os.path.dirname(sprite_path), entry['tiles']))
+        except (OSError, KeyError, pygame.error):
+            return None
+        
+        tiles = {}
+        block_size = strip.get_height()
+        for index, name in enumerate(entry['tile_keys']):
+            shape_type, dx, dy, rotation = name.split(',')
+            tiles[(shape_type, int(dx), int(dy), int(rotation))] = strip.subsurface(
+                (index * block_size, 0, block_size, block_size))
+        return tiles
+    
+    def _store_tiles(self, tiles):
+        """Add tiles from _cut_tiles to rotated_sprites and block_sprites"""
+        for key, tile in tiles.items():
+            self.rotated_sprites[key] = tile
+            if key[3] == 0:
+                self.block_sprites[key[:3]] = tile
     
     def _split_sprite(self, shape_type, sprite):
         """
@@ -94,38 +373,101 @@ class SpriteManager:
             shape_type: The piece type ('I', 'O', etc.)
             sprite: The full sprite surface to split
         """
+        self._store_tiles(self._cut_tiles(shape_type, sprite))
+    
+    @staticmethod
+    def _cut_tiles(shape_type, sprite, block_size=BLOCK_SIZE):
+        """
+        Cut a full piece sprite into square blocks in all four rotations.
+        
+        Args:
+            shape_type: The piece type ('I', 'O', etc.)
+            sprite: The full sprite surface to split
+            block_size: Edge length of a block in the sprite
+        
+        Returns:
+            Dictionary of (shape_type, dx, dy, rotation) -> Surface
+        """
+        import pygame
+        
+        tiles = {}
         # Calculate how many blocks wide and tall the sprite is
-        width_blocks = sprite.get_width() // BLOCK_SIZE
-        height_blocks = sprite.get_height() // BLOCK_SIZE
+        width_blocks = sprite.get_width() // block_size
+        height_blocks = sprite.get_height() // block_size
         
-        # Extract each 48x48 block
+        # Extract each block
         for dy in range(height_blocks):
             for dx in range(width_blocks):
                 # Create a new surface for this block
-                block_surface = Surface((BLOCK_SIZE, BLOCK_SIZE), SRCALPHA)
+                block_surface = pygame.Surface((block_size, block_size), pygame.SRCALPHA)
                 
                 # Extract the portion from the full sprite
-                sprite_x = dx * BLOCK_SIZE
-                sprite_y = dy * BLOCK_SIZE
+                sprite_x = dx * block_size
+                sprite_y = dy * block_size
                 
                 try:
-                    block_surface.blit(sprite, (0, 0), (sprite_x, sprite_y, BLOCK_SIZE, BLOCK_SIZE))
+                    block_surface.blit(sprite, (0, 0), (sprite_x, sprite_y, block_size, block_size))
                     
                     # Add a subtle border to make blocks distinct
                     border_color = (100, 100, 100)
-                    pygame.draw.rect(block_surface, border_color, (0, 0, BLOCK_SIZE, BLOCK_SIZE), 1)
+                    pygame.draw.rect(block_surface, border_color, (0, 0, block_size, block_size), 1)
                     
                     # Store the original (0 degrees) block sprite
-                    self.block_sprites[(shape_type, dx, dy)] = block_surface
-                    self.rotated_sprites[(shape_type, dx, dy, 0)] = block_surface
+                    tiles[(shape_type, dx, dy, 0)] = block_surface
                     
                     # Create and store rotated versions (90, 180, 270 degrees)
                     for rotation in [90, 180, 270]:
                         rotated = pygame.transform.rotate(block_surface, rotation)
-                        self.rotated_sprites[(shape_type, dx, dy, rotation)] = rotated
-                    
+                        tiles[(shape_type, dx, dy, rotation)] = rotated
+                
                 except Exception as e:
                     print(f"Error splitting sprite at ({dx}, {dy}) for {shape_type}: {e}")
+        return tiles
+    
+    def convert_sprites(self):
+        """
+        Convert all loaded sprites to the display's pixel format.
+        
+        Surfaces straight from image.load keep the file's pixel format, so
+        every blit would convert them again. Needs a display mode, so call it
+        after pygame.display.set_mode (Pygame Zero sets one on import).
+        
+        Returns:
+            True if the sprites were converted, False without a display
+        """
+        import pygame
+        
+        if pygame.display.get_surface() is None:
+            return False
+        
+        self.sprites = {shape_type: sprite.convert_alpha() for shape_type, sprite in self.sprites.items()}
+        if self.atlas is not None:
+            self.atlas = self.atlas.convert_alpha()
+            self._link_atlas_tiles()
+        else:
+            self.rotated_sprites = {key: tile.convert_alpha() for key, tile in self.rotated_sprites.items()}
+            self.block_sprites = {key[:3]: tile for key, tile in self.rotated_sprites.items() if key[3] == 0}
+        # Blocks handed out so far point at the unconverted sprites, scaled
+        # atlases are rebuilt from the converted tiles
+        self._blocks = {}
+        self.scaled_atlases = {}
+        return True
+    
+    def cache_bytes(self):
+        """
+        Number of bytes of pixel data held by the sprite cache.
+        
+        Block tiles that are subsurfaces of the atlas share its pixels and
+        are only counted once, as part of the atlas. Atlases scaled for other
+        block sizes are included.
+        """
+        surfaces = list(self.sprites.values())
+        if self.atlas is not None:
+            surfaces.append(self.atlas)
+        else:
+            surfaces.extend(self.rotated_sprites.values())
+        surfaces.extend(atlas for atlas, _ in self.scaled_atlases.values())
+        return sum(surface.get_pitch() * surface.get_height() for surface in surfaces)
     
     def get_block_sprite(self, shape_type, dx, dy, rotation=0):
         """
@@ -136,32 +478,68 @@ class SpriteManager:
             dx: X offset of the block within the piece shape
             dy: Y offset of the block within the piece shape
             rotation: Rotation angle in degrees (0, 90, 180, 270)
-            
+        
         Returns:
             A 48x48 Surface with the block sprite (rotated), or None
         """
+        if not self.loaded and self.autoload:
+            self.load_sprites()
         if not self.use_sprites:
             return None
         
         # Get the rotated version if available
         return self.rotated_sprites.get((shape_type, dx, dy, rotation))
     
+    def get_block_region(self, shape_type, dx, dy, rotation=0, block_size=BLOCK_SIZE):
+        """
+        Get where a rotated block sprite lives in the atlas.
+        
+        Blitting with area=source_rect draws the same pixels as the surface
+        from get_block_sprite, but every block comes from one surface, so a
+        whole board can go through a single Surface.blits() call.
+        
+        Args:
+            shape_type: The type of piece ('I', 'O', 'T', 'L', 'J', 'S', 'Z')
+            dx: X offset of the block within the piece shape
+            dy: Y offset of the block within the piece shape
+            rotation: Rotation angle in degrees (0, 90, 180, 270)
+            block_size: Size of the tile on screen, other sizes than
+                BLOCK_SIZE come from scaled_atlas()
+        
+        Returns:
+            An (atlas, source_rect) pair, or None
+        """
+        if not self.loaded and self.autoload:
+            self.load_sprites()
+        if not self.use_sprites:
+            return None
+        
+        atlas, rects = self.scaled_atlas(block_size)
+        rect = rects.get((shape_type, dx, dy, rotation))
+        if rect is None:
+            return None
+        return atlas, rect
+    
     def create_block(self, shape_type, dx, dy, rotation=0):
         """
-        Create a Block object with pre-loaded sprite.
+        Get the shared Block object with pre-loaded sprite.
         
         Args:
             shape_type: The piece type
             dx: X position in the original sprite
             dy: Y position in the original sprite
-            rotation: Initial rotation angle in degrees (0, 90, 180, 270)
-            
+            rotation: Rotation angle in degrees (0, 90, 180, 270)
+        
         Returns:
-            A Block object with sprite loaded
+            A Block object with sprite loaded, the same one for equal arguments
         """
-        sprite = self.get_block_sprite(shape_type, dx, dy, rotation)
-        return Block(shape_type, dx, dy, sprite, rotation)
-            
+        key = (shape_type, dx, dy, rotation)
+        block = self._blocks.get(key)
+        if block is None:
+            sprite = self.get_block_sprite(shape_type, dx, dy, rotation)
+            block = self._blocks[key] = Block(shape_type, dx, dy, sprite, rotation)
+        return block
+    
     def has_sprites(self):
         """Check if sprites are loaded and ready to use"""
         return self.use_sprites and len(self.sprites) > 0
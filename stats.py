@@ -0,0 +1,17 @@
+"""
+Summary statistics for HaHa Hausservice Haubentaucher Tetris
+
+Shared by the batch simulator and the in-game profiler. Kept free of other
+imports so the game does not load the simulator to report frame times.
+"""
+
+
+def percentile(sorted_values, p):
+    """Linearly interpolated percentile p (0-100) of an already sorted list"""
+    if not sorted_values:
+        return 0
+    position = (len(sorted_values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
@@ -9,16 +9,76 @@ This test suite covers:
 - Scoring system
 - Level progression
 - Game over detection
+- Bitboard grid backend and its incremental counters
+- Precomputed rotation tables
+- Hard-drop landing computation
+- Headless game sessions
+- Seedable piece generators (uniform, 7-bag, history)
+- Binary replay recording, playback and seeking
+- Profiler instrumentation and Prometheus metrics export
+- Batch simulator statistics
+- NumPy batch boards (cross-checked against the scalar rules)
+- Placement enumeration for bots
+- Sprite atlas packing (serial and threaded loading)
+- On-disk asset cache (malformed entries are misses)
+- Sprite generation pipeline (manifest skipping, scaled tile strips, stale strips after sprite changes, parallel runs)
+- Lazy pygame import and sprite loading, profiler import without the simulator
+- Dirty-rectangle rendering (cross-checked against full redraws)
+- Resolution-independent layout and per-block-size tile atlases
 """
 
+import json
+import os
+import random
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
 import pytest
+
+# Render offscreen, the renderer tests need an initialized display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+import simulate
+import stats
+import asset_cache
+import replay
+import game_logic
+import sprite_manager as sprite_manager_module
+from profiler import Profiler, HOT_PATHS
+from renderer import Renderer, TextCache, Layout, NEXT_PIECE_BOX, WIDTH, HEIGHT, parse_resolution
+from sprite_manager import Block, SpriteManager, SPRITE_FILES, read_tile_manifest
+from placement import find_placements
 from game_logic import (
-    Piece, SHAPES, PIECE_COLORS, GRID_WIDTH, GRID_HEIGHT,
+    Piece, SHAPES, ROTATIONS, PIECE_COLORS, GRID_WIDTH, GRID_HEIGHT,
     SCORE_SINGLE, SCORE_DOUBLE, SCORE_TRIPLE, SCORE_TETRIS,
     SCORE_SOFT_DROP, SCORE_HARD_DROP, INITIAL_FALL_SPEED, SPEED_MULTIPLIER,
-    check_collision, lock_piece, check_lines, clear_lines, spawn_piece
+    TICK_RATE, TICK_TIME, MAX_CATCH_UP_TICKS,
+    ACTIONS, ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_SOFT_DROP, ACTION_HARD_DROP,
+    BitboardGrid, GameSession, column_heights, drop_distance, check_collision, lock_piece, check_lines, clear_lines,
+    spawn_piece, try_rotate, SHAPE_TYPES, GENERATOR_UNIFORM, GENERATOR_BAG, GENERATOR_HISTORY,
+    BagGenerator, create_generator
 )
 
+try:
+    import numpy
+    import batch_board
+except ImportError:  # numpy is an optional dependency
+    numpy = None
+
+requires_numpy = pytest.mark.skipif(numpy is None, reason="numpy is not installed")
+
+
+def random_grid(rng, fill=0.5, full_rows=()):
+    """Create a list grid with random cells in the bottom half and some full rows"""
+    grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+    for y in range(GRID_HEIGHT // 2, GRID_HEIGHT):
+        for x in range(GRID_WIDTH):
+            if rng.random() < fill:
+                grid[y][x] = 1
+    for y in full_rows:
+        grid[y] = [1] * GRID_WIDTH
+    return grid
+
 
 class TestPiece:
     """Test the Piece class"""
@@ -118,6 +178,191 @@ class TestPiece:
             assert len(piece.shape) == 4  # All tetrominos have 4 blocks
 
 
+class TestIncrementalCounters:
+    """Test the row counts, column heights and full rows kept by BitboardGrid"""
+    
+    def assert_counters_match(self, grid):
+        """Compare the incremental counters with a fresh scan of the grid"""
+        fresh = BitboardGrid.from_list(grid.to_list())
+        assert grid.rows == fresh.rows
+        assert grid.row_counts == fresh.row_counts
+        assert grid.heights == fresh.heights
+        assert grid.full_rows == fresh.full_rows
+    
+    def test_lock_updates_counters(self):
+        """Test that locking a piece updates counts and heights of touched cells"""
+        grid = BitboardGrid()
+        piece = Piece('L')  # Cells (0,0), (0,1), (0,2), (1,2)
+        piece.x = 2
+        piece.y = 17
+        
+        lock_piece(piece, grid)
+        
+        assert grid.row_counts[17] == 1
+        assert grid.row_counts[19] == 2
+        assert grid.heights[2] == 3
+        assert grid.heights[3] == 1
+        assert column_heights(grid) == column_heights(grid.to_list())
+    
+    def test_full_rows_tracked(self):
+        """Test that completing a row by locking marks it full"""
+        grid = BitboardGrid()
+        grid[19] = [1, 1, 1, 1, 1, 1, 1, 1, 0, 0]
+        grid[18] = [1, 1, 1, 1, 1, 1, 1, 1, 0, 0]
+        assert check_lines(grid) == []
+        
+        piece = Piece('O')
+        piece.x = 8
+        piece.y = 18
+        lock_piece(piece, grid)
+        
+        assert grid.full_rows == {18, 19}
+        assert check_lines(grid) == [18, 19]
+    
+    def test_clear_keeps_heights_with_holes(self):
+        """Test column heights after clearing rows under overhangs and holes"""
+        grid = BitboardGrid.from_list(random_grid(random.Random(8), fill=0.6, full_rows=(13, 17, 19)))
+        game_state = {'score': 0, 'level': 1, 'lines_cleared': 0, 'fall_speed': INITIAL_FALL_SPEED}
+        
+        clear_lines(check_lines(grid), grid, game_state)
+        
+        self.assert_counters_match(grid)
+        assert check_lines(grid) == []
+    
+    def test_clear_any_rows(self):
+        """Test the counters after clearing arbitrary rows, full or not, including column tops"""
+        rng = random.Random(21)
+        for _ in range(300):
+            grid = BitboardGrid.from_list(random_grid(rng, fill=rng.random(), full_rows=rng.sample(range(8, 20), 3)))
+            grid.clear_rows(sorted(rng.sample(range(GRID_HEIGHT), rng.randrange(1, 5)), reverse=True))
+            self.assert_counters_match(grid)
+    
+    def test_counters_during_games(self):
+        """Test that the counters stay exact over whole random games"""
+        for seed in range(5):
+            session = GameSession(seed=seed)
+            rng = random.Random(seed)
+            while not session.game_over:
+                session.step(rng.choice(ACTIONS))
+                self.assert_counters_match(session.grid)
+
+
+class TestDropDistance:
+    """Test the hard-drop landing computation"""
+    
+    def stepped_distance(self, piece, grid):
+        """Reference: move down one cell at a time until the next step collides"""
+        distance = 0
+        while not check_collision(piece, grid, 0, distance + 1):
+            distance += 1
+        return distance
+    
+    def test_empty_grid(self):
+        """Test that a piece falls to the floor of an empty grid"""
+        piece = Piece('I')
+        assert drop_distance(piece, BitboardGrid()) == GRID_HEIGHT - 1
+        assert drop_distance(piece, [[0] * GRID_WIDTH for _ in range(GRID_HEIGHT)]) == GRID_HEIGHT - 1
+    
+    def test_matches_stepping_with_overhangs(self):
+        """Test exact results on random boards, including pieces under overhangs"""
+        rng = random.Random(12)
+        for _ in range(20):
+            list_grid = random_grid(rng, fill=0.45)
+            grid = BitboardGrid.from_list(list_grid)
+            for shape_type in SHAPES:
+                piece = Piece(shape_type)
+                for rotation in range(len(piece.states)):
+                    piece.rotation = rotation
+                    for x in range(GRID_WIDTH - piece.state.width + 1):
+                        for y in range(-2, GRID_HEIGHT):
+                            piece.x = x
+                            piece.y = y
+                            if check_collision(piece, grid, 0, 0):
+                                continue
+                            expected = self.stepped_distance(piece, grid)
+                            assert drop_distance(piece, grid) == expected
+                            assert drop_distance(piece, list_grid) == expected
+    
+    def test_hard_drop_uses_landing_row(self):
+        """Test that the session hard drop scores the dropped distance"""
+        session = GameSession(seed=2)
+        piece = session.game_state['current_piece']
+        distance = drop_distance(piece, session.grid)
+        
+        session.step(ACTION_HARD_DROP)
+        
+        assert session.game_state['score'] == distance * SCORE_HARD_DROP
+        assert piece.y + piece.state.height == GRID_HEIGHT
+
+
+class TestRotationTables:
+    """Test the precomputed rotation states"""
+    
+    def test_state_counts(self):
+        """Test that the O-piece has one state and every other piece four"""
+        for shape_type in SHAPES:
+            expected = 1 if shape_type == 'O' else 4
+            assert len(ROTATIONS[shape_type]) == expected
+    
+    def test_first_state_matches_shapes(self):
+        """Test that rotation 0 keeps the SHAPES offsets and block order"""
+        for shape_type, offsets in SHAPES.items():
+            assert list(ROTATIONS[shape_type][0].offsets) == offsets
+    
+    def test_state_tables(self):
+        """Test bounding box, bottom profile and row masks of every state"""
+        for states in ROTATIONS.values():
+            for state in states:
+                assert state.width == max(dx for dx, dy in state.offsets) + 1
+                assert state.height == max(dy for dx, dy in state.offsets) + 1
+                for column in range(state.width):
+                    assert state.bottom[column] == max(
+                        dy for dx, dy in state.offsets if dx == column
+                    )
+                cells = {(dx, dy) for dy, mask in enumerate(state.row_masks)
+                         for dx in range(state.width) if mask & (1 << dx)}
+                assert cells == set(state.offsets)
+    
+    def test_rotation_index_and_block_sprites(self):
+        """Test that rotating advances the index and block sprite rotation"""
+        piece = Piece('L')
+        piece.rotate()
+        assert piece.rotation == 1
+        assert piece.state is ROTATIONS['L'][1]
+        assert all(block.rotation == 90 for pos, block in piece.blocks)
+        
+        # Restoring a saved rotation also restores the sprites
+        piece.rotation = 0
+        assert piece.shape == SHAPES['L']
+        assert all(block.rotation == 0 for pos, block in piece.blocks)
+    
+    def test_o_piece_blocks_keep_rotation(self):
+        """Test that O-piece blocks are never rotated"""
+        piece = Piece('O')
+        piece.rotate()
+        assert piece.rotation == 0
+        assert all(block.rotation == 0 for pos, block in piece.blocks)
+    
+    def test_blocks_are_shared(self):
+        """Test that pieces share interned blocks and rotating swaps them"""
+        first, second = Piece('T'), Piece('T')
+        assert [block for pos, block in first.blocks] == [block for pos, block in second.blocks]
+        
+        before = [block for pos, block in first.blocks]
+        first.rotate()
+        assert all(block.rotation == 0 for block in before)
+        assert all(block.rotation == 90 for pos, block in first.blocks)
+        assert second.blocks[0][1].rotation == 0
+        assert Block.get('T', 1, 0, 90) is first.blocks[1][1]
+        assert not hasattr(first.blocks[0][1], '__dict__')
+    
+    def test_sprite_manager_blocks_are_shared(self):
+        """Test that a sprite manager hands out one block per key"""
+        manager = SpriteManager(autoload=False)
+        assert manager.create_block('S', 1, 0, 180) is manager.create_block('S', 1, 0, 180)
+        assert Piece('S', manager).blocks[0][1] is Piece('S', manager).blocks[0][1]
+
+
 class TestCollisionDetection:
     """Test collision detection logic"""
     
@@ -481,6 +726,1222 @@ class TestGameOver:
         assert game_state['game_over'] == True
 
 
+class TestBitboardGrid:
+    """Test the bitboard grid backend against the list-of-lists grid"""
+    
+    def test_empty_grid(self):
+        """Test that a new bitboard grid is empty"""
+        grid = BitboardGrid()
+        assert len(grid) == GRID_HEIGHT
+        assert grid.rows == [0] * GRID_HEIGHT
+        assert grid.to_list() == [[0] * GRID_WIDTH for _ in range(GRID_HEIGHT)]
+    
+    def test_row_assignment_updates_mask(self):
+        """Test that assigning a row keeps the bitmask in sync"""
+        grid = BitboardGrid()
+        grid[19] = [1, 1, 1, 0, 1, 1, 1, 1, 1, 1]
+        assert grid.rows[19] == grid.full_mask & ~(1 << 3)
+        assert grid[19][3] == 0
+        assert grid[19][4] == 1
+    
+    def test_collision_matches_list_grid(self):
+        """Test that collision results match the list grid for every piece and offset"""
+        list_grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        list_grid[10][5] = 'I'
+        list_grid[19] = [1, 1, 1, 1, 0, 1, 1, 1, 1, 1]
+        list_grid[18][0] = 'Z'
+        bitboard = BitboardGrid.from_list(list_grid)
+        
+        for shape_type in SHAPES:
+            piece = Piece(shape_type)
+            for _ in range(4):
+                for x in range(-3, GRID_WIDTH + 1):
+                    for y in range(-3, GRID_HEIGHT + 1):
+                        piece.x = x
+                        piece.y = y
+                        assert check_collision(piece, bitboard, 0, 0) == \
+                            check_collision(piece, list_grid, 0, 0)
+                        assert check_collision(piece, bitboard, -1, 1) == \
+                            check_collision(piece, list_grid, -1, 1)
+                piece.rotate()
+    
+    def test_lock_piece_sets_mask_and_block(self):
+        """Test that locking stores Block objects and sets the row bits"""
+        grid = BitboardGrid()
+        piece = Piece('O')
+        piece.x = 4
+        piece.y = 18
+        
+        lock_piece(piece, grid)
+        
+        assert grid[18][4].shape_type == 'O'
+        assert grid[19][5].shape_type == 'O'
+        assert grid.rows[18] == (1 << 4) | (1 << 5)
+        assert grid.rows[19] == (1 << 4) | (1 << 5)
+        assert check_collision(piece, grid, 0, 0) == True
+    
+    def test_check_and_clear_lines(self):
+        """Test that line detection and clearing match the list grid"""
+        list_grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        list_grid[16] = [1, 0, 0, 0, 0, 0, 0, 0, 0, 1]
+        list_grid[17] = [1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
+        list_grid[18] = [0, 1, 0, 0, 0, 0, 0, 0, 0, 0]
+        list_grid[19] = [1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
+        bitboard = BitboardGrid.from_list(list_grid)
+        
+        lines = check_lines(bitboard)
+        assert lines == check_lines(list_grid) == [17, 19]
+        
+        list_state = {'score': 0, 'level': 1, 'lines_cleared': 0, 'fall_speed': INITIAL_FALL_SPEED}
+        bit_state = dict(list_state)
+        clear_lines(check_lines(list_grid), list_grid, list_state)
+        clear_lines(lines, bitboard, bit_state)
+        
+        assert bitboard.to_list() == list_grid
+        assert bitboard.rows == BitboardGrid.from_list(list_grid).rows
+        assert bit_state == list_state
+        assert bit_state['score'] == SCORE_DOUBLE
+
+
+class TestGameSession:
+    """Test the headless game session"""
+    
+    def test_session_starts_with_pieces(self):
+        """Test that a new session has a current and next piece"""
+        session = GameSession(seed=1)
+        assert session.game_state['current_piece'] is not None
+        assert session.game_state['next_piece'] is not None
+        assert session.game_state['score'] == 0
+        assert session.game_over == False
+    
+    def test_same_seed_same_game(self):
+        """Test that two sessions with the same seed play identically"""
+        first = GameSession(seed=42)
+        second = GameSession(seed=42)
+        for i in range(200):
+            action = ACTIONS[i % len(ACTIONS)]
+            first.step(action)
+            second.step(action)
+        
+        assert first.grid.rows == second.grid.rows
+        assert first.game_state['score'] == second.game_state['score']
+        assert first.pieces_placed == second.pieces_placed
+    
+    def test_step_moves_piece(self):
+        """Test that left/right steps move the piece and stop at the wall"""
+        session = GameSession(seed=3)
+        piece = session.game_state['current_piece']
+        start_x = piece.x
+        
+        assert session.step(ACTION_RIGHT) == True
+        assert piece.x == start_x + 1
+        
+        while session.step(ACTION_LEFT):
+            pass
+        assert piece.x == 0
+    
+    def test_hard_drop_locks_and_spawns(self):
+        """Test that a hard drop scores, locks and spawns the next piece"""
+        session = GameSession(seed=5)
+        piece = session.game_state['current_piece']
+        next_piece = session.game_state['next_piece']
+        
+        session.step(ACTION_HARD_DROP)
+        
+        assert session.pieces_placed == 1
+        assert session.game_state['current_piece'] is next_piece
+        assert session.game_state['score'] > 0
+        assert session.grid.rows[GRID_HEIGHT - 1] != 0
+        assert piece.y + piece.state.height == GRID_HEIGHT
+    
+    def test_tick_falls_and_locks(self):
+        """Test that ticking moves the piece down and eventually locks it"""
+        session = GameSession(seed=7, bitboard=False)
+        piece = session.game_state['current_piece']
+        fall_ticks = int(INITIAL_FALL_SPEED * TICK_RATE)
+        
+        session.advance(fall_ticks - 1)
+        assert piece.y == 0
+        session.advance(1)
+        assert piece.y == 1
+        
+        for _ in range(GRID_HEIGHT + 1):
+            session.advance(fall_ticks)
+        assert session.pieces_placed == 1
+        assert session.game_state['current_piece'] is not piece
+    
+    def test_fall_rate_independent_of_frame_rate(self):
+        """Test that the same time played at different frame rates gives the same game"""
+        sessions = []
+        for fps, frames in ((30, 151), (120, 604), (144, 725)):
+            session = GameSession(seed=4)
+            for _ in range(frames):
+                session.tick(1 / fps)
+            sessions.append(session)
+        # About 5.03 seconds each, well away from a step boundary
+        assert {session.ticks for session in sessions} == {322}
+        assert len({tuple(session.grid.rows) for session in sessions}) == 1
+        assert len({session.game_state['current_piece'].y for session in sessions}) == 1
+    
+    def test_leftover_time_carries_over(self):
+        """Test that falls keep their rate when the fall interval is not a whole number of steps"""
+        session = GameSession(seed=4)
+        session.game_state['fall_speed'] = 0.02
+        piece = session.game_state['current_piece']
+        session.advance(20)
+        # 20 steps are 0.3125 s, 15 falls (dropping the remainder would give 10)
+        assert piece.y == 15
+        assert session.tick(TICK_TIME * 0.5) == 0
+        assert session.interpolation == 0.5
+    
+    def test_several_falls_per_step(self):
+        """Test that falls faster than the step rate move several cells per step"""
+        session = GameSession(seed=4)
+        session.game_state['fall_speed'] = TICK_TIME / 4
+        piece = session.game_state['current_piece']
+        session.advance(2)
+        assert piece.y == 8
+    
+    def test_catch_up_is_capped(self):
+        """Test that a long stall runs a bounded number of steps and drops the rest"""
+        session = GameSession(seed=4)
+        assert session.tick(1.0) == MAX_CATCH_UP_TICKS
+        assert session.ticks == MAX_CATCH_UP_TICKS
+        assert 0 <= session.accumulator < TICK_TIME
+    
+    def test_game_ends_and_resets(self):
+        """Test that repeated hard drops end the game and reset starts over"""
+        session = GameSession(seed=11)
+        while not session.game_over:
+            session.step(ACTION_HARD_DROP)
+        assert session.step(ACTION_LEFT) == False
+        
+        session.reset()
+        assert session.game_over == False
+        assert session.pieces_placed == 0
+        assert session.grid.rows == [0] * GRID_HEIGHT
+    
+    def test_unknown_action(self):
+        """Test that unknown actions are rejected"""
+        session = GameSession(seed=1)
+        with pytest.raises(ValueError):
+            session.step('jump')
+    
+    def test_try_rotate_wall_kick(self):
+        """Test that rotating against the wall kicks the piece back inside"""
+        grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        piece = Piece('I')
+        piece.rotate()  # Vertical
+        piece.x = GRID_WIDTH - 2
+        piece.y = 5
+        
+        assert try_rotate(piece, grid) == True
+        assert check_collision(piece, grid, 0, 0) == False
+        assert piece.x + piece.state.width <= GRID_WIDTH
+    
+    def test_try_rotate_blocked_reverts(self):
+        """Test that a rotation with no valid kick is reverted"""
+        grid = [[1 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        piece = Piece('T')
+        piece.y = -1  # Every rotation or kick overlaps the filled rows
+        
+        assert try_rotate(piece, grid) == False
+        assert piece.rotation == 0
+        assert piece.y == -1
+
+
+class TestPieceGenerators:
+    """Test the seedable piece generators"""
+    
+    def test_uniform_matches_random_choice(self):
+        """Test that the uniform generator keeps the sequence of rng.choice"""
+        expected_rng = random.Random(7)
+        expected = [expected_rng.choice(list(SHAPES.keys())) for _ in range(2000)]
+        generator = create_generator(GENERATOR_UNIFORM, seed=7)
+        assert [generator.next_shape() for _ in range(2000)] == expected
+    
+    def test_bag_deals_every_shape_once(self):
+        """Test that each run of seven pieces is a permutation of all shapes"""
+        generator = create_generator(GENERATOR_BAG, seed=3)
+        pieces = [SHAPE_TYPES[index] for index in generator.generate(7 * 50)]
+        for start in range(0, len(pieces), 7):
+            assert sorted(pieces[start:start + 7]) == sorted(SHAPE_TYPES)
+    
+    def test_history_avoids_repeats(self):
+        """Test that the history generator repeats recent shapes less than uniform"""
+        def repeats(generator):
+            pieces = list(generator.generate(5000))
+            return sum(a == b for a, b in zip(pieces, pieces[1:]))
+        
+        assert repeats(create_generator(GENERATOR_HISTORY, seed=1)) * 3 < \
+            repeats(create_generator(GENERATOR_UNIFORM, seed=1))
+    
+    @pytest.mark.parametrize('kind', [GENERATOR_UNIFORM, GENERATOR_BAG, GENERATOR_HISTORY])
+    def test_bulk_and_single_pulls_agree(self, kind):
+        """Test that generate() and next_shape() consume the same stream"""
+        single = create_generator(kind, seed=11)
+        expected = [single.next_shape() for _ in range(3000)]
+        
+        mixed = create_generator(kind, seed=11)
+        pieces = [mixed.next_shape() for _ in range(5)]
+        pieces += [SHAPE_TYPES[index] for index in mixed.generate(1500)]
+        pieces += [mixed.next_shape() for _ in range(1495)]
+        assert pieces == expected
+    
+    def test_refills_start_small_and_grow(self):
+        """Test that a new generator only draws a small chunk, then doubles it"""
+        generator = create_generator(GENERATOR_UNIFORM, seed=2)
+        generator.next_shape()
+        assert len(generator._queue) == generator.CHUNK_SIZE
+        sizes = []
+        for _ in range(4000):
+            generator.next_shape()
+            if generator._position == 1:
+                sizes.append(len(generator._queue))
+        assert sizes[:3] == [generator.CHUNK_SIZE * 2, generator.CHUNK_SIZE * 4, generator.CHUNK_SIZE * 8]
+        assert max(sizes) == generator.MAX_CHUNK_SIZE
+    
+    def test_unknown_generator(self):
+        """Test that an unknown strategy name is rejected"""
+        with pytest.raises(ValueError):
+            create_generator('tetris99')
+    
+    def test_session_uses_generator(self):
+        """Test that sessions pick the strategy and stay reproducible"""
+        first = GameSession(seed=5, generator=GENERATOR_BAG)
+        second = GameSession(seed=5, generator=GENERATOR_BAG)
+        assert isinstance(first.generator, BagGenerator)
+        for i in range(100):
+            first.step(ACTIONS[i % len(ACTIONS)])
+            second.step(ACTIONS[i % len(ACTIONS)])
+        assert first.grid.rows == second.grid.rows
+        assert first.game_state['next_piece'].shape_type == second.game_state['next_piece'].shape_type
+
+
+class TestReplay:
+    """Test replay recording and headless playback"""
+    
+    @staticmethod
+    def record_game(seed, frames=3000, generator=GENERATOR_UNIFORM):
+        """Play a game with random inputs and jittered frame times, recording it"""
+        rng = random.Random(seed)
+        session = GameSession(seed=seed, generator=generator)
+        recorder = replay.ReplayRecorder(seed, generator)
+        for _ in range(frames):
+            if session.game_over:
+                break
+            for _ in range(rng.choice((0,) * 12 + (1, 2, 9))):
+                action = rng.choices(ACTIONS, weights=(8, 8, 6, 4, 1))[0]
+                recorder.action(action)
+                session.step(action)
+            session.tick(recorder.frame(1 / 60 + rng.uniform(-0.004, 0.004)))
+        return session, recorder
+    
+    def test_varint_round_trip(self):
+        """Test varint and zigzag encoding of small and large values"""
+        for value in (0, 1, 127, 128, 300, 2 ** 32, 2 ** 70):
+            buffer = bytearray()
+            replay.write_varint(buffer, value)
+            assert replay.read_varint(buffer, 0) == (value, len(buffer))
+        for value in (0, -1, 1, -2, 16667, -16667):
+            assert replay.unzigzag(replay.zigzag(value)) == value
+        assert [replay.zigzag(value) for value in (0, -1, 1, -2)] == [0, 1, 2, 3]
+    
+    @pytest.mark.parametrize('generator', [GENERATOR_UNIFORM, GENERATOR_BAG])
+    def test_playback_reproduces_game(self, generator):
+        """Test that playing a recording gives the exact same final state"""
+        session, recorder = self.record_game(4, generator=generator)
+        played = replay.ReplayPlayer(recorder.to_bytes()).run()
+        assert played.grid.rows == session.grid.rows
+        assert played.game_state['score'] == session.game_state['score']
+        assert played.pieces_placed == session.pieces_placed
+        assert played.game_state['fall_timer'] == session.game_state['fall_timer']
+    
+    def test_seek_matches_linear_playback(self):
+        """Test that seeking back and forth lands on the same states as playing through"""
+        _, recorder = self.record_game(9)
+        data = recorder.to_bytes()
+        reference = replay.ReplayPlayer(data, snapshot_interval=0)
+        expected = {}
+        for frame in (250, 500, 900):
+            expected[frame] = reference.seek(frame).grid.rows.copy()
+        
+        player = replay.ReplayPlayer(data, snapshot_interval=200)
+        player.run()
+        for frame in (900, 250, 500, 250):
+            assert player.seek(frame).grid.rows == expected[frame]
+            assert player.frame == frame
+    
+    def test_steady_frames_take_one_byte(self):
+        """Test that input-free frames at a steady frame rate are a byte each"""
+        recorder = replay.ReplayRecorder(1)
+        header = len(recorder.to_bytes())
+        for _ in range(1000):
+            recorder.frame(1 / 60)
+        assert len(recorder.to_bytes()) - header < 1010
+        assert len(replay.Replay.from_bytes(recorder.to_bytes())) == 1000
+    
+    def test_save_and_load(self, tmp_path):
+        """Test writing and reading a replay file"""
+        session, recorder = self.record_game(2, frames=500)
+        path = tmp_path / 'game.ttr'
+        recorder.save(path)
+        loaded = replay.Replay.load(path)
+        assert (loaded.seed, loaded.generator, len(loaded)) == (2, GENERATOR_UNIFORM, recorder.frames)
+        assert replay.ReplayPlayer(loaded).run().grid.rows == session.grid.rows
+    
+    def test_verify(self):
+        """Test verifying claimed scores"""
+        session, recorder = self.record_game(6, frames=800)
+        data = recorder.to_bytes()
+        assert replay.verify(data, session.game_state['score'])
+        assert not replay.verify(data, session.game_state['score'] + 1)
+        assert not replay.verify(b'not a replay', 0)
+    
+    def test_invalid_data(self):
+        """Test that broken replays are rejected"""
+        with pytest.raises(replay.ReplayError):
+            replay.Replay.from_bytes(b'XXXX\x01')
+        with pytest.raises(replay.ReplayError):
+            replay.Replay.from_bytes(replay.MAGIC + bytes([99]))
+        with pytest.raises(replay.ReplayError):
+            replay.ReplayRecorder(None)
+        
+        recorder = replay.ReplayRecorder(3)
+        for _ in range(8):
+            recorder.action(ACTION_LEFT)
+        recorder.frame(0.016)
+        with pytest.raises(replay.ReplayError):
+            replay.Replay.from_bytes(recorder.to_bytes()[:-2])
+        
+        # Malformed uploads are rejected by verify() instead of raising
+        for data in (b'TTRP\x02\x00\x01\xff', b'TTRP\x02\x00\x03abc', b'TTRP\x02\x00\x09bag'):
+            with pytest.raises(replay.ReplayError):
+                replay.Replay.from_bytes(data)
+            assert replay.verify(data, 0) == False
+
+
+class TestProfiler:
+    """Test the hot path profiler"""
+    
+    def test_instrument_counts_and_restores(self):
+        """Test that instrumented hot paths are timed and put back afterwards"""
+        originals = {name: getattr(game_logic, name) for name in HOT_PATHS}
+        profiler = Profiler()
+        profiler.instrument(game_logic)
+        try:
+            session = GameSession(seed=3)
+            for _ in range(20):
+                session.step(ACTION_HARD_DROP)
+        finally:
+            profiler.uninstrument()
+        
+        assert {name: getattr(game_logic, name) for name in HOT_PATHS} == originals
+        assert profiler.calls['spawn_piece'] == session.pieces_placed + 1
+        assert profiler.calls['check_lines'] == session.pieces_placed
+        assert profiler.calls['check_collision'] > 0
+        assert all(profiler.total_ns[name] > 0 for name in ('spawn_piece', 'check_collision'))
+    
+    def test_frame_statistics(self):
+        """Test FPS and frame time percentiles over the window"""
+        profiler = Profiler(frame_window=4)
+        profiler.frame_times.extend([10_000_000, 20_000_000, 20_000_000, 30_000_000, 30_000_000])
+        assert list(profiler.frame_times) == [20_000_000, 20_000_000, 30_000_000, 30_000_000]
+        assert profiler.fps() == pytest.approx(40)
+        assert profiler.frame_percentiles(0, 100) == pytest.approx([0.02, 0.03])
+    
+    def test_prometheus_format(self):
+        """Test that every sample line is a metric name, optional labels and a number"""
+        profiler = Profiler()
+        profiler.record('update', 1500)
+        profiler.record('update', 500)
+        profiler.frame()
+        profiler.frame()
+        profiler.gauges['blits'] = 12
+        text = profiler.to_prometheus()
+        
+        samples = {}
+        for line in text.splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        assert samples['tetris_section_calls_total{section="update"}'] == 2
+        assert samples['tetris_section_seconds_total{section="update"}'] == pytest.approx(2e-6)
+        assert samples['tetris_frame_seconds_count'] == 1
+        assert 'tetris_frame_seconds{quantile="0.99"}' in samples
+        assert samples['tetris_blits'] == 12
+    
+    def test_export(self, tmp_path):
+        """Test that metrics are written without leaving a temporary file"""
+        profiler = Profiler()
+        path = str(tmp_path / 'metrics.prom')
+        assert profiler.maybe_export(path)
+        assert not profiler.maybe_export(path)
+        with open(path) as metrics_file:
+            assert metrics_file.read() == profiler.to_prometheus()
+        assert os.listdir(tmp_path) == ['metrics.prom']
+
+
+class TestSimulate:
+    """Test the batch simulator"""
+    
+    def test_percentile(self):
+        """Test interpolated percentiles"""
+        values = [1, 2, 3, 4, 5]
+        assert stats.percentile(values, 0) == 1
+        assert stats.percentile(values, 50) == 3
+        assert stats.percentile(values, 100) == 5
+        assert stats.percentile(values, 25) == 2
+        assert stats.percentile([10], 99) == 10
+    
+    def test_aggregate(self):
+        """Test that aggregate reports mean and percentiles per field"""
+        results = [
+            {'score': s, 'lines': 0, 'level': 1, 'pieces': 10, 'duration': 0.1}
+            for s in (100, 200, 300)
+        ]
+        summary = simulate.aggregate(results)
+        assert summary['score']['mean'] == 200
+        assert summary['score']['p50'] == 200
+        assert summary['score']['p100'] == 300
+        assert summary['level']['p0'] == 1
+    
+    def test_play_game_is_deterministic(self):
+        """Test that a seeded game gives the same result every time"""
+        first = simulate.play_game(9, simulate.random_policy)
+        second = simulate.play_game(9, simulate.random_policy)
+        for field in ('score', 'lines', 'level', 'pieces', 'game_time'):
+            assert first[field] == second[field]
+        assert first['pieces'] > 0
+    
+    def test_greedy_policy_clears_lines(self):
+        """Test that the greedy policy clears lines within a capped game"""
+        result = simulate.play_game(1, simulate.greedy_policy, frame_time=0, max_pieces=60)
+        assert result['pieces'] == 60
+        assert result['lines'] > 0
+    
+    def test_run_games_in_process(self):
+        """Test that a single worker runs every seed in-process"""
+        results = list(simulate.run_games(range(3), 'drop', workers=1))
+        assert sorted(result['seed'] for result in results) == [0, 1, 2]
+    
+    def test_load_policy(self):
+        """Test resolving built-in and module:function policies"""
+        assert simulate.load_policy('random') is simulate.random_policy
+        assert simulate.load_policy('simulate:drop_policy') is simulate.drop_policy
+        with pytest.raises(ValueError):
+            simulate.load_policy('nonexistent')
+    
+    def test_apply_overrides_rejects_unknown(self):
+        """Test that only tunable constants can be overridden"""
+        with pytest.raises(ValueError):
+            simulate.apply_overrides({'GRID_WIDTH': 12})
+
+
+@requires_numpy
+class TestBatchBoard:
+    """Cross-check the NumPy batch board against the scalar game rules"""
+    
+    def test_collides_matches_check_collision(self):
+        """Test vectorized collision against check_collision for random positions"""
+        rng = random.Random(1)
+        grids = [random_grid(rng) for _ in range(64)]
+        board = batch_board.BatchBoard.from_grids(grids)
+        
+        for shape_type in SHAPES:
+            piece = Piece(shape_type)
+            for rotation in range(len(piece.states)):
+                piece.rotation = rotation
+                xs = [rng.randrange(-2, GRID_WIDTH) for _ in grids]
+                ys = [rng.randrange(-3, GRID_HEIGHT) for _ in grids]
+                result = board.collides(batch_board.piece_offsets(piece), xs, ys)
+                
+                for k, grid in enumerate(grids):
+                    piece.x = xs[k]
+                    piece.y = ys[k]
+                    assert result[k] == check_collision(piece, grid, 0, 0)
+    
+    def test_per_board_pieces(self):
+        """Test collision with a different piece on every board"""
+        rng = random.Random(2)
+        grids = [random_grid(rng) for _ in range(32)]
+        pieces = [Piece(rng.choice(list(SHAPES))) for _ in grids]
+        board = batch_board.BatchBoard.from_grids(grids)
+        xs = [piece.x for piece in pieces]
+        ys = [8 for _ in pieces]
+        
+        result = board.collides(batch_board.piece_offsets(pieces), xs, ys)
+        for k, piece in enumerate(pieces):
+            piece.y = 8
+            assert result[k] == check_collision(piece, grids[k], 0, 0)
+    
+    def test_drop_and_lock_match_scalar(self):
+        """Test that dropping and locking gives the same boards as the scalar path"""
+        rng = random.Random(3)
+        grids = [random_grid(rng, fill=0.3) for _ in range(32)]
+        board = batch_board.BatchBoard.from_grids(grids)
+        piece = Piece('T')
+        xs = [rng.randrange(GRID_WIDTH - 2) for _ in grids]
+        ys = [0 for _ in grids]
+        offsets = batch_board.piece_offsets(piece)
+        
+        landing = board.drop(offsets, xs, ys)
+        board.lock(offsets, xs, landing)
+        
+        for k, grid in enumerate(grids):
+            piece.x = xs[k]
+            piece.y = 0
+            while not check_collision(piece, grid, 0, 1):
+                piece.move(0, 1)
+            assert landing[k] == piece.y
+            lock_piece(piece, grid)
+            assert board.to_grid(k) == [[int(cell != 0) for cell in row] for row in grid]
+    
+    def test_full_rows_match_check_lines(self):
+        """Test row-full detection against check_lines"""
+        rng = random.Random(4)
+        grids = [random_grid(rng, full_rows=rng.sample(range(10, 20), rng.randrange(5)))
+                 for _ in range(32)]
+        board = batch_board.BatchBoard.from_grids(grids)
+        for k, grid in enumerate(grids):
+            assert board.check_lines(k) == check_lines(grid)
+    
+    def test_clear_lines_matches_scalar(self):
+        """Test line compaction, score and level against clear_lines"""
+        rng = random.Random(5)
+        grids = [random_grid(rng, full_rows=rng.sample(range(10, 20), rng.randrange(5)))
+                 for _ in range(48)]
+        board = batch_board.BatchBoard.from_grids(grids)
+        states = []
+        for k in range(len(grids)):
+            level = rng.randrange(1, 16)
+            lines = rng.randrange(max(0, (level - 1) * 10), level * 10)
+            board.level[k] = level
+            board.lines_cleared[k] = lines
+            states.append({'score': 0, 'level': level, 'lines_cleared': lines,
+                           'fall_speed': INITIAL_FALL_SPEED})
+        
+        cleared = board.clear_lines()
+        
+        for k, grid in enumerate(grids):
+            lines = check_lines(grid)
+            assert cleared[k] == len(lines)
+            clear_lines(lines, grid, states[k])
+            assert board.to_grid(k) == grid
+            assert board.score[k] == states[k]['score']
+            assert board.level[k] == states[k]['level']
+            assert board.lines_cleared[k] == states[k]['lines_cleared']
+            assert abs(board.fall_speed[k] - states[k]['fall_speed']) < 1e-12
+
+
+class TestPlacements:
+    """Test the reachable placement enumerator"""
+    
+    def replay(self, grid, piece, actions):
+        """Apply the actions (except the final hard drop) like the game would"""
+        session = GameSession(seed=0)
+        session.grid = grid
+        session.game_state['current_piece'] = piece
+        for action in actions[:-1]:
+            assert session.step(action) == True
+        while not check_collision(piece, grid, 0, 1):
+            piece.move(0, 1)
+        return piece
+    
+    def test_empty_grid_placements(self):
+        """Test that every rotation and column is found on an empty grid"""
+        grid = BitboardGrid()
+        placements = find_placements(grid, Piece('T'))
+        
+        # T-piece: 8 columns when 3 wide, 9 columns when 2 wide
+        assert len(placements) == 8 + 9 + 8 + 9
+        for placement in placements:
+            state = ROTATIONS['T'][placement.rotation]
+            assert placement.y + state.height == GRID_HEIGHT
+            assert placement.actions[-1] == ACTION_HARD_DROP
+    
+    def test_actions_reach_placement(self):
+        """Test that replaying the input sequence ends at the placement"""
+        rng = random.Random(6)
+        list_grid = random_grid(rng, fill=0.4)
+        grid = BitboardGrid.from_list(list_grid)
+        
+        for shape_type in SHAPES:
+            placements = find_placements(grid, Piece(shape_type))
+            assert placements
+            assert find_placements(list_grid, Piece(shape_type)) == placements
+            for placement in placements:
+                piece = self.replay(grid, Piece(shape_type), placement.actions)
+                assert (piece.rotation, piece.x, piece.y) == \
+                    (placement.rotation, placement.x, placement.y)
+                assert check_collision(piece, grid, 0, 0) == False
+    
+    def test_soft_drop_finds_tuck(self):
+        """Test that soft drops reach a slot under an overhang"""
+        grid = BitboardGrid()
+        # Overhang on row 17 covering columns 0-3, open space below
+        grid[17] = [1, 1, 1, 1, 0, 0, 0, 0, 0, 0]
+        piece = Piece('O')
+        
+        tucked = [p for p in find_placements(grid, piece) if p.x == 0 and p.y == 18]
+        assert len(tucked) == 1
+        assert ACTION_SOFT_DROP in tucked[0].actions
+        
+        no_tucks = find_placements(grid, piece, soft_drop=False)
+        assert all(p.y < 17 or p.x >= 4 for p in no_tucks)
+    
+    def test_blocked_spawn(self):
+        """Test that a colliding piece has no placements"""
+        grid = BitboardGrid()
+        grid[0] = [1] * GRID_WIDTH
+        assert find_placements(grid, Piece('I')) == []
+
+
+class TestSpriteAtlas:
+    """Test packing the block sprites into one atlas surface"""
+    
+    def setup_method(self):
+        self.sprite_manager = SpriteManager()
+        self.sprite_manager.load_sprites(cache_dir=None)
+    
+    def test_every_tile_has_its_own_region(self):
+        """Test that every rotated block sprite gets a distinct atlas rect"""
+        manager = self.sprite_manager
+        assert manager.atlas is not None
+        assert set(manager.atlas_rects) == set(manager.rotated_sprites)
+        rects = [tuple(rect) for rect in manager.atlas_rects.values()]
+        assert len(set(rects)) == len(rects)
+        assert all(manager.atlas.get_rect().contains(rect) for rect in manager.atlas_rects.values())
+    
+    def test_regions_match_split_sprites(self):
+        """Test that atlas tiles hold the same pixels as the separately split sprites"""
+        separate = SpriteManager()
+        for shape_type, sprite in self.sprite_manager.sprites.items():
+            separate._split_sprite(shape_type, sprite)
+        
+        for key, tile in separate.rotated_sprites.items():
+            atlas, source_rect = self.sprite_manager.get_block_region(*key)
+            region = atlas.subsurface(source_rect)
+            assert pygame.image.tobytes(region, 'RGBA') == pygame.image.tobytes(tile, 'RGBA')
+    
+    def test_block_sprites_share_atlas_pixels(self):
+        """Test that get_block_sprite hands out views into the atlas"""
+        sprite = self.sprite_manager.get_block_sprite('T', 1, 0, 90)
+        assert sprite.get_parent() is self.sprite_manager.atlas
+        assert sprite.get_size() == (48, 48)
+    
+    def test_convert_sprites_keeps_pixels(self):
+        """Test that converting to the display format keeps the tiles and their pixels"""
+        pygame.display.init()
+        if pygame.display.get_surface() is None:
+            pygame.display.set_mode((WIDTH, HEIGHT))
+        manager = self.sprite_manager
+        before = pygame.image.tobytes(manager.atlas, 'RGBA')
+        
+        assert manager.convert_sprites() == True
+        assert pygame.image.tobytes(manager.atlas, 'RGBA') == before
+        assert manager.get_block_sprite('S', 0, 1, 180).get_parent() is manager.atlas
+        assert manager.block_sprites[('S', 0, 1)] is manager.rotated_sprites[('S', 0, 1, 0)]
+    
+    def test_cache_bytes_counts_atlas_once(self):
+        """Test that the reported cache size counts shared atlas pixels once"""
+        manager = self.sprite_manager
+        expected = manager.atlas.get_pitch() * manager.atlas.get_height()
+        expected += sum(sprite.get_pitch() * sprite.get_height() for sprite in manager.sprites.values())
+        assert manager.cache_bytes() == expected
+        assert SpriteManager().cache_bytes() == 0
+    
+    def test_parallel_loading_matches_serial(self):
+        """Test that loading the pieces on a thread pool packs the same atlas"""
+        parallel = SpriteManager(autoload=False)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            parallel.load_sprites(cache_dir=None, executor=executor)
+        assert parallel.atlas_rects == self.sprite_manager.atlas_rects
+        assert pygame.image.tobytes(parallel.atlas, 'RGBA') == pygame.image.tobytes(self.sprite_manager.atlas, 'RGBA')
+        assert list(parallel.sprites) == list(self.sprite_manager.sprites)
+    
+    def test_scaled_atlas_built_once(self):
+        """Test that tiles for another block size are scaled once into their own atlas"""
+        manager = self.sprite_manager
+        assert manager.scaled_atlas(48) == (manager.atlas, manager.atlas_rects)
+        
+        atlas, rects = manager.scaled_atlas(54)
+        assert manager.scaled_atlas(54)[0] is atlas
+        assert set(rects) == set(manager.atlas_rects)
+        assert all(rect.size == (54, 54) for rect in rects.values())
+        assert manager.get_block_region('L', 0, 1, 270, block_size=54) == (atlas, rects[('L', 0, 1, 270)])
+        assert manager.cache_bytes() > atlas.get_pitch() * atlas.get_height()
+    
+    def test_scaled_atlas_uses_pipeline_tiles(self, tmp_path, monkeypatch):
+        """Test that tile strips the sprite pipeline built for a size are used as they are"""
+        import generate_sprites
+        
+        generate_sprites.render_piece(('T', 48, str(tmp_path)))
+        key, entry = generate_sprites.render_piece(('T', 32, str(tmp_path)))
+        strip = pygame.image.load(os.path.join(str(tmp_path), '32', entry['tiles']))
+        entry['sprite'] = os.path.join(str(tmp_path), entry['sprite'])
+        monkeypatch.setattr(sprite_manager_module, 'read_tile_manifest', lambda block_size: {'T': entry})
+        
+        atlas, rects = self.sprite_manager.scaled_atlas(32)
+        for index, name in enumerate(entry['tile_keys']):
+            shape_type, dx, dy, rotation = name.split(',')
+            tile = atlas.subsurface(rects[(shape_type, int(dx), int(dy), int(rotation))])
+            expected = strip.subsurface((index * 32, 0, 32, 32))
+            assert pygame.image.tobytes(tile, 'RGBA') == pygame.image.tobytes(expected, 'RGBA')
+        assert rects[('I', 0, 0, 0)].size == (32, 32)
+    
+    def test_unknown_block_has_no_region(self):
+        """Test that blocks without a sprite tile return None"""
+        assert self.sprite_manager.get_block_region('I', 5, 5) is None
+        assert SpriteManager(autoload=False).get_block_region('I', 0, 0) is None
+
+
+class TestAssetCache:
+    """Test the on-disk cache of processed sprite tiles"""
+    
+    def test_round_trip_keeps_pixels(self, tmp_path):
+        """Test that surfaces come back from the cache with the same pixels"""
+        surface = pygame.Surface((5, 3), pygame.SRCALPHA)
+        surface.fill((10, 20, 30, 128))
+        surface.set_at((4, 2), (200, 100, 50, 255))
+        
+        assert asset_cache.save_surfaces(str(tmp_path), 'test', 'abc', {'tile': surface}, {'answer': 42})
+        surfaces, meta = asset_cache.load_surfaces(str(tmp_path), 'test', 'abc')
+        assert meta == {'answer': 42}
+        assert surfaces['tile'].get_size() == (5, 3)
+        assert pygame.image.tobytes(surfaces['tile'], 'RGBA') == pygame.image.tobytes(surface, 'RGBA')
+    
+    def test_missing_entry(self, tmp_path):
+        """Test that a cache miss returns None"""
+        assert asset_cache.load_surfaces(str(tmp_path), 'test', 'abc') is None
+    
+    def test_malformed_index_is_a_miss(self, tmp_path):
+        """Test that an index that parses but has the wrong structure is a cache miss"""
+        surface = pygame.Surface((2, 2), pygame.SRCALPHA)
+        asset_cache.save_surfaces(str(tmp_path), 'test', 'abc', {'tile': surface})
+        index_path = os.path.join(str(tmp_path), 'test-abc.json')
+        for index in ([], {'meta': {}}, {'surfaces': [], 'meta': {}}, {'surfaces': {'tile': [0, 2, 2]}},
+                      {'surfaces': {'tile': [0, 'x', 2]}, 'meta': {}}, {'surfaces': {'tile': [0, 2]}, 'meta': {}},
+                      {'surfaces': {'tile': [-4, 2, 2]}, 'meta': {}}):
+            with open(index_path, 'w') as index_file:
+                json.dump(index, index_file)
+            assert asset_cache.load_surfaces(str(tmp_path), 'test', 'abc') is None
+    
+    def test_malformed_sprite_entry_reloads(self, tmp_path):
+        """Test that a sprite cache entry with the wrong structure is rebuilt instead of raising"""
+        digest = asset_cache.source_hash(SPRITE_FILES.values(), sprite_manager_module.BLOCK_SIZE,
+                                         sprite_manager_module.ATLAS_COLUMNS)
+        tile = pygame.Surface((48, 48), pygame.SRCALPHA)
+        for surfaces, meta in (({'sprite:I': tile}, {'atlas_rects': {}}),
+                               ({'atlas': tile}, {}),
+                               ({'atlas': tile}, {'atlas_rects': {'I,0,0': [0, 0, 48, 48]}}),
+                               ({'atlas': tile}, {'atlas_rects': {'I,0,0,0': [0, 48, 48, 48]}})):
+            asset_cache.save_surfaces(str(tmp_path), 'sprites', digest, surfaces, meta)
+            manager = SpriteManager()
+            manager.load_sprites(cache_dir=str(tmp_path))
+            assert manager.atlas is not None and len(manager.atlas_rects) > 1
+            assert manager.get_block_sprite('L', 1, 2, 270) is not None
+    
+    def test_new_digest_replaces_stale_entry(self, tmp_path):
+        """Test that saving under a new hash removes the old files"""
+        surface = pygame.Surface((2, 2), pygame.SRCALPHA)
+        asset_cache.save_surfaces(str(tmp_path), 'test', 'old', {'tile': surface})
+        asset_cache.save_surfaces(str(tmp_path), 'test', 'new', {'tile': surface})
+        assert sorted(os.listdir(tmp_path)) == ['test-new.json', 'test-new.rgba']
+    
+    def test_hash_follows_content(self, tmp_path):
+        """Test that the cache key changes with the file content and parameters"""
+        source = tmp_path / 'sprite.png'
+        source.write_bytes(b'one')
+        first = asset_cache.source_hash([str(source)], 48)
+        assert asset_cache.source_hash([str(source)], 48) == first
+        assert asset_cache.source_hash([str(source)], 64) != first
+        source.write_bytes(b'two')
+        assert asset_cache.source_hash([str(source)], 48) != first
+    
+    def test_cached_sprites_match_fresh_load(self, tmp_path):
+        """Test that sprites loaded from the cache equal freshly processed ones"""
+        fresh = SpriteManager()
+        fresh.load_sprites(cache_dir=str(tmp_path))
+        cached = SpriteManager()
+        cached.load_sprites(cache_dir=str(tmp_path))
+        
+        assert cached.atlas_rects == fresh.atlas_rects
+        assert set(cached.sprites) == set(fresh.sprites)
+        assert pygame.image.tobytes(cached.atlas, 'RGBA') == pygame.image.tobytes(fresh.atlas, 'RGBA')
+        key = ('L', 1, 2, 270)
+        assert pygame.image.tobytes(cached.get_block_sprite(*key), 'RGBA') == \
+            pygame.image.tobytes(fresh.get_block_sprite(*key), 'RGBA')
+
+
+class TestSpritePipeline:
+    """Test the sprite build pipeline and loading its pre-rotated tiles"""
+    
+    def test_native_sprites_without_strips(self, tmp_path):
+        """Test that the committed sprites are what the pipeline draws, without tile strips"""
+        import generate_sprites
+        
+        manifest = read_tile_manifest()
+        assert set(manifest) == set(SPRITE_FILES)
+        for shape_type in SPRITE_FILES:
+            key, entry = generate_sprites.render_piece((shape_type, 48, str(tmp_path)))
+            assert entry['sprite_hash'] == manifest[shape_type]['sprite_hash']
+            assert 'tiles' not in entry and 'tiles' not in manifest[shape_type]
+        assert not os.path.exists(os.path.join(str(tmp_path), 'tiles'))
+    
+    def test_prebuilt_tiles_match_cut_tiles(self, tmp_path):
+        """Test that scaled tile strips hold the tiles cut from their scaled sprite"""
+        import generate_sprites
+        
+        pieces_dir = str(tmp_path)
+        for shape_type, filepath in SPRITE_FILES.items():
+            generate_sprites.render_piece((shape_type, 48, pieces_dir))
+            key, entry = generate_sprites.render_piece((shape_type, 54, pieces_dir))
+            source_path = os.path.join(pieces_dir, os.path.basename(filepath))
+            tiles = SpriteManager._load_prebuilt_tiles(source_path, entry)
+            sprite = pygame.image.load(os.path.join(pieces_dir, entry['sprite']))
+            cut = SpriteManager._cut_tiles(shape_type, sprite, 54)
+            assert tiles is not None and set(tiles) == set(cut)
+            for key, tile in cut.items():
+                assert pygame.image.tobytes(tiles[key], 'RGBA') == pygame.image.tobytes(tile, 'RGBA')
+    
+    def test_prebuilt_tiles_ignored_after_source_changes(self, tmp_path):
+        """Test that a strip scaled from an older 48 px sprite is neither used nor skipped"""
+        import generate_sprites
+        
+        pieces_dir = str(tmp_path)
+        generate_sprites.render_piece(('T', 48, pieces_dir))
+        key, entry = generate_sprites.render_piece(('T', 54, pieces_dir))
+        filepath = os.path.join(pieces_dir, 'shower.png')
+        assert SpriteManager._load_prebuilt_tiles(filepath, entry) is not None
+        assert ('T', 54, pieces_dir) not in generate_sprites.pending_jobs({key: entry}, [54], pieces_dir)
+        
+        sprite = pygame.image.load(filepath)
+        sprite.fill((255, 0, 0, 255), (0, 0, 8, 8))
+        pygame.image.save(sprite, filepath)
+        assert SpriteManager._load_prebuilt_tiles(filepath, entry) is None
+        assert ('T', 54, pieces_dir) in generate_sprites.pending_jobs({key: entry}, [54], pieces_dir)
+        assert SpriteManager._load_prebuilt_tiles(filepath, dict(entry, sprite_hash='0' * 16)) is None
+    
+    def test_render_and_skip_unchanged(self, tmp_path):
+        """Test that rendered pieces are skipped until forced, at any block size"""
+        import generate_sprites
+        
+        pieces_dir = str(tmp_path)
+        manifest = dict(generate_sprites.render_piece(job)
+                        for job in generate_sprites.pending_jobs({}, [48], pieces_dir))
+        assert generate_sprites.pending_jobs(manifest, [48], pieces_dir) == []
+        
+        jobs = generate_sprites.pending_jobs(manifest, [32, 64], pieces_dir)
+        assert len(jobs) == 2 * len(SPRITE_FILES)
+        manifest.update(generate_sprites.render_piece(job) for job in jobs[:3])
+        assert len(generate_sprites.pending_jobs(manifest, [32, 64], pieces_dir)) == len(jobs) - 3
+        assert len(generate_sprites.pending_jobs(manifest, [32, 64], pieces_dir, force=True)) == len(jobs)
+        
+        entry = manifest['I@32']
+        strip = pygame.image.load(os.path.join(pieces_dir, '32', entry['tiles']))
+        assert strip.get_size() == (len(entry['tile_keys']) * 32, 32)
+        assert pygame.image.load(os.path.join(pieces_dir, entry['sprite'])).get_size() == (128, 32)
+        
+        manifest['I@32'] = dict(entry, hash='stale')
+        assert ('I', 32, pieces_dir) in generate_sprites.pending_jobs(manifest, [32], pieces_dir)
+    
+    def test_parallel_run_finishes(self, tmp_path):
+        """Test that a run with worker processes exits and writes the manifest"""
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generate_sprites.py')
+        result = subprocess.run([sys.executable, script, '--sizes', '32', '--jobs', '2'],
+                                capture_output=True, text=True, cwd=str(tmp_path), timeout=60)
+        assert result.returncode == 0, result.stderr
+        with open(os.path.join(str(tmp_path), 'images', 'pieces', 'manifest.json')) as manifest_file:
+            pieces = json.load(manifest_file)['pieces']
+        assert set(pieces) == {f'{shape_type}@{size}' for shape_type in SPRITE_FILES for size in (48, 32)}
+
+
+class TestLazyLoading:
+    """Test that headless code does not need pygame and sprites load on demand"""
+    
+    def test_logic_imports_without_pygame(self):
+        """Test that the logic, simulator and Block import without pygame"""
+        code = "import sys, game_logic, simulate, placement, sprite_manager; print('pygame' in sys.modules)"
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == 'False'
+    
+    def test_profiler_imports_without_simulator(self):
+        """Test that the profiler (imported at game start) does not load the simulator"""
+        code = "import sys, profiler; print(sorted({'simulate', 'placement', 'multiprocessing'} & set(sys.modules)))"
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == '[]'
+    
+    def test_sprites_load_on_first_lookup(self, monkeypatch):
+        """Test that the first sprite lookup loads the sprites exactly once"""
+        manager = SpriteManager()
+        calls = []
+        
+        def load_sprites():
+            calls.append(True)
+            SpriteManager.load_sprites(manager, cache_dir=None)
+        
+        monkeypatch.setattr(manager, 'load_sprites', load_sprites)
+        assert manager.loaded == False
+        assert manager.get_block_sprite('I', 0, 0) is not None
+        assert manager.get_block_region('I', 1, 0) is not None
+        assert calls == [True]
+    
+    def test_autoload_disabled(self):
+        """Test that a manager without autoload stays empty"""
+        manager = SpriteManager(autoload=False)
+        assert manager.get_block_sprite('I', 0, 0) is None
+        assert manager.loaded == False
+
+
+class TestRenderer:
+    """Test the dirty-rectangle renderer against full redraws"""
+    
+    def setup_method(self):
+        pygame.display.init()
+        pygame.font.init()
+        if pygame.display.get_surface() is None:
+            pygame.display.set_mode((WIDTH, HEIGHT))
+    
+    def full_redraw(self, session, sprite_manager):
+        """Pixels of the session drawn from scratch by a fresh renderer"""
+        surface = pygame.Surface((WIDTH, HEIGHT))
+        Renderer(sprite_manager).draw(surface, session.grid, session.game_state)
+        return pygame.image.tobytes(surface, 'RGB')
+    
+    @pytest.mark.parametrize('load_sprites', [True, False])
+    def test_incremental_frames_match_full_redraw(self, load_sprites):
+        """Test that repainting only dirty regions gives the same pixels"""
+        sprite_manager = SpriteManager(autoload=False)
+        if load_sprites:
+            sprite_manager.load_sprites(cache_dir=None)
+        session = GameSession(seed=11, sprite_manager=sprite_manager)
+        renderer = Renderer(sprite_manager)
+        surface = pygame.Surface((WIDTH, HEIGHT))
+        rng = random.Random(11)
+        
+        for frame in range(400):
+            if session.game_over:
+                session.reset()
+            session.step(rng.choice(ACTIONS))
+            session.tick(1 / 60)
+            renderer.draw(surface, session.grid, session.game_state)
+            if frame % 40 == 39:
+                assert pygame.image.tobytes(surface, 'RGB') == self.full_redraw(session, sprite_manager)
+    
+    def test_first_frame_is_full(self):
+        """Test that the first draw repaints the whole surface"""
+        session = GameSession(seed=1)
+        surface = pygame.Surface((WIDTH, HEIGHT))
+        assert Renderer(SpriteManager(autoload=False)).draw(surface, session.grid, session.game_state) == [surface.get_rect()]
+    
+    def test_unchanged_frame_repaints_nothing(self):
+        """Test that drawing the same state twice has no dirty regions"""
+        session = GameSession(seed=1)
+        renderer = Renderer(SpriteManager(autoload=False))
+        surface = pygame.Surface((WIDTH, HEIGHT))
+        renderer.draw(surface, session.grid, session.game_state)
+        assert renderer.draw(surface, session.grid, session.game_state) == []
+    
+    def test_background_composed_once(self):
+        """Test that the static background is reused until the layout changes"""
+        session = GameSession(seed=1)
+        renderer = Renderer(SpriteManager(autoload=False))
+        surface = pygame.Surface((WIDTH, HEIGHT))
+        renderer.draw(surface, session.grid, session.game_state)
+        background = renderer._background
+        
+        session.step(ACTION_HARD_DROP)
+        renderer.draw(surface, session.grid, session.game_state)
+        assert renderer._background is background
+        
+        renderer.set_logo(pygame.Surface((100, 300)))
+        assert renderer.draw(surface, session.grid, session.game_state) == [surface.get_rect()]
+        assert renderer._background is not background
+    
+    def test_move_repaints_piece_cells(self):
+        """Test that a move only repaints grid cells, not the panels"""
+        session = GameSession(seed=1)
+        renderer = Renderer(SpriteManager(autoload=False))
+        surface = pygame.Surface((WIDTH, HEIGHT))
+        renderer.draw(surface, session.grid, session.game_state)
+        
+        session.step(ACTION_RIGHT)
+        dirty = renderer.draw(surface, session.grid, session.game_state)
+        assert dirty
+        # Old and new piece and ghost cells, each one cell big
+        assert len(dirty) <= 16
+        assert all(rect.size == (48, 48) for rect in dirty)
+    
+    def test_overlay_drawn_and_removed(self):
+        """Test that the overlay is only redrawn on change and leaves no trace when removed"""
+        session = GameSession(seed=1)
+        renderer = Renderer(SpriteManager(autoload=False))
+        surface = pygame.Surface((WIDTH, HEIGHT))
+        renderer.draw(surface, session.grid, session.game_state)
+        clean = pygame.image.tobytes(surface, 'RGB')
+        
+        assert renderer.draw_overlay(surface, ["FPS 60", "blits 12"])
+        assert pygame.image.tobytes(surface, 'RGB') != clean
+        assert renderer.draw_overlay(surface, ["FPS 60", "blits 12"]) is None
+        assert renderer.draw_overlay(surface, [])
+        assert pygame.image.tobytes(surface, 'RGB') == clean
+    
+    def test_default_layout_is_the_design(self):
+        """Test that the design window size keeps the design coordinates"""
+        layout = Layout()
+        assert layout.block_size == 48 and layout.scale == 1 and layout.origin == (0, 0)
+        assert layout.grid_rect == pygame.Rect(400, 0, GRID_WIDTH * 48, GRID_HEIGHT * 48)
+        assert layout.next_piece_box == NEXT_PIECE_BOX
+        assert layout.cell_rect(2, 3) == pygame.Rect(496, 144, 48, 48)
+    
+    @pytest.mark.parametrize('size, block_size', [((1920, 1080), 54), ((3840, 2160), 108), ((800, 600), 30)])
+    def test_layout_fits_display(self, size, block_size):
+        """Test that the scaled layout fits the display, centered, with whole-pixel blocks"""
+        layout = Layout(*size)
+        display = pygame.Rect((0, 0), size)
+        assert layout.block_size == block_size
+        assert display.contains(layout.grid_rect) and display.contains(layout.next_piece_box)
+        assert layout.grid_rect.height == GRID_HEIGHT * block_size
+        assert layout.next_piece_box.left > layout.grid_rect.right
+        assert layout.point((0, 0))[0] == size[0] - layout.point((WIDTH, HEIGHT))[0]
+    
+    def test_display_size(self, monkeypatch):
+        """Test that the window follows the display size, with the design size as fallback"""
+        import renderer
+        
+        desktops = [(3840, 2160), (1920, 1080)]
+        monkeypatch.setattr(pygame.display, 'get_desktop_sizes', lambda: desktops)
+        assert renderer.display_size() == (3840, 2160)
+        assert Layout(*renderer.display_size()).block_size == 108
+        desktops[:] = []
+        assert renderer.display_size() == (WIDTH, HEIGHT)
+        desktops[:] = [(0, 0)]
+        assert renderer.display_size() == (WIDTH, HEIGHT)
+    
+    def test_parse_resolution(self):
+        """Test parsing window sizes from the environment"""
+        assert parse_resolution("1920x1080") == (1920, 1080)
+        assert parse_resolution("3840X2160") == (3840, 2160)
+        for text in ("1920", "0x1080", "widexhigh"):
+            with pytest.raises(ValueError):
+                parse_resolution(text)
+    
+    def test_scaled_frames_match_full_redraw(self):
+        """Test incremental frames on a 1080p surface against full redraws"""
+        sprite_manager = SpriteManager(autoload=False)
+        sprite_manager.load_sprites(cache_dir=None)
+        session = GameSession(seed=4, sprite_manager=sprite_manager)
+        renderer = Renderer(sprite_manager)
+        surface = pygame.Surface((1920, 1080))
+        rng = random.Random(4)
+        
+        for frame in range(200):
+            if session.game_over:
+                session.reset()
+            session.step(rng.choice(ACTIONS))
+            session.tick(1 / 60)
+            renderer.draw(surface, session.grid, session.game_state)
+            if frame % 50 == 49:
+                full = pygame.Surface((1920, 1080))
+                Renderer(sprite_manager).draw(full, session.grid, session.game_state)
+                assert pygame.image.tobytes(surface, 'RGB') == pygame.image.tobytes(full, 'RGB')
+        assert renderer.layout.block_size == 54
+    
+    def test_tiles_scaled_once(self, monkeypatch):
+        """Test that playing at another scale never scales while drawing frames"""
+        sprite_manager = SpriteManager(autoload=False)
+        sprite_manager.load_sprites(cache_dir=None)
+        calls = []
+        smoothscale = pygame.transform.smoothscale
+        monkeypatch.setattr(pygame.transform, 'smoothscale', lambda *args: calls.append(1) or smoothscale(*args))
+        
+        session = GameSession(seed=2, sprite_manager=sprite_manager)
+        renderer = Renderer(sprite_manager, layout=Layout(3840, 2160))
+        surface = pygame.Surface((3840, 2160))
+        renderer.draw(surface, session.grid, session.game_state)
+        assert len(calls) == len(sprite_manager.rotated_sprites)
+        
+        for action in ACTIONS * 10:
+            session.step(action)
+            renderer.draw(surface, session.grid, session.game_state)
+        assert len(calls) == len(sprite_manager.rotated_sprites)
+    
+    def test_text_cache_lru(self):
+        """Test that texts are rendered once and the least recently used one is evicted"""
+        cache = TextCache(maxsize=2)
+        first = cache.get("SCORE: 0", 28, (0, 0, 0))
+        assert cache.get("SCORE: 0", 28, (0, 0, 0)) is first
+        assert cache.get("SCORE: 0", 24, (0, 0, 0)) is not first
+        cache.get("SCORE: 0", 28, (0, 0, 0))
+        cache.get("LEVEL: 1", 28, (0, 0, 0))
+        assert len(cache) == 2
+        assert (cache.hits, cache.misses) == (2, 3)
+        # The 24px text was least recently used
+        cache.get("SCORE: 0", 28, (0, 0, 0))
+        cache.get("SCORE: 0", 24, (0, 0, 0))
+        assert cache.misses == 4
+    
+    def test_texts_rendered_only_when_values_change(self):
+        """Test that frames without a score change rasterize no text"""
+        session = GameSession(seed=1)
+        renderer = Renderer(SpriteManager(autoload=False))
+        surface = pygame.Surface((WIDTH, HEIGHT))
+        renderer.draw(surface, session.grid, session.game_state)
+        misses = renderer.text_cache.misses
+        
+        session.step(ACTION_RIGHT)
+        session.step(ACTION_ROTATE)
+        renderer.draw(surface, session.grid, session.game_state)
+        assert renderer.text_cache.misses == misses
+        
+        session.step(ACTION_HARD_DROP)
+        renderer.draw(surface, session.grid, session.game_state)
+        assert renderer.text_cache.misses == misses + 1  # only the score changed
+    
+    def test_board_drawn_in_one_batch(self):
+        """Test that cells and preview go through one blits() call per frame"""
+        class CountingSurface(pygame.Surface):
+            def __init__(self, size):
+                super().__init__(size)
+                self.calls = []
+            
+            def blit(self, *args, **kwargs):
+                self.calls.append('blit')
+                return super().blit(*args, **kwargs)
+            
+            def blits(self, *args, **kwargs):
+                self.calls.append('blits')
+                return super().blits(*args, **kwargs)
+        
+        session = GameSession(seed=2)
+        renderer = Renderer(SpriteManager(autoload=False))  # No sprites: colored fallback tiles
+        surface = CountingSurface((WIDTH, HEIGHT))
+        renderer.draw(surface, session.grid, session.game_state)
+        assert surface.calls.count('blits') == 1
+        
+        surface.calls = []
+        session.step(ACTION_LEFT)
+        renderer.draw(surface, session.grid, session.game_state)
+        assert surface.calls == ['blits']
+    
+    def test_hard_drop_repaints_preview_and_score(self):
+        """Test that locking a piece repaints the next piece box and score"""
+        session = GameSession(seed=1)
+        renderer = Renderer(SpriteManager(autoload=False))
+        surface = pygame.Surface((WIDTH, HEIGHT))
+        renderer.draw(surface, session.grid, session.game_state)
+        
+        session.step(ACTION_HARD_DROP)
+        dirty = renderer.draw(surface, session.grid, session.game_state)
+        assert NEXT_PIECE_BOX in dirty
+        assert any(rect.y == 400 for rect in dirty)
+
+
 class TestIntegration:
     """Integration tests for full game scenarios"""
     
@@ -7,39 +7,51 @@ Built with Pygame Zero
 
 import pgzrun
 import os
-from pygame import Rect, transform, image
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pygame import transform, image, Rect
+import game_logic
 from game_logic import (
-    Piece, SHAPES, PIECE_COLORS, GRID_WIDTH, GRID_HEIGHT,
-    INITIAL_FALL_SPEED, SCORE_SOFT_DROP, SCORE_HARD_DROP,
-    check_collision, lock_piece, check_lines, clear_lines, spawn_piece
+    GameSession, ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_SOFT_DROP, ACTION_HARD_DROP
+)
+from renderer import (
+    Renderer, Layout, WIDTH, HEIGHT, BACKGROUND_COLOR, UI_TEXT_COLOR, PRIMARY_ACCENT, GRID_BORDER, display_size,
+    parse_resolution
 )
 from sprite_manager import sprite_manager
+from replay import ReplayRecorder
+from profiler import Profiler
+import asset_cache
 
-# Window configuration
-WIDTH = 1280
-HEIGHT = 960
+# Window configuration (layout and colors live in renderer)
 TITLE = "HaHa Hausservice Haubentaucher Tetris"
 
-# Colors (Brand colors from design document)
-BACKGROUND_COLOR = (245, 245, 245)  # #F5F5F5 Light gray
-UI_TEXT_COLOR = (44, 62, 80)  # #2C3E50 Dark navy/charcoal
-PRIMARY_ACCENT = (0, 102, 204)  # #0066CC Bright blue
-SECONDARY_ACCENT = (0, 153, 51)  # #009933 Green
-GRID_BORDER = (204, 204, 204)  # #CCCCCC Light gray
-GRID_BACKGROUND = (255, 255, 255)  # #FFFFFF White
+# Window size: the size of the display, or TETRIS_RESOLUTION=1920x1080 to
+# override it. The layout scales the game to it, block tiles are scaled once
+# when loading.
+if os.environ.get('TETRIS_RESOLUTION'):
+    WIDTH, HEIGHT = parse_resolution(os.environ['TETRIS_RESOLUTION'])
+else:
+    WIDTH, HEIGHT = display_size()
+layout = Layout(WIDTH, HEIGHT)
 
-# Grid configuration for display
-BLOCK_SIZE = 48  # 48x48 pixels per block
-GRID_X = 400  # X position of game grid
-GRID_Y = 0  # Y position of game grid
+# Finished games are saved here as replay files
+REPLAY_DIR = 'replays'
 
-GRID_RECT = Rect(GRID_X, GRID_Y, GRID_WIDTH * BLOCK_SIZE, GRID_HEIGHT * BLOCK_SIZE)
-NEXT_PIECE_BOX = Rect(950, 120, 240, 240)
+# Profiling (toggle with F3, or start with TETRIS_PROFILE=1): on-screen
+# overlay plus metrics in Prometheus text format written to METRICS_FILE
+METRICS_FILE = os.environ.get('TETRIS_METRICS', 'metrics.prom')
 
 # Load and prepare logo
 logo_surface = None  # Keep reference for potential future use (e.g., re-scaling)
 rotated_logo = None
 
+# The rotated logo should fit within the 400px wide, 960px tall left panel
+# (design size, scaled with the layout)
+LOGO_MAX_WIDTH = 380  # Leave some margin
+LOGO_MAX_HEIGHT = 940  # Leave some margin
+
 def load_logo():
     """Load and rotate the logo for the left panel"""
     global logo_surface, rotated_logo
@@ -47,9 +59,19 @@ def load_logo():
     # Try to load logo (prefer PNG placeholder, fallback to JPEG)
     logo_files = ['assets/logo_vertical.png', 'assets/logo_rotated.png','assets/logo_placeholder.png']
     logo_loaded = False
+    max_width = layout.length(LOGO_MAX_WIDTH)
+    max_height = layout.length(LOGO_MAX_HEIGHT)
     
     for logo_file in logo_files:
         if os.path.exists(logo_file):
+            # Reuse the scaled and rotated logo from the asset cache
+            digest = asset_cache.source_hash([logo_file], max_width, max_height)
+            cached = asset_cache.load_surfaces(asset_cache.CACHE_DIR, 'logo', digest)
+            if cached and 'logo' in cached[0]:
+                rotated_logo = cached[0]['logo']
+                print(f"Loaded logo from the asset cache ({logo_file})")
+                return
+            
             try:
                 logo_surface = image.load(logo_file)
                 logo_loaded = True
@@ -65,13 +87,8 @@ def load_logo():
     
     try:
         # Calculate dimensions for the left panel
-        # We want the logo to fit nicely in the left area (0-400px wide, 960px tall)
         # With 90 degree rotation, the logo width becomes height and vice versa
-        
-        # The rotated logo should fit within 400px width and 960px height
         # After rotation: original_height becomes width, original_width becomes height
-        max_rotated_width = 380  # Leave some margin
-        max_rotated_height = 940  # Leave some margin
         
         # Calculate what the original dimensions would need to be
         # rotated_width = original_height, rotated_height = original_width
@@ -79,8 +96,8 @@ def load_logo():
         original_height = logo_surface.get_height()
         
         # Scale to fit the rotated dimensions
-        scale_width = max_rotated_width / original_height
-        scale_height = max_rotated_height / original_width
+        scale_width = max_width / original_height
+        scale_height = max_height / original_width
         scale_factor = min(scale_width, scale_height)
         
         new_width = int(original_width * scale_factor)
@@ -91,387 +108,189 @@ def load_logo():
         
         # Rotate 90 degrees clockwise
         rotated_logo = transform.rotate(scaled_logo, -90)
-        
+        asset_cache.save_surfaces(asset_cache.CACHE_DIR, 'logo', digest, {'logo': rotated_logo})
+    
     except (ValueError, TypeError) as e:
         print(f"Error processing logo dimensions: {e}")
         rotated_logo = None
 
-# Game state
-grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-game_state = {
-    'current_piece': None,
-    'next_piece': None,
-    'fall_timer': 0,
-    'game_over': False,
-    'score': 0,
-    'level': 1,
-    'lines_cleared': 0,
-    'fall_speed': INITIAL_FALL_SPEED
-}
+# Load the logo and the piece sprites on background threads, so the window
+# opens right away and shows a loading frame until they are ready. Each
+# piece sprite is decoded and split in its own task on piece_loader.
+loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix='assets')
+piece_loader = ThreadPoolExecutor(thread_name_prefix='sprites')
+loading = [loader.submit(load_logo), loader.submit(sprite_manager.load_sprites, executor=piece_loader)]
 
-# Load logo on startup
-load_logo()
+# Game state (grid, pieces, score and level live in the session), created
+# once the assets are loaded
+session = None
+recorder = None
 
-# Load piece sprites
-sprite_manager.load_sprites()
-print(f"Sprite rendering: {'enabled' if sprite_manager.has_sprites() else 'disabled (using colors)'}")
+renderer = Renderer(sprite_manager, layout=layout)
 
+# None while profiling is off, the game loop then only pays for this check
+profiler = None
 
-def draw():
-    """Main draw function - called by Pygame Zero every frame"""
-    # Clear screen with background color
-    screen.fill(BACKGROUND_COLOR)
-    
-    # Draw logo in the left spacing area (rotated 90 degrees)
-    if rotated_logo:
-        # Position the logo centered in the left area
-        # Left area is 0-400px wide, logo should be centered vertically and horizontally
-        logo_x = (GRID_X - rotated_logo.get_width()) // 2
-        logo_y = (HEIGHT - rotated_logo.get_height()) // 2
-        screen.blit(rotated_logo, (logo_x, logo_y))
-    
-    # Draw game grid background
-    screen.draw.filled_rect(GRID_RECT, GRID_BACKGROUND)
-    
-    # Draw grid border
-    screen.draw.rect(GRID_RECT, GRID_BORDER)
-    
-    # Draw grid lines (vertical)
-    for x in range(1, GRID_WIDTH):
-        line_x = GRID_X + (x * BLOCK_SIZE)
-        screen.draw.line(
-            (line_x, GRID_Y),
-            (line_x, GRID_Y + GRID_HEIGHT * BLOCK_SIZE),
-            GRID_BORDER
-        )
-    
-    # Draw grid lines (horizontal)
-    for y in range(1, GRID_HEIGHT):
-        line_y = GRID_Y + (y * BLOCK_SIZE)
-        screen.draw.line(
-            (GRID_X, line_y),
-            (GRID_X + GRID_WIDTH * BLOCK_SIZE, line_y),
-            GRID_BORDER
-        )
-    
-    # Draw locked pieces on the grid
-    for y in range(GRID_HEIGHT):
-        for x in range(GRID_WIDTH):
-            cell = grid[y][x]
-            if cell != 0:
-                block_x = GRID_X + x * BLOCK_SIZE
-                block_y = GRID_Y + y * BLOCK_SIZE
-                
-                # Check if cell contains a Block object (new system) or just a string (old system)
-                if hasattr(cell, 'sprite') and hasattr(cell, 'rotation'):
-                    # New system with rotation: get rotated sprite from sprite_manager
-                    rotated_sprite = sprite_manager.get_block_sprite(
-                        cell.shape_type, cell.sprite_dx, cell.sprite_dy, cell.rotation
-                    )
-                    if rotated_sprite:
-                        screen.blit(rotated_sprite, (block_x, block_y))
-                    else:
-                        # Fallback to colored blocks
-                        block_rect = Rect(block_x, block_y, BLOCK_SIZE, BLOCK_SIZE)
-                        color = PIECE_COLORS[cell.shape_type]
-                        screen.draw.filled_rect(block_rect, color)
-                        screen.draw.rect(block_rect, GRID_BORDER)
-                elif hasattr(cell, 'sprite') and cell.sprite:
-                    # Old system: use the block's pre-loaded sprite (no rotation)
-                    screen.blit(cell.sprite, (block_x, block_y))
-                elif hasattr(cell, 'shape_type'):
-                    # Block object without sprite - use color fallback
-                    block_rect = Rect(block_x, block_y, BLOCK_SIZE, BLOCK_SIZE)
-                    color = PIECE_COLORS[cell.shape_type]
-                    screen.draw.filled_rect(block_rect, color)
-                    screen.draw.rect(block_rect, GRID_BORDER)
-                else:
-                    # Old system: cell is a shape_type string
-                    block_rect = Rect(block_x, block_y, BLOCK_SIZE, BLOCK_SIZE)
-                    color = PIECE_COLORS[cell]
-                    screen.draw.filled_rect(block_rect, color)
-                    screen.draw.rect(block_rect, GRID_BORDER)
-    
-    # Draw current falling piece
-    current_piece = game_state['current_piece']
-    if current_piece:
-        for (dx, dy), block in current_piece.blocks:
-            bx = current_piece.x + dx
-            by = current_piece.y + dy
-            if by >= 0:  # Only draw blocks that are visible
-                block_x = GRID_X + bx * BLOCK_SIZE
-                block_y = GRID_Y + by * BLOCK_SIZE
-                
-                # Use the block's rotated sprite, fallback to color
-                if hasattr(block, 'rotation'):
-                    # Get rotated sprite from sprite_manager
-                    rotated_sprite = sprite_manager.get_block_sprite(
-                        block.shape_type, block.sprite_dx, block.sprite_dy, block.rotation
-                    )
-                    if rotated_sprite:
-                        screen.blit(rotated_sprite, (block_x, block_y))
-                    else:
-                        # Fallback to colored blocks
-                        block_rect = Rect(block_x, block_y, BLOCK_SIZE, BLOCK_SIZE)
-                        screen.draw.filled_rect(block_rect, current_piece.color)
-                        screen.draw.rect(block_rect, GRID_BORDER)
-                elif block.sprite:
-                    # Old system without rotation
-                    screen.blit(block.sprite, (block_x, block_y))
-                else:
-                    # Fallback to colored blocks
-                    block_rect = Rect(block_x, block_y, BLOCK_SIZE, BLOCK_SIZE)
-                    screen.draw.filled_rect(block_rect, current_piece.color)
-                    screen.draw.rect(block_rect, GRID_BORDER)
-    
-    # Draw UI panel labels
-    screen.draw.text(
-        "NEXT PIECE:",
-        topleft=(950, 80),
-        fontsize=24,
-        color=UI_TEXT_COLOR
-    )
-    
-    # Draw next piece box
-    screen.draw.filled_rect(NEXT_PIECE_BOX, GRID_BACKGROUND)
-    screen.draw.rect(NEXT_PIECE_BOX, GRID_BORDER)
-    
-    # Draw next piece preview
-    next_piece = game_state['next_piece']
-    if next_piece:
-        # Calculate the bounds of the piece
-        min_x = min(dx for dx, dy in next_piece.shape)
-        max_x = max(dx for dx, dy in next_piece.shape)
-        min_y = min(dy for dx, dy in next_piece.shape)
-        max_y = max(dy for dx, dy in next_piece.shape)
-        
-        # Calculate piece dimensions in pixels
-        piece_width = (max_x - min_x + 1) * BLOCK_SIZE
-        piece_height = (max_y - min_y + 1) * BLOCK_SIZE
-        
-        # Center the piece in the preview box
-        preview_offset_x = NEXT_PIECE_BOX.x + (NEXT_PIECE_BOX.width - piece_width) // 2 - min_x * BLOCK_SIZE
-        preview_offset_y = NEXT_PIECE_BOX.y + (NEXT_PIECE_BOX.height - piece_height) // 2 - min_y * BLOCK_SIZE
-        
-        for (dx, dy), block in next_piece.blocks:
-            block_x = preview_offset_x + dx * BLOCK_SIZE
-            block_y = preview_offset_y + dy * BLOCK_SIZE
-            
-            # Use the block's rotated sprite, fallback to color
-            if hasattr(block, 'rotation'):
-                # Get rotated sprite from sprite_manager
-                rotated_sprite = sprite_manager.get_block_sprite(
-                    block.shape_type, block.sprite_dx, block.sprite_dy, block.rotation
-                )
-                if rotated_sprite:
-                    screen.blit(rotated_sprite, (block_x, block_y))
-                else:
-                    # Fallback to colored blocks
-                    block_rect = Rect(block_x, block_y, BLOCK_SIZE, BLOCK_SIZE)
-                    screen.draw.filled_rect(block_rect, next_piece.color)
-                    screen.draw.rect(block_rect, GRID_BORDER)
-            elif block.sprite:
-                # Old system without rotation
-                screen.blit(block.sprite, (block_x, block_y))
-            else:
-                # Fallback to colored blocks
-                block_rect = Rect(block_x, block_y, BLOCK_SIZE, BLOCK_SIZE)
-                screen.draw.filled_rect(block_rect, next_piece.color)
-                screen.draw.rect(block_rect, GRID_BORDER)
-    
-    # Draw score display
-    screen.draw.text(
-        f"SCORE: {game_state['score']}",
-        topleft=(950, 400),
-        fontsize=28,
-        color=UI_TEXT_COLOR
-    )
+
+def finish_loading():
+    """Prepare the loaded assets for display and start the first game"""
+    global session, recorder
+    for future in loading:
+        future.result()  # Re-raise errors from the loading threads
+    loader.shutdown()
+    piece_loader.shutdown()
     
-    screen.draw.text(
-        f"LEVEL: {game_state['level']}",
-        topleft=(950, 450),
-        fontsize=28,
-        color=UI_TEXT_COLOR
-    )
+    # Match the display pixel format so blits don't convert every frame
+    sprite_manager.convert_sprites()
+    print(f"Sprite rendering: {'enabled' if sprite_manager.has_sprites() else 'disabled (using colors)'}")
+    # Scale the block tiles for the layout now instead of on the first frame
+    sprite_manager.scaled_atlas(layout.block_size)
+    print(f"Layout: {WIDTH}x{HEIGHT}, {layout.block_size}px blocks")
+    print(f"Sprite cache: {sprite_manager.cache_bytes() / 1024:.0f} KiB")
+    renderer.set_logo(rotated_logo.convert_alpha() if rotated_logo else None)
     
-    screen.draw.text(
-        f"LINES: {game_state['lines_cleared']}",
-        topleft=(950, 500),
-        fontsize=28,
-        color=UI_TEXT_COLOR
-    )
+    # Every game gets an explicit seed so it can be recorded as a replay
+    seed = random.randrange(2 ** 32)
+    session = GameSession(seed=seed, sprite_manager=sprite_manager)
+    recorder = ReplayRecorder(seed, session.generator_kind)
+
+
+def draw_loading():
+    """Draw the loading frame shown while the assets load"""
+    screen.fill(BACKGROUND_COLOR)
+    screen.draw.text("LOADING", center=(WIDTH // 2, HEIGHT // 2 - layout.length(40)),
+                     fontsize=layout.fontsize(48), color=UI_TEXT_COLOR)
     
-    # Draw controls
-    screen.draw.text(
-        "CONTROLS:",
-        topleft=(950, 600),
-        fontsize=24,
-        color=UI_TEXT_COLOR
-    )
+    bar = Rect(0, 0, layout.length(400), layout.length(16))
+    bar.center = (WIDTH // 2, HEIGHT // 2 + layout.length(20))
+    done = sum(future.done() for future in loading)
+    screen.draw.filled_rect(Rect(bar.topleft, (bar.width * done // len(loading), bar.height)), PRIMARY_ACCENT)
+    screen.draw.rect(bar, GRID_BORDER)
+
+
+def draw():
+    """Main draw function - called by Pygame Zero every frame"""
+    if session is None:
+        draw_loading()
+        return
     
-    controls_text = [
-        "LEFT/RIGHT Move",
-        "UP Rotate",
-        "DOWN Soft Drop",
-        "SPACE Hard Drop"
-    ]
+    if profiler is not None:
+        started = time.perf_counter_ns()
     
-    y_offset = 640
-    for control in controls_text:
-        screen.draw.text(
-            control,
-            topleft=(950, y_offset),
-            fontsize=20,
-            color=UI_TEXT_COLOR
-        )
-        y_offset += 30
+    # Only the regions that changed since the last frame are repainted
+    renderer.draw(screen.surface, session.grid, session.game_state)
     
-    # Draw game over message if game is over
-    if game_state['game_over']:
-        # Draw semi-transparent overlay
-        overlay_rect = Rect(GRID_X, GRID_Y + GRID_HEIGHT * BLOCK_SIZE // 2 - 100, 
-                           GRID_WIDTH * BLOCK_SIZE, 200)
-        screen.draw.filled_rect(overlay_rect, (0, 0, 0, 180))
-        
-        screen.draw.text(
-            "GAME OVER",
-            center=(GRID_X + GRID_WIDTH * BLOCK_SIZE // 2, 
-                   GRID_Y + GRID_HEIGHT * BLOCK_SIZE // 2 - 50),
-            fontsize=48,
-            color=(255, 255, 255)
-        )
-        
-        screen.draw.text(
-            f"Final Score: {game_state['score']}",
-            center=(GRID_X + GRID_WIDTH * BLOCK_SIZE // 2, 
-                   GRID_Y + GRID_HEIGHT * BLOCK_SIZE // 2 + 10),
-            fontsize=28,
-            color=(255, 255, 255)
-        )
-        
-        screen.draw.text(
-            "Press R to Restart",
-            center=(GRID_X + GRID_WIDTH * BLOCK_SIZE // 2, 
-                   GRID_Y + GRID_HEIGHT * BLOCK_SIZE // 2 + 50),
-            fontsize=24,
-            color=(255, 255, 255)
-        )
+    if profiler is not None:
+        profiler.record('draw', time.perf_counter_ns() - started)
+        profiler.gauges['blits'] = renderer.blit_count
+        profiler.frame()
+        renderer.draw_overlay(screen.surface, profiler.overlay_lines())
 
 
 def update(dt):
     """Main update function - called by Pygame Zero every frame"""
-    # Don't update if game is over
-    if game_state['game_over']:
+    if session is None:
+        # Switch to gameplay once every asset has loaded
+        if all(future.done() for future in loading):
+            finish_loading()
         return
     
-    # Initialize the first piece if needed
-    if game_state['current_piece'] is None:
-        spawn_piece(game_state, grid, sprite_manager)
-        return
+    if profiler is not None:
+        started = time.perf_counter_ns()
     
-    # Update fall timer
-    game_state['fall_timer'] += dt
+    # The recorder quantizes dt so the replay reproduces this exact tick
+    if recorder is not None:
+        dt = recorder.frame(dt)
+    session.tick(dt)
     
-    # Automatic falling
-    if game_state['fall_timer'] >= game_state['fall_speed']:
-        game_state['fall_timer'] = 0
-        
-        # Try to move piece down
-        if not check_collision(game_state['current_piece'], grid, 0, 1):
-            game_state['current_piece'].move(0, 1)
-        else:
-            # Piece can't move down - lock it and spawn new piece
-            lock_piece(game_state['current_piece'], grid)
-            
-            # Check and clear any completed lines
-            completed_lines = check_lines(grid)
-            clear_lines(completed_lines, grid, game_state)
-            
-            spawn_piece(game_state, grid, sprite_manager)
+    if session.game_over and recorder is not None:
+        save_replay()
+    
+    if profiler is not None:
+        profiler.record('update', time.perf_counter_ns() - started)
+        profiler.gauges['level'] = session.game_state['level']
+        profiler.maybe_export(METRICS_FILE)
+
+
+def toggle_profiling():
+    """Switch the profiler, its overlay and the metrics export on or off"""
+    global profiler
+    if profiler is None:
+        profiler = Profiler()
+        profiler.instrument(game_logic)
+    else:
+        profiler.export(METRICS_FILE)
+        profiler.uninstrument()
+        profiler = None
+        renderer.draw_overlay(screen.surface, [])
+
+
+def restart():
+    """Start a new game with a fresh seed and recording"""
+    global recorder
+    seed = random.randrange(2 ** 32)
+    session.reset(seed)
+    recorder = ReplayRecorder(seed, session.generator_kind)
+
+
+def save_replay():
+    """Write the finished game to REPLAY_DIR and stop recording"""
+    global recorder
+    path = os.path.join(REPLAY_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{session.game_state['score']}-{recorder.seed}.ttr")
+    try:
+        os.makedirs(REPLAY_DIR, exist_ok=True)
+        recorder.save(path)
+        print(f"Saved replay to {path} ({recorder.frames} frames)")
+    except OSError as e:
+        print(f"Could not save replay: {e}")
+    recorder = None
+
+
+def play(action):
+    """Record a player action for the replay and apply it"""
+    recorder.action(action)
+    session.step(action)
 
 
 def on_key_down(key):
     """Handle keyboard input"""
-    # Restart game if game over
-    if game_state['game_over'] and key == keys.R:
-        # Reset game state
-        global grid
-        grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-        game_state['current_piece'] = None
-        game_state['next_piece'] = None
-        game_state['fall_timer'] = 0
-        game_state['game_over'] = False
-        game_state['score'] = 0
-        game_state['level'] = 1
-        game_state['lines_cleared'] = 0
-        game_state['fall_speed'] = INITIAL_FALL_SPEED
+    if key == keys.F3:
+        toggle_profiling()
         return
     
-    if game_state['current_piece'] is None or game_state['game_over']:
+    # Nothing to control while loading
+    if session is None:
         return
     
-    current_piece = game_state['current_piece']
+    # Restart game if game over, other keys do nothing then
+    if session.game_over:
+        if key == keys.R:
+            restart()
+        return
     
     # Move left
     if key == keys.LEFT:
-        if not check_collision(current_piece, grid, -1, 0):
-            current_piece.move(-1, 0)
+        play(ACTION_LEFT)
     
     # Move right
     elif key == keys.RIGHT:
-        if not check_collision(current_piece, grid, 1, 0):
-            current_piece.move(1, 0)
+        play(ACTION_RIGHT)
     
-    # Rotate
+    # Rotate (with wall kicks)
     elif key == keys.UP:
-        # Save current state in case rotation fails
-        old_blocks = [((dx, dy), block) for (dx, dy), block in current_piece.blocks]
-        current_piece.rotate()
-        
-        # Check if rotation is valid
-        if check_collision(current_piece, grid, 0, 0):
-            # Try wall kicks
-            wall_kick_offsets = [(-1, 0), (1, 0), (-2, 0), (2, 0), (0, -1)]
-            kick_successful = False
-            
-            for dx, dy in wall_kick_offsets:
-                if not check_collision(current_piece, grid, dx, dy):
-                    current_piece.move(dx, dy)
-                    kick_successful = True
-                    break
-            
-            # If no wall kick worked, revert rotation
-            if not kick_successful:
-                current_piece.blocks = old_blocks
+        play(ACTION_ROTATE)
     
     # Soft drop (move down faster)
     elif key == keys.DOWN:
-        if not check_collision(current_piece, grid, 0, 1):
-            current_piece.move(0, 1)
-            game_state['score'] += SCORE_SOFT_DROP  # 1 point per cell
+        play(ACTION_SOFT_DROP)
     
     # Hard drop (instant placement)
     elif key == keys.SPACE:
-        # Count cells dropped for scoring
-        cells_dropped = 0
-        
-        # Move piece down until it collides
-        while not check_collision(current_piece, grid, 0, 1):
-            current_piece.move(0, 1)
-            cells_dropped += 1
-        
-        # Add hard drop score (2 points per cell)
-        game_state['score'] += cells_dropped * SCORE_HARD_DROP
-        
-        # Lock the piece and spawn new one
-        lock_piece(current_piece, grid)
-        
-        # Check and clear any completed lines
-        completed_lines = check_lines(grid)
-        clear_lines(completed_lines, grid, game_state)
-        
-        spawn_piece(game_state, grid, sprite_manager)
+        play(ACTION_HARD_DROP)
+
 
+if os.environ.get('TETRIS_PROFILE'):
+    toggle_profiling()
 
 # Run the game
 pgzrun.go()